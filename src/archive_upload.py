@@ -0,0 +1,110 @@
+import os
+import tarfile
+from urllib.parse import unquote
+
+from large_object import MB
+from progress import iter_counted
+from swift_client import bulk_path
+
+# Giới hạn số file trong một archive để một request không quá lâu
+MAX_FILES_PER_ARCHIVE = 1000
+
+
+# Bộ đệm ghi của tarfile, dữ liệu được lấy ra dần để gửi đi thay vì giữ cả archive trong RAM
+class _StreamBuffer:
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+# Sinh archive tar theo từng file: files là các cặp (filepath, tên trong archive).
+# Dùng làm body (chunked) của PUT ?extract-archive=tar.
+def iter_tar(files, on_file=None):
+    buffer = _StreamBuffer()
+    with tarfile.open(fileobj=buffer, mode="w|", format=tarfile.PAX_FORMAT) as tar:
+        for filepath, arcname in files:
+            tar.add(filepath, arcname=arcname, recursive=False)
+            data = buffer.drain()
+            if data:
+                yield data
+            if on_file:
+                on_file(filepath, arcname)
+    data = buffer.drain()
+    if data:
+        yield data
+
+
+# Chia batch task (filepath, container, object_name) thành các archive (theo container) và các task
+# upload từng file. Chỉ dùng archive khi cluster hỗ trợ bulk_upload và batch có đủ nhiều file nhỏ.
+# sizes: {filepath: kích thước} nếu đã có từ lúc quét thư mục (không phải stat lại từng file)
+def plan_archive_batches(client, tasks, settings, sizes=None):
+    if not settings.get("archive_upload") or "bulk_upload" not in client.cluster_info():
+        return [], list(tasks)
+
+    small_limit = settings["archive_small_file_kb"] * 1024
+    small, single = [], []
+    for task in tasks:
+        size = sizes.get(task[0]) if sizes else None
+        if size is None:
+            try:
+                size = os.path.getsize(task[0])
+            except OSError:
+                size = None
+        if size is not None and size <= small_limit:
+            small.append((task, size))
+        else:
+            single.append(task)
+
+    if len(small) < settings["archive_min_files"]:
+        return [], list(tasks)
+
+    batch_limit = settings["archive_batch_mb"] * MB
+    batches = []
+    open_batches = {}  # container -> (tasks, bytes) của archive đang gom
+    for task, size in small:
+        container = task[1]
+        batch, batch_bytes = open_batches.get(container, ([], 0))
+        if batch and (batch_bytes + size > batch_limit or len(batch) >= MAX_FILES_PER_ARCHIVE):
+            batches.append(batch)
+            batch, batch_bytes = [], 0
+        batch.append(task)
+        open_batches[container] = (batch, batch_bytes + size)
+    batches.extend(batch for batch, _ in open_batches.values() if batch)
+    return batches, single
+
+
+# Upload một archive vào container, cluster tự giải nén thành từng object.
+# Trả về (số file tạo được, danh sách (object_name, status) bị lỗi). throttle(n) giới hạn băng thông.
+def upload_archive(client, container, tasks, on_file=None, throttle=None):
+    files = [(filepath, object_name) for filepath, _, object_name in tasks]
+    headers = {"Accept": "application/json", "Content-Type": "application/x-tar"}
+
+    body = iter_counted(iter_tar(files, on_file), throttle)
+    response = client.put(container, params={"extract-archive": "tar"}, headers=headers, data=body)
+    if response.status_code not in (200, 201):
+        raise Exception(f"Archive upload failed - HTTP {response.status_code}")
+
+    # Middleware luôn trả 200 và ghi trạng thái thật trong body (có thể có khoảng trắng giữ kết nối ở đầu)
+    result = response.json()
+    status = str(result.get("Response Status", ""))
+    errors = []
+    for path, error in result.get("Errors", []):
+        errors.append((_object_name_from_path(container, unquote(path)), error))
+    if not status.startswith("2") and not errors:
+        raise Exception(f"Archive upload failed - {status} {result.get('Response Body', '')}".strip())
+    return int(result.get("Number Files Created", 0)), errors
+
+
+# Lỗi của middleware có dạng /v1/AUTH_x/<container>/<object>
+def _object_name_from_path(container, path):
+    marker = unquote(bulk_path(container)) + "/"
+    index = path.find(marker)
+    return path[index + len(marker):] if index >= 0 else path
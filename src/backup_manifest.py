@@ -0,0 +1,64 @@
+import json
+import os
+
+
+# Trạng thái file của một lần quét: size, mtime (ns) và inode lấy từ ScanRecord của scanner.py
+def file_state(record):
+    return {"size": record.size, "mtime": record.mtime, "inode": record.inode}
+
+
+# Manifest trạng thái file của snapshot backup gần nhất (mỗi user một file trong thư mục backup):
+#   {"snapshot": "<folder snapshot>", "files": {"<đường dẫn local>": {"object", "size", "mtime", "inode", "hash"}}}
+# Lần backup sau so trạng thái file với manifest: file không đổi được copy trên server từ object của
+# snapshot trước thay vì upload lại, nên mỗi snapshot vẫn đầy đủ và tải về được như bình thường.
+class BackupManifest:
+    def __init__(self, path):
+        self.path = path
+        self.snapshot = None
+        self.files = {}
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.snapshot = data.get("snapshot")
+        self.files = data.get("files", {})
+
+    # Ghi ra file tạm rồi thay thế để manifest không bị hỏng nếu app tắt giữa chừng
+    def save(self, snapshot, files):
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"snapshot": snapshot, "files": files}, f)
+        os.replace(temp_path, self.path)
+        self.snapshot = snapshot
+        self.files = files
+
+    # Mục của snapshot trước nếu file không đổi (cùng size, mtime và inode), ngược lại None
+    def unchanged(self, path, state):
+        old = self.files.get(path)
+        if old and all(old.get(key) == state[key] for key in ("size", "mtime", "inode")):
+            return old
+        return None
+
+    # Chia các file (ScanRecord) của lần backup mới:
+    #   changed:   [(path, object_name)] file mới, khác kích thước hoặc chưa có hash -> upload
+    #   unchanged: [(path, object_name, source_object, hash)] -> copy từ source_object;
+    #              hash khác None khi size giống nhưng mtime/inode đổi, cần băm lại để chắc chắn
+    #   states:    {path: trạng thái file} để ghi manifest mới khi backup xong
+    def plan(self, files):
+        changed, unchanged, states = [], [], {}
+        for record in files:
+            path = record.path
+            state = file_state(record)
+            states[path] = dict(state, object=record.object_name)
+            old = self.files.get(path)
+            if not old or old.get("size") != state["size"] or not old.get("hash"):
+                changed.append((path, record.object_name))
+            elif old.get("mtime") == state["mtime"] and old.get("inode") == state["inode"]:
+                unchanged.append((path, record.object_name, old["object"], None))
+            else:
+                unchanged.append((path, record.object_name, old["object"], old["hash"]))
+        return changed, unchanged, states
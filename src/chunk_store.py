@@ -0,0 +1,257 @@
+import hashlib
+import os
+import random
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+try:
+    import numpy as np  # Có sẵn cùng matplotlib; thiếu thì dùng vòng lặp Python (chậm hơn, cùng kết quả)
+except ImportError:
+    np = None
+
+# Chunk của mọi snapshot dạng chunked được lưu một lần trong container này, tên object là SHA-256 của chunk
+CHUNK_CONTAINER = "Backup_chunks"
+
+KB = 1024
+MASK64 = (1 << 64) - 1
+# Đọc file theo khối lớn để vòng lặp rolling hash không phải chờ I/O nhỏ lẻ
+READ_SIZE = 16 * 1024 * 1024
+# Số vị trí tính gear hash mỗi lần bằng numpy: đủ lớn để ít vòng lặp Python, đủ nhỏ để dừng sớm khi đã cắt
+HASH_BLOCK = 64 * KB
+
+# Bảng gear cố định (seed cố định): cùng nội dung luôn cho cùng ranh giới chunk ở mọi máy/lần chạy
+_rng = random.Random(0x6B636463)
+GEAR = [_rng.getrandbits(64) for _ in range(256)]
+GEAR_ARRAY = np.array(GEAR, dtype=np.uint64) if np is not None else None
+del _rng
+
+
+def chunk_masks(avg_size):
+    bits = max(avg_size.bit_length() - 1, 2)
+    # Dùng các bit cao của gear hash (phụ thuộc 64 byte gần nhất), bit thấp chỉ phụ thuộc vài byte cuối.
+    # Trước avg_size khó cắt hơn, sau avg_size dễ cắt hơn để kích thước chunk tập trung quanh avg_size.
+    mask_small = ((1 << (bits + 1)) - 1) << (64 - bits - 1)
+    mask_large = ((1 << (bits - 1)) - 1) << (64 - bits + 1)
+    return mask_small, mask_large
+
+
+# Gear hash sau khi đọc từng byte p trong buf[start:stop], hash bắt đầu từ 0 tại first (first <= start).
+# h(p) = sum(GEAR[buf[p - k]] << k), k < 64 và p - k >= first: byte cách quá 64 vị trí đã bị đẩy khỏi
+# 64 bit, nên cả khối tính được bằng 6 lần cộng dồn trên mảng (cửa sổ 1, 2, 4, ... 64 byte).
+def gear_hashes(buf, first, start, stop):
+    lo = max(first, start - 63)
+    h = GEAR_ARRAY[np.frombuffer(buf, dtype=np.uint8, count=stop - lo, offset=lo)]
+    width = 1
+    while width < 64:
+        h[width:] += h[:-width] << np.uint64(width)
+        width *= 2
+    return h[start - lo:]
+
+
+# Vị trí cắt chunk tiếp theo trong buf[start:end] theo gear hash (content-defined chunking kiểu FastCDC).
+# end - start không vượt max_size; bỏ qua min_size byte đầu vì không bao giờ cắt ở đó.
+# Hash được tính theo từng khối HASH_BLOCK bằng numpy thay vì từng byte trong Python,
+# ranh giới giống hệt cách tính từng byte (h = (h << 1) + GEAR[byte]) nên chunk cũ vẫn dùng lại được.
+def cut_point(buf, start, end, min_size, avg_size, mask_small, mask_large):
+    if end - start <= min_size:
+        return end
+    if np is None:
+        return cut_point_bytes(buf, start, end, min_size, avg_size, mask_small, mask_large)
+    first = start + min_size
+    normal = min(start + avg_size, end)
+    block = min(HASH_BLOCK, max(avg_size, KB))  # Chunk nhỏ: khối nhỏ theo, đỡ tính hash thừa sau ranh giới
+    pos = first
+    while pos < end:
+        stop = min(pos + block, end)
+        h = gear_hashes(buf, first, pos, stop)
+        small = max(min(normal, stop) - pos, 0)  # Các vị trí trước avg_size dùng mask_small
+        hits = np.flatnonzero((h[:small] & np.uint64(mask_small)) == 0)
+        if hits.size:
+            return pos + int(hits[0]) + 1
+        hits = np.flatnonzero((h[small:] & np.uint64(mask_large)) == 0)
+        if hits.size:
+            return pos + small + int(hits[0]) + 1
+        pos = stop
+    return end
+
+
+# Như cut_point nhưng tính từng byte trong Python, dùng khi không có numpy
+def cut_point_bytes(buf, start, end, min_size, avg_size, mask_small, mask_large):
+    if end - start <= min_size:
+        return end
+    gear = GEAR
+    h = 0
+    i = start + min_size
+    normal = min(start + avg_size, end)
+    for byte in buf[i:normal]:
+        h = ((h << 1) + gear[byte]) & MASK64
+        i += 1
+        if not h & mask_small:
+            return i
+    for byte in buf[i:end]:
+        h = ((h << 1) + gear[byte]) & MASK64
+        i += 1
+        if not h & mask_large:
+            return i
+    return end
+
+
+# Chia file thành các chunk theo nội dung, trả về [(sha256, length)] theo thứ tự.
+# Chạy trong process con của ChunkStore nên chỉ dùng tham số/giá trị trả về pickle được.
+def chunk_file(path, min_size, avg_size, max_size):
+    mask_small, mask_large = chunk_masks(avg_size)
+    chunks = []
+    with open(path, "rb") as f:
+        buf = f.read(READ_SIZE)
+        pos = 0
+        eof = len(buf) < READ_SIZE
+        while pos < len(buf):
+            # Luôn giữ ít nhất max_size byte phía trước (trừ cuối file) để ranh giới không phụ thuộc khối đọc
+            if not eof and len(buf) - pos < max_size:
+                data = f.read(READ_SIZE)
+                eof = len(data) < READ_SIZE
+                buf = buf[pos:] + data
+                pos = 0
+                continue
+            cut = cut_point(buf, pos, min(pos + max_size, len(buf)), min_size, avg_size, mask_small, mask_large)
+            chunks.append((hashlib.sha256(buf[pos:cut]).hexdigest(), cut - pos))
+            pos = cut
+    return chunks
+
+
+# Kho chunk của một lần backup: băm file trên process pool (dùng hết các core, không bị GIL),
+# chỉ upload chunk chưa có trong CHUNK_CONTAINER. Chunk có trên server hay chưa được hỏi bằng HEAD
+# khi cần (không listing cả container), kết quả nhớ lại trong lần backup.
+# Các hàm chunk/claim/upload được gọi từ nhiều worker của job cùng lúc.
+class ChunkStore:
+    def __init__(self, client, settings, container=CHUNK_CONTAINER):
+        self.client = client
+        self.container = container
+        self.min_size = int(settings["chunk_min_kb"] * KB)
+        self.avg_size = int(settings["chunk_avg_kb"] * KB)
+        self.max_size = int(settings["chunk_max_kb"] * KB)
+        self.workers = settings["chunk_workers"] or os.cpu_count() or 1
+        self._lock = threading.Lock()
+        self._pool = None
+        self._ready = False    # Đã tạo container chưa
+        self._known = set()    # Chunk đã biết là có trên server
+        self._pending = set()  # Chunk đang được một worker khác upload
+
+    def chunk(self, path):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            pool = self._pool
+        return pool.submit(chunk_file, path, self.min_size, self.avg_size, self.max_size).result()
+
+    # True nếu worker gọi phải upload chunk này (chưa có trên server, chưa ai nhận)
+    def claim(self, digest):
+        with self._lock:
+            if not self._ready:
+                self._create_container()
+                self._ready = True
+            if digest in self._known or digest in self._pending:
+                return False
+            self._pending.add(digest)
+        # HEAD ngoài lock để các worker khác không phải chờ
+        try:
+            exists = self._exists(digest)
+        except BaseException:
+            self.release(digest, False)
+            raise
+        if exists:
+            self.release(digest, True)
+            return False
+        return True
+
+    def release(self, digest, stored):
+        with self._lock:
+            self._pending.discard(digest)
+            if stored:
+                self._known.add(digest)
+
+    def _create_container(self):
+        response = self.client.put(self.container)
+        if response.status_code not in [201, 202, 204]:
+            raise Exception(f"Unable to create {self.container} container: HTTP {response.status_code}")
+
+    def _exists(self, digest):
+        response = self.client.head(self.container, digest)
+        if response.status_code == 404:
+            return False
+        if response.status_code not in [200, 204]:
+            raise Exception(f"Cannot check chunk {digest[:12]} - HTTP {response.status_code}")
+        return True
+
+    # Upload một chunk đã đọc vào bộ nhớ; kiểm tra lại SHA-256 vì file có thể đã bị sửa sau khi băm
+    def upload(self, digest, data, throttle=None):
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise Exception("File changed while it was being backed up")
+        if throttle:
+            throttle(len(data))
+        response = self.client.put(self.container, digest, data=data,
+                                   headers={"ETag": hashlib.md5(data).hexdigest(),
+                                            "Content-Type": "application/octet-stream"})
+        if response.status_code not in [201, 202]:
+            raise Exception(f"Error uploading chunk {digest[:12]} - HTTP {response.status_code}")
+
+    def close(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+# Ghép lại một file từ các chunk trong manifest của snapshot (snapshots.py): tải song song tối đa
+# threads chunk, ghi đúng vị trí vào file .part rồi đổi tên khi đủ
+def restore_chunked_file(client, entry, save_path, chunk_container=CHUNK_CONTAINER, threads=4, throttle=None):
+    parts, offset = [], 0
+    for digest, length in entry["chunks"]:
+        parts.append((offset, digest, length))
+        offset += length
+
+    os.makedirs(os.path.dirname(save_path) or ".", exist_ok=True)
+    temp_path = save_path + ".part"
+    write_lock = threading.Lock()
+
+    def fetch(part, f):
+        offset, digest, length = part
+        response = client.get(chunk_container, digest)
+        if response.status_code != 200:
+            raise Exception(f"Missing chunk {digest[:12]} - HTTP {response.status_code}")
+        data = response.content
+        if len(data) != length or hashlib.sha256(data).hexdigest() != digest:
+            raise Exception(f"Chunk {digest[:12]} is corrupted")
+        if throttle:
+            throttle(len(data))
+        with write_lock:
+            f.seek(offset)
+            f.write(data)
+
+    try:
+        with open(temp_path, "wb") as f:
+            f.truncate(offset)
+            with ThreadPoolExecutor(max_workers=max(1, threads)) as pool:
+                for _ in pool.map(lambda part: fetch(part, f), parts):
+                    pass
+        os.replace(temp_path, save_path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+# File local có đúng nội dung của mục manifest không: so kích thước rồi SHA-256 từng đoạn theo danh sách chunk
+def chunked_file_matches(path, entry, on_read=None):
+    if os.path.getsize(path) != entry["size"]:
+        return False
+    with open(path, "rb") as f:
+        for digest, length in entry["chunks"]:
+            data = f.read(length)
+            if on_read:
+                on_read(len(data))
+            if hashlib.sha256(data).hexdigest() != digest:
+                return False
+    return True
@@ -0,0 +1,93 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Các mã trả về báo server đang quá tải
+OVERLOAD_STATUSES = (429, 503)
+
+
+# Giới hạn số request đang chạy tới một endpoint (Swift proxy, Orthanc), tự điều chỉnh theo AIMD:
+# sau mỗi "cửa sổ" (số request bằng limit hiện tại) nếu không có lỗi, latency không tăng vọt và
+# throughput không giảm thì tăng limit thêm 1; gặp 429/503/timeout hoặc latency gấp đôi mức nền
+# thì giảm một nửa (tối đa một lần mỗi cửa sổ).
+class AdaptiveLimiter:
+    def __init__(self, name, initial=4, minimum=1, maximum=32):
+        self.name = name
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = max(minimum, min(initial, maximum))
+        self.in_flight = 0
+        self._cond = threading.Condition()
+
+        self._window_count = 0
+        self._window_bytes = 0
+        self._window_latency = 0.0
+        self._window_errors = 0
+        self._window_start = time.monotonic()
+        self._last_throughput = None
+        self._base_latency = None  # Latency thấp nhất quan sát được (EWMA chậm)
+
+    @contextmanager
+    def slot(self, nbytes=0):
+        with self._cond:
+            while self.in_flight >= self.limit:
+                self._cond.wait()
+            self.in_flight += 1
+
+        result = {"status": None, "bytes": nbytes, "error": False}
+        start = time.monotonic()
+        try:
+            yield result
+        except Exception:
+            result["error"] = True  # Timeout / mất kết nối
+            raise
+        finally:
+            self._record(time.monotonic() - start, result)
+
+    def _record(self, latency, result):
+        with self._cond:
+            self.in_flight -= 1
+            overloaded = result["error"] or result["status"] in OVERLOAD_STATUSES
+
+            self._window_count += 1
+            self._window_bytes += result["bytes"] or 0
+            self._window_latency += latency
+            if overloaded:
+                self._window_errors += 1
+            elif self._base_latency is None or latency < self._base_latency:
+                self._base_latency = latency
+            else:
+                self._base_latency = 0.95 * self._base_latency + 0.05 * latency
+
+            if overloaded and self._window_errors == 1:
+                # Giảm ngay ở lỗi đầu tiên của cửa sổ, các lỗi sau trong cùng cửa sổ không giảm tiếp
+                self._set_limit(self.limit // 2)
+            elif self._window_count >= self.limit:
+                self._end_window()
+            self._cond.notify_all()
+
+    def _end_window(self):
+        elapsed = max(time.monotonic() - self._window_start, 1e-6)
+        throughput = self._window_bytes / elapsed
+        avg_latency = self._window_latency / self._window_count
+
+        if self._window_errors:
+            pass  # Đã giảm khi gặp lỗi
+        elif self._base_latency and avg_latency > 2 * self._base_latency:
+            self._set_limit(self.limit // 2)
+        elif self._last_throughput is None or throughput >= 0.95 * self._last_throughput:
+            self._set_limit(self.limit + 1)
+
+        self._last_throughput = throughput
+        self._window_count = 0
+        self._window_bytes = 0
+        self._window_latency = 0.0
+        self._window_errors = 0
+        self._window_start = time.monotonic()
+
+    def _set_limit(self, limit):
+        self.limit = max(self.minimum, min(limit, self.maximum))
+
+    def snapshot(self):
+        with self._cond:
+            return {"name": self.name, "limit": self.limit, "in_flight": self.in_flight}
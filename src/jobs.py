@@ -0,0 +1,402 @@
+import itertools
+import threading
+import time
+from collections import deque
+
+from PyQt5.QtCore import QObject, QRunnable, QTimer, pyqtSignal, pyqtSlot
+
+from progress import Counter, RateMeter, FRAME_INTERVAL_MS
+from rate_limit import FOREGROUND
+
+QUEUED = "Queued"
+RUNNING = "Running"
+PAUSED = "Paused"
+DONE = "Done"
+CANCELLED = "Cancelled"
+STOPPED = "Stopped"  # Dừng khi logout/tắt app, journal giữ lại để tiếp tục lần sau
+
+FINISHED_STATES = (DONE, CANCELLED, STOPPED)
+
+# Số job đã xong còn giữ lại để hiển thị trong cửa sổ Transfers
+KEEP_FINISHED_JOBS = 20
+# Số lỗi tối đa liệt kê trong một thông báo
+MAX_ERROR_LINES = 10
+# Số unit lấy mỗi lần từ nguồn đọc dần (add_source) khi hàng đợi của job cạn
+SOURCE_BATCH = 256
+
+
+# Ném ra trong luồng worker khi job bị hủy hoặc app đang tắt
+class JobCancelled(Exception):
+    pass
+
+
+# Một job upload/download gồm nhiều đơn vị việc (unit). Mỗi unit là một worker xử lý một hoặc
+# nhiều file, được tạo khi tới lượt chạy bằng factory(job).
+# Worker gọi checkpoint() giữa các chunk (qua hàm throttle) để tạm dừng, hủy và đếm byte,
+# báo lỗi bằng add_error(). Các bộ đếm được luồng UI đọc định kỳ, worker không phát signal.
+class TransferJob:
+    _ids = itertools.count(1)
+
+    def __init__(self, kind, name, journal_id=None, lane=FOREGROUND, sealed=True,
+                 on_finished=None, on_progress=None, error_title="Transfer error"):
+        self.id = next(self._ids)
+        self.kind = kind  # "upload" hoặc "download"
+        self.name = name
+        self.journal_id = journal_id
+        self.lane = lane
+        self.sealed = sealed  # False: còn thêm unit (listing theo trang), gọi JobManager.seal khi đủ
+        self.on_finished = on_finished  # on_finished(job), gọi ở luồng UI khi job kết thúc
+        self.on_progress = on_progress  # on_progress(job) mỗi lần UI đọc tiến độ; None thì tính vào progress bar chung
+        self.error_title = error_title
+        self.state = QUEUED
+        self.created = time.time()
+        self.tasks = []  # Task của journal, dùng để dọn file .part khi hủy
+
+        self.units = deque()  # (files, factory) chưa chạy
+        self.source = None    # Iterator (files, size, factory) đọc dần khi units cạn, xem add_source
+        self._source_lock = threading.Lock()
+        self.in_flight = 0
+        self.total_files = 0
+        self.total_bytes = 0
+        self.completed = Counter()    # Số file đã xong
+        self.transferred = Counter()  # Số byte đã truyền
+        self.expected = Counter()     # Số byte worker mới biết khi chạy (vd. kích thước object tải về)
+        self.skipped = Counter()      # Số file bỏ qua vì trên server đã giống hệt
+        self.errors = []
+        self.reported_errors = 0
+        self.rate = RateMeter()
+
+        self._resume_event = threading.Event()
+        self._resume_event.set()
+        self._cancelled = False
+        self._stopped = False
+
+    def add_unit(self, factory, files=1, size=0):
+        if self._cancelled or self._stopped:
+            return
+        self.units.append((files, factory))
+        self.total_files += files
+        self.total_bytes += size
+
+    # Unit lấy dần từ iterator (vd. đọc stream manifest) thay vì thêm hết một lần,
+    # nên bộ nhớ không tăng theo số file. Tổng số file/byte tăng dần theo phần đã đọc.
+    def add_source(self, units):
+        self.source = iter(units)
+
+    # Gọi từ luồng slot khi units cạn: đọc thêm tối đa SOURCE_BATCH unit từ source.
+    # Đọc source có thể chờ lâu (quét thư mục, listing) nên chỉ một slot đọc, slot khác gọi vào
+    # lúc đó trả về ngay để làm việc của job khác thay vì chờ lock.
+    def refill(self):
+        if not self._source_lock.acquire(blocking=False):
+            return
+        try:
+            if self.units or self.source is None:
+                return
+            for _ in range(SOURCE_BATCH):
+                files, size, factory = next(self.source)
+                self.add_unit(factory, files=files, size=size)
+        except StopIteration:
+            self.source = None
+        except Exception as e:
+            self.source = None
+            self.add_error(f"Cannot read the list of files: {e}")
+        finally:
+            self._source_lock.release()
+
+    @property
+    def refilling(self):
+        return self._source_lock.locked()
+
+    @property
+    def has_work(self):
+        return bool(self.units) or self.source is not None
+
+    @property
+    def cancelled(self):
+        return self._cancelled or self._stopped
+
+    @property
+    def finished(self):
+        return self.state in FINISHED_STATES
+
+    @property
+    def completed_files(self):
+        return self.completed.value
+
+    @property
+    def transferred_bytes(self):
+        return self.transferred.value
+
+    @property
+    def expected_bytes(self):
+        return self.total_bytes + self.expected.value
+
+    # Gọi từ luồng worker: đếm byte, chờ khi job đang tạm dừng, ném JobCancelled nếu bị hủy
+    def checkpoint(self, count=0):
+        if count:
+            self.transferred.add(count)
+        if not self._resume_event.is_set():
+            self._resume_event.wait()
+        if self._cancelled or self._stopped:
+            raise JobCancelled(f"Transfer '{self.name}' was cancelled")
+
+    # Bọc hàm throttle của BandwidthLimiter để mỗi chunk đi qua checkpoint của job
+    def throttle(self, throttle=None):
+        def call(count):
+            self.checkpoint(count)
+            if throttle:
+                throttle(count)
+        return call
+
+    def add_error(self, msg):
+        if not self.cancelled:
+            self.errors.append(msg)  # list.append an toàn giữa các luồng
+
+    def pause(self):
+        self._resume_event.clear()
+
+    def resume(self):
+        self._resume_event.set()
+
+    def cancel(self):
+        self._cancelled = True
+        self.source = None
+        self._resume_event.set()  # Đánh thức worker đang chờ để chúng thoát
+
+    def stop(self):
+        self._stopped = True
+        self.source = None
+        self._resume_event.set()
+
+    def snapshot(self):
+        return {
+            "id": self.id, "kind": self.kind, "name": self.name, "state": self.state,
+            "total_files": self.total_files, "completed_files": self.completed_files,
+            "total_bytes": self.expected_bytes, "transferred_bytes": self.transferred_bytes,
+            "rate": self.rate.rate, "errors": len(self.errors), "skipped": self.skipped.value,
+        }
+
+
+# Một luồng của JobManager trong threadpool: lấy lần lượt unit từ các job đang chạy
+# cho tới khi hết việc, nên số runnable không tăng theo số file.
+class _Slot(QRunnable):
+    def __init__(self, manager):
+        super().__init__()
+        self.manager = manager
+
+    @pyqtSlot()
+    def run(self):
+        try:
+            while True:
+                unit = self.manager._take_unit()
+                if unit is None:
+                    break
+                job, files, factory = unit
+                try:
+                    if not job.cancelled:
+                        factory(job).run()
+                except JobCancelled:
+                    pass
+                except Exception as e:
+                    job.add_error(f"Transfer worker crashed: {e}")
+                finally:
+                    self.manager._finish_unit(job, files)
+        finally:
+            self.manager._release_slot()
+
+
+# Hàng đợi job dùng chung cho cả app: tối đa max_jobs job chạy cùng lúc, tối đa max_workers
+# slot trong threadpool (chia lần lượt giữa các job), phần còn lại chờ trong job.
+# Mọi thao tác (submit, pause, cancel...) gọi từ luồng UI. Trạng thái job được cập nhật
+# ở tick() theo FRAME_INTERVAL_MS, mỗi tick phát progress một lần dù có bao nhiêu file xong.
+class JobManager(QObject):
+    changed = pyqtSignal()               # Danh sách job hoặc trạng thái job thay đổi
+    progress = pyqtSignal()              # Mỗi tick khi còn job đang chạy
+    error = pyqtSignal(object, str)      # (job, message) gộp các lỗi mới của job trong một tick
+
+    def __init__(self, threadpool, max_jobs=2, max_workers=16, parent=None):
+        super().__init__(parent)
+        self.threadpool = threadpool
+        self.max_jobs = max_jobs
+        self.max_workers = max_workers
+        self.jobs = []
+        self.slots = 0
+        self.rate = RateMeter()  # Tốc độ tổng của mọi job
+        self._lock = threading.Lock()
+        self._cursor = 0
+        self._closing = False
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.tick)
+
+    def submit(self, job):
+        if self._closing:
+            job.stop()
+        with self._lock:
+            self.jobs.append(job)
+        self.schedule()
+        self._check_finished(job)
+        if not self.timer.isActive():
+            self.rate.reset()
+            self.timer.start(FRAME_INTERVAL_MS)
+        self.changed.emit()
+        return job
+
+    def seal(self, job):
+        job.sealed = True
+        self._check_finished(job)
+        self.changed.emit()
+
+    def active_jobs(self):
+        return [job for job in self.jobs if not job.finished]
+
+    def transferred_bytes(self):
+        return sum(job.transferred_bytes for job in self.jobs)
+
+    def pause(self, job):
+        if job.state in (QUEUED, RUNNING):
+            job.pause()
+            with self._lock:
+                job.state = PAUSED
+            self.schedule()
+            self.changed.emit()
+
+    def resume(self, job):
+        if job.state == PAUSED:
+            job.resume()
+            with self._lock:
+                job.state = QUEUED  # Chạy lại khi còn chỗ, theo thứ tự submit
+            self.schedule()
+            self.changed.emit()
+
+    def cancel(self, job):
+        if job.finished:
+            return
+        job.cancel()
+        with self._lock:
+            job.units.clear()
+        self._check_finished(job)
+        self.changed.emit()
+
+    # Dừng mọi job khi logout/tắt app rồi chờ ngắn các slot của manager thoát (tối đa timeout_ms, không chờ
+    # các việc khác trong threadpool). Worker đang dở sẽ thoát ở checkpoint tiếp theo dù hết thời gian chờ.
+    # Job bị dừng giữ nguyên journal nên sẽ được hỏi tiếp tục ở lần chạy sau.
+    def shutdown(self, timeout_ms=2000):
+        self.timer.stop()
+        with self._lock:
+            self._closing = True
+            for job in self.active_jobs():
+                job.stop()
+                job.units.clear()
+        deadline = time.monotonic() + timeout_ms / 1000
+        while self.slots and time.monotonic() < deadline:
+            time.sleep(0.05)
+        with self._lock:
+            for job in self.active_jobs():
+                job.state = STOPPED
+            self._closing = False  # Manager dùng tiếp được (vd. đăng nhập lại)
+
+    # Dừng mọi job chưa kết thúc (vd. trước khi switch user) mà không chờ: job giữ journal để tiếp tục
+    # sau và chuyển sang STOPPED khi worker cuối cùng của nó thoát (ở tick)
+    def stop_all(self):
+        with self._lock:
+            for job in self.active_jobs():
+                job.stop()
+                job.units.clear()
+        for job in self.active_jobs():
+            self._check_finished(job)
+        self.changed.emit()
+
+    # Chuyển job đang xếp hàng sang chạy khi còn chỗ và mở thêm slot nếu còn việc
+    def schedule(self):
+        if self._closing:
+            return
+        with self._lock:
+            running = [job for job in self.jobs if job.state == RUNNING]
+            for job in self.jobs:
+                if len(running) >= self.max_jobs:
+                    break
+                if job.state == QUEUED:
+                    job.state = RUNNING
+                    running.append(job)
+            # Job còn source được tính như còn đủ việc cho mọi slot (trừ khi đang có slot đọc source)
+            pending = sum(len(job.units) if job.source is None or job.refilling else self.max_workers
+                          for job in running)
+            new_slots = min(self.max_workers - self.slots, pending)
+            self.slots += max(new_slots, 0)
+        for _ in range(new_slots):
+            self.threadpool.start(_Slot(self))
+
+    def tick(self):
+        for job in self.active_jobs():
+            self._report_errors(job)
+            self._check_finished(job)
+            if not job.finished:
+                job.rate.sample(job.transferred_bytes)
+                if job.on_progress:
+                    job.on_progress(job)
+        self.schedule()
+        self.rate.sample(self.transferred_bytes())
+        self.progress.emit()
+        if not self.active_jobs():
+            self.timer.stop()
+
+    # Gọi từ luồng slot: lấy unit tiếp theo, lần lượt giữa các job đang chạy.
+    # Job chỉ còn source thì đọc thêm unit ngoài lock chung rồi lấy lại. Job đang được slot khác
+    # đọc source thì bỏ qua; không còn job nào khác thì slot thoát, tick() mở lại slot khi có unit.
+    def _take_unit(self):
+        while True:
+            with self._lock:
+                running = [job for job in self.jobs if job.state == RUNNING and job.has_work
+                           and (job.units or not job.refilling)]
+                if not running or self._closing:
+                    return None
+                job = running[self._cursor % len(running)]
+                self._cursor += 1
+                if job.units:
+                    files, factory = job.units.popleft()
+                    job.in_flight += 1
+                    return job, files, factory
+            job.refill()
+
+    def _finish_unit(self, job, files):
+        if not job.cancelled:
+            job.completed.add(files)
+        with self._lock:
+            job.in_flight -= 1
+
+    def _release_slot(self):
+        with self._lock:
+            self.slots -= 1
+
+    def _report_errors(self, job):
+        errors = job.errors[job.reported_errors:]
+        if not errors or job.cancelled:
+            return
+        job.reported_errors += len(errors)
+        lines = errors[:MAX_ERROR_LINES]
+        if len(errors) > MAX_ERROR_LINES:
+            lines.append(f"... and {len(errors) - MAX_ERROR_LINES} more")
+        self.error.emit(job, "\n".join(lines))
+
+    def _check_finished(self, job):
+        with self._lock:
+            if job.finished or job.in_flight:
+                return
+            if job._cancelled:
+                job.state = CANCELLED
+            elif job._stopped:
+                job.state = STOPPED
+            elif job.sealed and not job.has_work:
+                job.state = DONE
+            else:
+                return
+            finished = [j for j in self.jobs if j.finished]
+            for old in finished[:-KEEP_FINISHED_JOBS]:
+                self.jobs.remove(old)
+
+        self._report_errors(job)
+        if job.on_progress:
+            job.on_progress(job)
+        if job.on_finished:
+            job.on_finished(job)
+        self.changed.emit()
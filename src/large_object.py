@@ -0,0 +1,425 @@
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from progress import iter_counted
+from rate_limit import chain_callbacks
+from swift_client import bulk_path
+
+MB = 1024 * 1024
+
+# Segment của object "abc" trong container "X" được lưu trong container "X_segments"
+SEGMENT_CONTAINER_SUFFIX = "_segments"
+
+
+class ChecksumError(Exception):
+    pass
+
+
+# So MD5 đã tính khi gửi với ETag Swift trả về (MD5 của dữ liệu server đã lưu)
+def verify_upload_etag(response, md5, name):
+    etag = response.headers.get("Etag", "").strip('"')
+    if md5 and etag and etag != md5:
+        raise ChecksumError(f"Checksum mismatch for '{name}': sent {md5}, stored {etag}")
+
+
+# Đọc một đoạn [offset, offset + length) của file như một file riêng.
+# requests dùng __len__ để đặt Content-Length, on_read được gọi với số byte vừa gửi đi.
+# MD5 được tính ngay khi dữ liệu được đọc ra để gửi (không đọc file lần hai); khi request được
+# gửi lại (seek về đầu) các byte đã băm không bị băm lại và không báo lại cho on_read, nên tiến độ
+# và giới hạn băng thông không đếm hai lần segment được gửi lại.
+class FileSegmentReader:
+    def __init__(self, path, offset=0, length=None, on_read=None):
+        self.path = path
+        self.offset = offset
+        self.length = os.path.getsize(path) - offset if length is None else length
+        self.on_read = on_read
+        self.position = 0
+        self.md5 = hashlib.md5()
+        self.hashed = 0
+        self.reported = 0  # Byte xa nhất đã báo cho on_read
+        self.file = open(path, "rb")
+        self.file.seek(offset)
+
+    def __len__(self):
+        return self.length
+
+    def read(self, size=-1):
+        remaining = self.length - self.position
+        if remaining <= 0:
+            return b""
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        data = self.file.read(size)
+        start = self.position
+        self.position += len(data)
+        if start <= self.hashed < self.position:
+            self.md5.update(data[self.hashed - start:])
+            self.hashed = self.position
+        fresh = self.position - max(start, self.reported)
+        if fresh > 0:
+            self.reported = self.position
+            if self.on_read:
+                self.on_read(fresh)
+        return data
+
+    # MD5 của cả đoạn, None nếu chưa đọc hết
+    def hexdigest(self):
+        return self.md5.hexdigest() if self.hashed >= self.length else None
+
+    def tell(self):
+        return self.position
+
+    def seek(self, position, whence=0):
+        if whence == 0:
+            self.position = position
+        elif whence == 1:
+            self.position += position
+        else:
+            self.position = self.length + position
+        self.file.seek(self.offset + self.position)
+        return self.position
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+# Chọn kích thước segment theo giới hạn của cluster (/info): không vượt max_file_size
+# và số segment không vượt max_manifest_segments
+def choose_segment_size(client, file_size, segment_size):
+    info = client.cluster_info()
+    max_file_size = int(info.get("swift", {}).get("max_file_size", 5 * 1024 * MB))
+    slo = info.get("slo", {})
+    max_segments = int(slo.get("max_manifest_segments", 1000))
+    min_segment_size = int(slo.get("min_segment_size", 1))
+
+    segment_size = max(segment_size, min_segment_size)
+    if file_size > segment_size * max_segments:
+        segment_size = -(-file_size // max_segments)
+    return min(segment_size, max_file_size)
+
+
+# Upload một file lớn thành Static Large Object: các segment được upload song song
+# vào container segments, sau đó ghép lại bằng manifest (PUT ?multipart-manifest=put).
+# progress_callback(n) được gọi với số byte vừa gửi, từ các luồng upload segment.
+# completed_segments: {path: entry} các segment đã upload ở lần trước (journal), sẽ được bỏ qua;
+# on_segment_done(entry) được gọi sau mỗi segment upload xong; throttle(n) giới hạn băng thông.
+def upload_large_object(client, container, filepath, object_name, segment_size, threads,
+                        content_type=None, progress_callback=None,
+                        completed_segments=None, on_segment_done=None, throttle=None):
+    stat = os.stat(filepath)
+    file_size = stat.st_size
+    segment_size = choose_segment_size(client, file_size, segment_size)
+
+    segment_container = container + SEGMENT_CONTAINER_SUFFIX
+    response = client.put(segment_container)
+    if response.status_code not in (201, 202, 204):
+        raise Exception(f"Unable to create segment container: HTTP {response.status_code}")
+
+    # Tên segment giống quy ước của python-swiftclient: <object>/slo/<mtime>/<size>/<segment_size>/<index>
+    segment_prefix = f"{object_name}/slo/{stat.st_mtime:f}/{file_size}/{segment_size}"
+    segments = []
+    for index, offset in enumerate(range(0, file_size, segment_size)):
+        length = min(segment_size, file_size - offset)
+        segments.append((f"{segment_prefix}/{index:08d}", offset, length))
+
+    completed_segments = completed_segments or {}
+
+    def upload_segment(segment):
+        segment_name, offset, length = segment
+        path = f"/{segment_container}/{segment_name}"
+        done = completed_segments.get(path)
+        if done and done.get("size_bytes") == length:
+            if progress_callback:
+                progress_callback(length)
+            return done
+
+        on_read = chain_callbacks(throttle, progress_callback)
+        with FileSegmentReader(filepath, offset, length, on_read=on_read) as reader:
+            response = client.put(segment_container, segment_name, data=reader)
+        if response.status_code not in (201, 202):
+            raise Exception(f"Error uploading segment {segment_name} - HTTP {response.status_code}")
+        # Segment hỏng thì dừng ngay; etag trong manifest là MD5 phía client nên SLO cũng kiểm tra lại
+        verify_upload_etag(response, reader.hexdigest(), segment_name)
+        entry = {
+            "path": path,
+            "etag": reader.hexdigest() or response.headers.get("Etag", "").strip('"'),
+            "size_bytes": length,
+        }
+        if on_segment_done:
+            on_segment_done(entry)
+        return entry
+
+    with ThreadPoolExecutor(max_workers=max(1, threads)) as executor:
+        manifest = list(executor.map(upload_segment, segments))
+
+    headers = {"Content-Type": content_type or "application/octet-stream"}
+    response = client.put(container, object_name, params={"multipart-manifest": "put"},
+                          headers=headers, data=json.dumps(manifest))
+    if response.status_code not in (201, 202):
+        raise Exception(f"Error uploading manifest {object_name} - HTTP {response.status_code}")
+    return response
+
+
+# MD5 của cả file khi các part được tải song song và tới không theo thứ tự: dữ liệu ghi đúng vào
+# vị trí đầu tiên chưa băm được băm ngay trên đường ghi; phần tới trước (part phía sau xong sớm)
+# được băm khi tới lượt, đọc lại từ page cache ngay lúc đó thay vì đọc cả file sau khi tải xong.
+class OrderedHasher:
+    def __init__(self, path):
+        self.path = path
+        self.md5 = hashlib.md5()
+        self.frontier = 0
+        self.pending = {}  # start -> end của các đoạn đã ghi nhưng chưa băm
+        self._lock = threading.Lock()
+
+    # data vừa được ghi vào [offset, offset + len(data))
+    def update(self, offset, data):
+        end = offset + len(data)
+        with self._lock:
+            if offset <= self.frontier < end:
+                self.md5.update(data[self.frontier - offset:])
+                self.frontier = end
+                self._catch_up()
+            elif offset > self.frontier:
+                self.pending[offset] = end
+
+    # Đoạn đã có sẵn trên đĩa (part tải ở lần trước)
+    def add_written(self, offset, length):
+        with self._lock:
+            self.pending[offset] = offset + length
+            self._catch_up()
+
+    def _catch_up(self):
+        while self.frontier in self.pending:
+            end = self.pending.pop(self.frontier)
+            with open(self.path, "rb") as f:
+                f.seek(self.frontier)
+                remaining = end - self.frontier
+                while remaining > 0:
+                    data = f.read(min(MB, remaining))
+                    if not data:
+                        return
+                    self.md5.update(data)
+                    remaining -= len(data)
+            self.frontier = end
+
+    def hexdigest(self):
+        return self.md5.hexdigest()
+
+
+# Danh sách segment của một SLO (GET ?multipart-manifest=get), None nếu không phải SLO
+def get_slo_manifest(client, container, object_name):
+    response = client.get(container, object_name, params={"multipart-manifest": "get", "format": "raw"})
+    if response.status_code != 200 or not response.headers.get("X-Static-Large-Object"):
+        return None
+    try:
+        return response.json()
+    except ValueError:
+        return None
+
+
+# Object gốc của một segment theo quy ước tên <object>/slo/<mtime>/<size>/<segment_size>/<index>
+def segment_owner(segment_name):
+    parts = segment_name.rsplit("/", 5)
+    return parts[0] if len(parts) == 6 and parts[1] == "slo" else None
+
+
+# Xóa object bằng bulk delete kèm segment của các file lớn (SLO), nếu không segment vẫn nằm trong
+# container segment và tính vào dung lượng account. names=None: xóa cả container, container segment
+# của nó và cuối cùng là chính container. Segment chỉ bị xóa sau khi manifest đã xóa xong; segment của
+# object xóa lỗi được giữ lại. Trả về báo cáo gộp như client.bulk_delete.
+def delete_with_segments(client, container, names=None, progress_callback=None):
+    if names is None:
+        items = ((container, obj["name"]) for obj in client.iter_listing(container))
+    else:
+        items = ((container, name) for name in names)
+    report = client.bulk_delete(items, progress_callback=progress_callback)
+    failed = {path for path, _ in report["errors"]}
+
+    def merge(result):
+        report["deleted"] += result["deleted"]
+        report["not_found"] += result["not_found"]
+        report["errors"].extend(result["errors"])
+
+    segment_container = container + SEGMENT_CONTAINER_SUFFIX
+    if client.head(segment_container).status_code in [200, 204]:  # HEAD container trả 204
+        if names is None:
+            listing = client.iter_listing(segment_container)
+        else:
+            listing = client.iter_listing(segment_container, prefix=os.path.commonprefix(list(names)) or None)
+            names = set(names)
+
+        def segments():
+            for obj in listing:
+                owner = segment_owner(obj["name"])
+                if names is not None and owner not in names:
+                    continue
+                if owner is not None and bulk_path(container, owner) in failed:
+                    continue
+                yield segment_container, obj["name"]
+            if names is None and not failed:
+                yield segment_container, None
+
+        merge(client.bulk_delete(segments()))
+
+    # Container chỉ xóa được sau khi object (và segment) bên trong đã xóa xong
+    if names is None:
+        merge(client.bulk_delete([(container, None)], progress_callback=progress_callback))
+    return report
+
+
+# Chia object thành các part (offset, length, md5 mong đợi hoặc None).
+# Với SLO, part trùng với segment để kiểm tra MD5 từng segment ngay khi tải.
+def plan_download_parts(object_size, part_size, manifest=None):
+    parts = []
+    if manifest:
+        offset = 0
+        for segment in manifest:
+            length = int(segment.get("bytes", segment.get("size_bytes", 0)))
+            expected = None if segment.get("sub_slo") or segment.get("range") else segment.get("hash")
+            parts.append((offset, length, expected))
+            offset += length
+        if offset == object_size:
+            return parts
+        parts = []
+
+    for offset in range(0, object_size, part_size):
+        parts.append((offset, min(part_size, object_size - offset), None))
+    return parts
+
+
+# Tải một object lớn bằng nhiều request Range song song, ghi thẳng vào đúng offset của file
+# đã cấp phát trước. Kết quả được kiểm tra theo MD5 từng segment (SLO) hoặc ETag (object thường).
+# completed_parts: các (offset, length) đã có trong file .part từ lần tải trước (journal), sẽ được
+# bỏ qua; on_part_done(offset, length) được gọi sau mỗi part tải xong. Khi có on_part_done, file
+# .part được giữ lại nếu lỗi mạng để lần sau tải tiếp. throttle(n) giới hạn băng thông.
+def download_large_object(client, container, object_name, save_path, object_size, etag,
+                          part_size, threads, is_slo=False, progress_callback=None, chunk_size=MB,
+                          completed_parts=None, on_part_done=None, throttle=None):
+    manifest = get_slo_manifest(client, container, object_name) if is_slo else None
+    parts = plan_download_parts(object_size, part_size, manifest)
+
+    os.makedirs(os.path.dirname(save_path) or ".", exist_ok=True)
+    temp_path = save_path + ".part"
+    # Object thường: ETag là MD5 của toàn bộ nội dung, băm theo thứ tự trong lúc tải
+    hasher = OrderedHasher(temp_path) if not manifest and etag and not is_slo else None
+    completed_parts = completed_parts or set()
+    if completed_parts and os.path.exists(temp_path) and os.path.getsize(temp_path) == object_size:
+        pending = [p for p in parts if (p[0], p[1]) not in completed_parts]
+        if progress_callback:
+            progress_callback(sum(p[1] for p in parts) - sum(p[1] for p in pending))
+        if hasher:
+            for offset, length, _ in parts:
+                if (offset, length) in completed_parts:
+                    hasher.add_written(offset, length)
+        parts = pending
+    else:
+        with open(temp_path, "wb") as f:
+            f.truncate(object_size)
+
+    on_chunk = chain_callbacks(throttle, progress_callback)
+
+    def download_part(part):
+        offset, length, expected_md5 = part
+        headers = {"Range": f"bytes={offset}-{offset + length - 1}"}
+        if etag:
+            headers["If-Match"] = etag  # Object bị ghi đè giữa chừng thì dừng lại thay vì ghép lẫn
+        md5 = hashlib.md5() if expected_md5 else None
+        received = 0
+        with client.get(container, object_name, headers=headers, stream=True) as response:
+            if response.status_code != 206:
+                raise Exception(f"Range request failed for '{object_name}' - HTTP {response.status_code}")
+            with open(temp_path, "r+b") as f:
+                f.seek(offset)
+                for chunk in iter_counted(response.iter_content(chunk_size=chunk_size), on_chunk):
+                    if not chunk:
+                        continue
+                    f.write(chunk)
+                    if hasher:
+                        f.flush()  # Phần này có thể được đọc lại bởi luồng khác khi tới lượt băm
+                        hasher.update(offset + received, chunk)
+                    received += len(chunk)
+                    if md5:
+                        md5.update(chunk)
+        if received != length:
+            raise Exception(f"Incomplete part of '{object_name}' at offset {offset}")
+        if md5 and md5.hexdigest() != expected_md5:
+            raise ChecksumError(f"Checksum mismatch in '{object_name}' at offset {offset}")
+        if on_part_done:
+            on_part_done(offset, length)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, threads)) as executor:
+            for _ in executor.map(download_part, parts):
+                pass
+
+        if hasher and (hasher.frontier != object_size or hasher.hexdigest() != etag.strip('"')):
+            raise ChecksumError(f"Checksum mismatch for '{object_name}'")
+
+        os.replace(temp_path, save_path)
+    except Exception as e:
+        # Dữ liệu sai thì bỏ hẳn; lỗi mạng thì giữ .part nếu có journal để tải tiếp
+        if on_part_done is None or isinstance(e, ChecksumError):
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+        raise
+
+
+def file_md5(path, chunk_size=MB, on_read=None):
+    md5 = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            md5.update(chunk)
+            if on_read:
+                on_read(len(chunk))
+    return md5.hexdigest()
+
+
+# ETag của SLO nếu file được upload bằng upload_large_object với segment_size này:
+# MD5 của chuỗi MD5 các segment nối lại (giống trường "slo_etag" trong listing của SLO)
+def slo_etag(path, segment_size, chunk_size=MB, on_read=None):
+    etags = hashlib.md5()
+    with open(path, "rb") as f:
+        while True:
+            md5 = hashlib.md5()
+            remaining = segment_size
+            while remaining > 0:
+                chunk = f.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                md5.update(chunk)
+                remaining -= len(chunk)
+                if on_read:
+                    on_read(len(chunk))
+            if remaining == segment_size:
+                break
+            etags.update(md5.hexdigest().encode())
+            if remaining > 0:
+                break
+    return etags.hexdigest()
+
+
+# ETag của object theo listing để so với local_etag: với SLO trường "hash" là MD5 của manifest,
+# ETag thật nằm ở "slo_etag" (có dấu ngoặc kép)
+def listing_etag(obj):
+    etag = obj.get("slo_etag") or obj.get("hash")
+    return etag.strip('"') if etag else None
+
+
+# ETag mà object sẽ có trên Swift nếu upload file này theo settings (SLO với file lớn)
+def local_etag(client, path, settings, on_read=None):
+    file_size = os.path.getsize(path)
+    if file_size > settings["slo_threshold_mb"] * MB:
+        segment_size = choose_segment_size(client, file_size, int(settings["segment_size_mb"] * MB))
+        return slo_etag(path, segment_size, on_read=on_read)
+    return file_md5(path, on_read=on_read)
@@ -1,4 +1,4 @@
-import os, json, requests
+import os, json
 from PyQt5.QtWidgets import (
     QWidget, QLabel, QLineEdit, QPushButton, QVBoxLayout, QHBoxLayout,
     QMessageBox, QFrame, QSizePolicy, QApplication, QFileDialog, QDialog,
@@ -8,6 +8,7 @@ from PyQt5.QtGui import QFont, QPixmap, QPalette, QBrush, QIcon
 from PyQt5.QtCore import Qt, QEvent
 
 from main import MainWindow
+from token_manager import TokenManager, AuthError, keystone_login
 from mount_manager import mount_drive, save_rclone_config
 from utils import resource_path
 from secure_json import secure_json_load, secure_json_dump
@@ -251,79 +252,45 @@ class LoginWindow(QWidget):
             return
 
         base_url = get_saved_auth_url()
-        auth_url = base_url.rstrip("/") + "/identity/v3/auth/tokens"
-
-        payload = {
-            "auth": {
-                "identity": {
-                    "methods": ["password"],
-                    "password": {
-                        "user": {
-                            "name": username,
-                            "domain": {"id": "default"},
-                            "password": password
-                        }
-                    }
-                },
-                "scope": {
-                    "project": {
-                        "name": project,
-                        "domain": {"id": "default"}
-                    }
-                }
-            }
-        }
+        auth_url = base_url.rstrip("/") + "/identity/v3"
 
-        headers = {"Content-Type": "application/json"}
+        def authenticate():
+            return keystone_login(auth_url, username, password, project)
 
         try:
-            resp = requests.post(auth_url, json=payload, headers=headers)
-            if resp.status_code == 201:
-                token = resp.headers["X-Subject-Token"]
-                catalog = resp.json()["token"]["catalog"]
-                project_id = resp.json()["token"]["project"]["id"]
-                user_id = resp.json()["token"]["user"]["id"]
-
-                storage_url = None
-                for service in catalog:
-                    if service["type"] == "object-store":
-                        for ep in service["endpoints"]:
-                            if ep["interface"] == "public":
-                                storage_url = ep["url"]
-                                break
-                        break
-
-                if not storage_url:
-                    self.error_label.setText("Swift endpoint not found")
-                    return
-
-                if "/v1/" not in storage_url:
-                    storage_url = storage_url.rstrip("/") + f"/v1/AUTH_{project_id}"
-
-                save_rclone_config(username, password, project, auth_url)
-                save_successful_login(username, password, project, auth_url)
-                mount_drive(username, password, project, auth_url)
-
-                user = {
-                    "username": username,
-                    "password": password,
-                    "project_name": project,
-                    "auth_url": auth_url.replace("/auth/tokens", "").rstrip("/"),
-                    "user_display": f"{username}@{project}",
-                    "user_id": user_id
-                }
-
-                self.main_window = MainWindow(token, storage_url, login_window=self)
-                self.main_window.current_user = user
-                self.main_window.load_saved_users(select_user_display=user["user_display"])
-                self.main_window.show()
-                self.hide()
-
-            elif resp.status_code == 401:
+            info = authenticate()
+
+            save_rclone_config(username, password, project, auth_url)
+            save_successful_login(username, password, project, auth_url)
+            mount_drive(username, password, project, auth_url)
+
+            user = {
+                "username": username,
+                "password": password,
+                "project_name": project,
+                "auth_url": auth_url,
+                "user_display": f"{username}@{project}",
+                "user_id": info["user_id"]
+            }
+
+            # Token manager theo dõi expires_at và tự đăng nhập lại trước khi token hết hạn
+            token_manager = TokenManager(authenticate)
+            token_manager.set_session(info)
+
+            self.main_window = MainWindow(info["token"], info["storage_url"], login_window=self,
+                                          token_manager=token_manager)
+            self.main_window.current_user = user
+            self.main_window.load_saved_users(select_user_display=user["user_display"])
+            self.main_window.show()
+            self.hide()
+
+        except AuthError as e:
+            if e.status_code == 401:
                 self.error_label.setText("Wrong Username or Password")
+            elif e.status_code:
+                self.error_label.setText(f"Login error: HTTP {e.status_code}")
             else:
-                self.error_label.setText(f"Login error: HTTP {resp.status_code}")
-
+                self.error_label.setText(str(e))
         except Exception as e:
             self.error_label.setText(f"Connection error: {str(e)}")
 
@@ -428,6 +395,10 @@ class LoginWindow(QWidget):
 
 if __name__ == "__main__":
     import sys
+    import logging
+    import multiprocessing
+    multiprocessing.freeze_support()  # Process pool băm chunk (ChunkStore) trong exe không mở lại cửa sổ login
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s [%(name)s] %(message)s")
     app = QApplication(sys.argv)
     login_window = LoginWindow()
     login_window.show()
@@ -1,4 +1,4 @@
-import json, os, sys, requests, mimetypes, re
+import json, os, sys, requests, mimetypes, re, hashlib, multiprocessing, logging
 from datetime import datetime, timedelta, time as dt_time
 from zoneinfo import ZoneInfo
 from urllib.parse import quote
@@ -6,8 +6,8 @@ from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QPushButton, QFileDialog, QLineEdit,
     QHBoxLayout, QTableWidget, QTableWidgetItem, QMessageBox, QMenu,
     QLabel, QHeaderView, QProgressBar, QSizePolicy, QApplication, QInputDialog, QAbstractItemView,
-    QComboBox, QListWidgetItem, QAction, QStackedWidget, QFrame, QTextEdit, QMainWindow, QTabWidget, QDialog,
-    QDialogButtonBox, QRadioButton, QSpacerItem, QGroupBox, QFormLayout
+    QComboBox, QAction, QStackedWidget, QFrame, QTextEdit, QMainWindow, QTabWidget, QDialog,
+    QDialogButtonBox, QRadioButton, QSpacerItem, QGroupBox, QFormLayout, QTreeWidget, QTreeWidgetItem, QSpinBox
 )
 from PyQt5.QtCore import Qt, pyqtSignal, QRunnable, QThreadPool, QObject, pyqtSlot, QTimer, QEvent
 from PyQt5.QtGui import QIcon, QDropEvent, QPixmap, QPalette, QBrush
@@ -20,8 +20,33 @@ from secure_json import secure_json_load, secure_json_dump
 
 import manual
 
-from utils import resource_path
+from utils import resource_path, load_transfer_settings, save_config
+from large_object import (upload_large_object, download_large_object, verify_upload_etag, local_etag,
+                          listing_etag, FileSegmentReader, ChecksumError, MB, SEGMENT_CONTAINER_SUFFIX,
+                          delete_with_segments)
+from archive_upload import plan_archive_batches, upload_archive
 from mount_manager import mount_drive, unmount_drive
+from swift_client import SwiftClient, bulk_path
+from backup_manifest import BackupManifest, file_state
+from chunk_store import ChunkStore, CHUNK_CONTAINER, restore_chunked_file, chunked_file_matches
+from snapshots import (SNAPSHOT_CONTAINER, save_snapshot_manifest, load_snapshot_manifest, load_snapshot_index,
+                       iter_snapshot_manifest)
+from transfer_journal import TransferJournal, task_key
+from token_manager import keystone_login
+from concurrency import AdaptiveLimiter
+from retry import RetryPolicy
+from orthanc_client import OrthancClient
+from rate_limit import BandwidthLimiter, chain_callbacks, FOREGROUND, BACKGROUND
+from progress import ThroughputMonitor, iter_counted, estimate_eta, format_eta
+from retention import DEFAULT_RETENTION, retention_enabled, plan_prune, prune_snapshots
+from scanner import TreeScanner
+from quota import QuotaReservation
+from jobs import TransferJob, JobManager, JobCancelled, RUNNING, DONE, CANCELLED, MAX_ERROR_LINES
+
+logger = logging.getLogger(__name__)
+
+# Backup theo lịch gặp lúc đang xóa snapshot hết hạn thì thử lại sau khoảng này
+PRUNE_WAIT_MS = 30 * 1000
 
 #Hai bảng pie chart và line chart ở tab Dashboard
 class PieChartCanvas(FigureCanvas):
@@ -130,101 +155,484 @@ class LineChartCanvas(FigureCanvas):
         self.draw()
 
 
-#Các luồng để xử lý upload,delete,download
-class UploadWorkerSignals(QObject):
-    progress = pyqtSignal(int)
-    error = pyqtSignal(str)
-    done = pyqtSignal()
+# Sparkline tốc độ upload/download (MB/s) trong 2 phút gần nhất
+class ThroughputCanvas(FigureCanvas):
+    def __init__(self, parent=None):
+        fig = Figure(figsize=(5, 1.6))
+        self.axes = fig.add_subplot(111)
+        super().__init__(fig)
+        self.setFixedHeight(160)
+        self.plot([], [])
 
-class UploadWorker(QRunnable):
-    def __init__(self, token, storage_url, container, filepath, object_name, index, total):
-        super().__init__()
-        self.token = token
-        self.storage_url = storage_url
+    def plot(self, upload_rates, download_rates):
+        self.axes.clear()
+        self.axes.plot([r / MB for r in upload_rates], color='#007acc', label="Upload")
+        self.axes.plot([r / MB for r in download_rates], color='#2ca02c', label="Download")
+        self.axes.set_ylabel("MB/s")
+        self.axes.set_xticks([])
+        self.axes.set_ylim(bottom=0)
+        self.axes.legend(loc="upper left", fontsize=8)
+        self.axes.grid(True)
+        self.figure.tight_layout()
+        self.draw()
+
+#Các luồng để xử lý upload,delete,download
+# UploadWorker/ArchiveUploadWorker/DownloadWorker chạy trong slot của JobManager (jobs.py):
+# không phát signal, byte đi qua job.throttle (đếm byte, pause/cancel) và lỗi báo bằng job.add_error.
+class UploadWorker:
+    def __init__(self, client, container, filepath, object_name, job, settings=None,
+                 journal=None, throttle=None, remote_hash=None, copy_from=None):
+        self.client = client
         self.container = container
         self.filepath = filepath
         self.object_name = object_name
-        self.index = index
-        self.total = total
-        self.signals = UploadWorkerSignals()
+        self.job = job
+        self.settings = settings or load_transfer_settings()
+        self.journal = journal  # TransferJournal: ghi lại file/segment đã xong để tiếp tục khi bị ngắt
+        self.job_id = job.journal_id
+        self.throttle = throttle  # job.throttle(...) theo lane của job
+        self.remote_hash = remote_hash  # Có object cùng kích thước trên server: chỉ upload nếu khác hash
+        self.copy_from = copy_from  # Object cùng container của snapshot trước: file không đổi thì copy trên server
 
-    @pyqtSlot()
     def run(self):
+        key = task_key(self.container, self.object_name)
         try:
-            url = f"{self.storage_url}/{self.container}/{self.object_name}"
             mime_type, _ = mimetypes.guess_type(self.filepath)
-            headers = {
-                "X-Auth-Token": self.token,
-                "Content-Type": mime_type or "application/octet-stream"
-            }
+            file_size = os.path.getsize(self.filepath)
+            md5 = None
+            unchanged = self.copy_from is not None and not self.remote_hash
+
+            if self.remote_hash:
+                # Băm file ngay trong worker để chạy song song với các upload khác của job
+                etag = local_etag(self.client, self.filepath, self.settings, on_read=lambda n: self.job.checkpoint())
+                unchanged = etag == self.remote_hash
+                md5 = etag
+
+            if unchanged and self.copy_from:
+                response = self.client.copy(self.container, self.object_name, self.container, self.copy_from)
+                # Object nguồn không còn (vd. snapshot cũ đã bị xóa): upload lại như bình thường
+                unchanged = response.status_code in [201, 202]
+            if unchanged:
+                self.job.skipped.add(1)
+                self.job.expected.add(-file_size)
+                if self.journal:
+                    self.journal.mark_done(self.job_id, key)
+                return
+
+            # File lớn: chia segment, upload song song rồi ghép bằng manifest SLO
+            if file_size > self.settings["slo_threshold_mb"] * MB:
+                completed_segments, on_segment_done = None, None
+                if self.journal:
+                    completed_segments = self.journal.completed_segments(self.job_id, key)
+                    on_segment_done = lambda entry: self.journal.mark_segment(self.job_id, key, entry)
+                response = upload_large_object(
+                    self.client, self.container, self.filepath, self.object_name,
+                    segment_size=int(self.settings["segment_size_mb"] * MB),
+                    threads=self.settings["segment_threads"],
+                    content_type=mime_type,
+                    completed_segments=completed_segments,
+                    on_segment_done=on_segment_done,
+                    throttle=self.throttle
+                )
+            else:
+                response = self.put_object(mime_type, md5)
+
+            if response.status_code == 422:
+                self.job.add_error(f"Checksum mismatch for '{self.object_name}', the file was not stored")
+            elif response.status_code not in [201, 202]:
+                self.job.add_error(f"Error uploading {self.object_name} - HTTP {response.status_code}")
+            elif self.journal:
+                self.journal.mark_done(self.job_id, key)
+        except JobCancelled:
+            pass  # Segment đã xong vẫn nằm trong journal
+        except ChecksumError as e:
+            # Segment hỏng: manifest chưa được tạo, object cũ vẫn nguyên; object thường hỏng đã bị xóa
+            self.job.add_error(str(e))
+        except Exception as e:
+            self.job.add_error(f"Error uploading {self.object_name}: {str(e)}")
+
+    # PUT một object thường. MD5 đã biết trước (vd. vừa băm để so với server) thì gửi kèm ETag, Swift
+    # trả 422 nếu dữ liệu tới bị sai. Nếu không, MD5 được tính trong lúc gửi (không đọc file hai lần)
+    # rồi so với ETag server trả về: lệch thì gửi lại một lần, vẫn lệch thì xóa object hỏng.
+    def put_object(self, mime_type, md5=None):
+        headers = {"Content-Type": mime_type or "application/octet-stream"}
+        if md5:
+            headers["ETag"] = md5
+        attempts = 2  # Lần đầu và một lần gửi lại khi lệch checksum
+        for attempt in range(attempts):
+            with FileSegmentReader(self.filepath, on_read=self.throttle) as f:
+                response = self.client.put(self.container, self.object_name, headers=headers, data=f)
+            if md5 or response.status_code not in [201, 202]:
+                return response
+            try:
+                verify_upload_etag(response, f.hexdigest(), self.object_name)
+                return response
+            except ChecksumError:
+                if attempt + 1 < attempts:
+                    self.job.expected.add(f.length)  # Byte gửi lại được tính thêm vào tiến độ
+                    continue
+                try:
+                    self.client.delete(self.container, self.object_name)
+                except Exception:
+                    pass
+                raise
+
+# Backup dạng chunked: chia file thành chunk theo nội dung (băm trên process pool của ChunkStore),
+# chỉ upload chunk chưa có trên server và ghi danh sách chunk của file vào entries[filepath]
+class ChunkBackupWorker:
+    def __init__(self, store, filepath, object_name, state, job, entries, throttle=None):
+        self.store = store
+        self.filepath = filepath
+        self.object_name = object_name
+        self.state = state  # Trạng thái file lúc quét (file_state)
+        self.job = job
+        self.entries = entries
+        self.throttle = throttle
 
+    def run(self):
+        try:
+            chunks = self.store.chunk(self.filepath)
+            self.job.checkpoint()
+            offset = 0
             with open(self.filepath, "rb") as f:
-                response = requests.put(url, headers=headers, data=f)
+                for digest, length in chunks:
+                    if self.store.claim(digest):
+                        f.seek(offset)
+                        stored = False
+                        try:
+                            self.store.upload(digest, f.read(length), self.throttle)
+                            stored = True
+                        finally:
+                            self.store.release(digest, stored)
+                    else:
+                        self.job.expected.add(-length)  # Chunk đã có trên server, không cần gửi
+                    offset += length
+            self.entries[self.filepath] = dict(self.state, object=self.object_name,
+                                               chunks=[[digest, length] for digest, length in chunks])
+        except JobCancelled:
+            pass
+        except Exception as e:
+            self.job.add_error(f"Error backing up {self.object_name}: {str(e)}")
 
-            if response.status_code not in [201, 202]:
-                self.signals.error.emit(f"Error uploading {self.object_name} - HTTP {response.status_code}")
+# Upload nhiều file nhỏ trong một request: đóng gói tar trên đường truyền, cluster tự giải nén
+class ArchiveUploadWorker:
+    def __init__(self, client, container, tasks, job, journal=None, throttle=None):
+        self.client = client
+        self.container = container
+        self.tasks = tasks  # Các task (filepath, container, object_name) cùng container
+        self.job = job
+        self.journal = journal
+        self.job_id = job.journal_id
+        self.throttle = throttle
+
+    def run(self):
+        try:
+            created, errors = upload_archive(self.client, self.container, self.tasks, throttle=self.throttle)
+            failed = {name for name, _ in errors}
+            # Chỉ ghi nhận vào journal khi số file tạo được khớp với kết quả của middleware
+            if self.journal and created + len(failed) >= len(self.tasks):
+                for _, container, object_name in self.tasks:
+                    if object_name not in failed:
+                        self.journal.mark_done(self.job_id, task_key(container, object_name))
+            for name, status in errors:
+                self.job.add_error(f"Error uploading {name} in archive to '{self.container}' - {status}")
+        except JobCancelled:
+            pass
         except Exception as e:
-            self.signals.error.emit(f"Error uploading {self.object_name}: {str(e)}")
+            self.job.add_error(f"Error uploading archive to '{self.container}': {str(e)}")
+
+class BulkDeleteWorkerSignals(QObject):
+    listed = pyqtSignal(int)     # Số object tìm thấy khi xóa theo prefix
+    progress = pyqtSignal(int)   # Số item đã xử lý trong lần báo này
+    finished = pyqtSignal(dict)  # Báo cáo gộp: deleted / not_found / errors
+    error = pyqtSignal(str)
 
-        self.signals.done.emit()
-        if self.index + 1 == self.total:
-            self.signals.done.emit()
+# Ghi manifest của snapshot backup (hash lấy từ listing của snapshot) và manifest local trong luồng nền
+class BackupManifestWorkerSignals(QObject):
+    finished = pyqtSignal()
+    error = pyqtSignal(str)
 
-class DeleteWorker(QRunnable):
-    def __init__(self, token, storage_url, container, object_name, index, total):
+class BackupManifestWorker(QRunnable):
+    def __init__(self, client, manifest, snapshot, states, local=True):
         super().__init__()
-        self.token = token
-        self.storage_url = storage_url
-        self.container = container
-        self.object_name = object_name
-        self.index = index
-        self.total = total
-        self.signals = UploadWorkerSignals()
+        self.client = client
+        self.manifest = manifest
+        self.snapshot = snapshot
+        self.states = states
+        self.local = local  # False: chỉ ghi manifest trên server, manifest local giữ snapshot trước
+        self.signals = BackupManifestWorkerSignals()
 
     @pyqtSlot()
     def run(self):
         try:
-            url = f"{self.storage_url}/{self.container}/{self.object_name}"
-            headers = {"X-Auth-Token": self.token}
-            response = requests.delete(url, headers=headers)
+            prefix = f"{self.snapshot}/"
+            hashes = {obj["name"]: listing_etag(obj)
+                      for obj in self.client.iter_listing(SNAPSHOT_CONTAINER, prefix=prefix)}
+            entries, files = {}, {}
+            for path, state in self.states.items():
+                if hashes.get(state["object"]):
+                    entries[path] = dict(state, hash=hashes[state["object"]])
+                    files[state["object"][len(prefix):]] = {"size": state["size"], "mtime": state["mtime"],
+                                                            "hash": hashes[state["object"]]}
+            save_snapshot_manifest(self.client, self.snapshot, "files", files)
+            if self.local:
+                self.manifest.save(self.snapshot, entries)
+            self.signals.finished.emit()
+        except Exception as e:
+            self.signals.error.emit(str(e))
+
+# Áp dụng retention policy cho các snapshot backup trong luồng nền: dry_run chỉ tính plan
+class PruneWorkerSignals(QObject):
+    finished = pyqtSignal(dict)  # plan của plan_prune, có thêm "report" nếu đã xóa
+    error = pyqtSignal(str)
 
-            if response.status_code not in [204, 404]:
-                self.signals.error.emit(f"Cannot delete {self.object_name} - HTTP {response.status_code}")
+class PruneWorker(QRunnable):
+    def __init__(self, client, policy, protected=(), dry_run=True):
+        super().__init__()
+        self.client = client
+        self.policy = policy
+        self.protected = protected
+        self.dry_run = dry_run
+        self.signals = PruneWorkerSignals()
+
+    @pyqtSlot()
+    def run(self):
+        try:
+            plan = plan_prune(self.client, self.policy, self.protected)
+            if not self.dry_run and plan["expired"]:
+                plan["report"] = prune_snapshots(self.client, plan)
+            self.signals.finished.emit(plan)
         except Exception as e:
-            self.signals.error.emit(f"Error deleting {self.object_name}: {str(e)}")
-        self.signals.done.emit()
+            self.signals.error.emit(str(e))
 
-class DownloadWorker(QRunnable):
-    def __init__(self, token, storage_url, container, object_name, save_path, index, total):
+class BulkDeleteWorker(QRunnable):
+    def __init__(self, client, container, names=None, prefix=None):
         super().__init__()
-        self.token = token
-        self.storage_url = storage_url
+        self.client = client
+        self.container = container
+        self.names = names  # Các object cần xóa, None là xóa cả container
+        self.prefix = prefix  # Xóa các object theo prefix, liệt kê ngay trong worker
+        self.signals = BulkDeleteWorkerSignals()
+
+    @pyqtSlot()
+    def run(self):
+        try:
+            names = self.names
+            if self.prefix is not None:
+                names = [obj["name"] for obj in self.client.iter_listing(self.container, prefix=self.prefix)]
+                self.signals.listed.emit(len(names))
+                if not names:
+                    self.signals.finished.emit({"deleted": 0, "not_found": 0, "errors": []})
+                    return
+            report = delete_with_segments(self.client, self.container, names,
+                                          progress_callback=self.signals.progress.emit)
+            self.signals.finished.emit(report)
+        except Exception as e:
+            self.signals.error.emit(f"Error deleting: {str(e)}")
+
+class DownloadWorker:
+    def __init__(self, client, container, object_name, save_path, job, settings=None,
+                 journal=None, throttle=None, size=None):
+        self.client = client
         self.container = container
         self.object_name = object_name
         self.save_path = save_path
-        self.index = index
-        self.total = total
-        self.signals = UploadWorkerSignals()
+        self.job = job
+        self.settings = settings or load_transfer_settings()
+        self.journal = journal  # TransferJournal: ghi lại file/đoạn byte đã tải để tiếp tục khi bị ngắt
+        self.job_id = job.journal_id
+        self.throttle = throttle  # job.throttle(...) theo lane của job
+        self.size = size  # Kích thước từ listing; None thì báo cho job khi biết Content-Length
+        self.object_size = 0
+
+    def run(self):
+        key = task_key(self.container, self.object_name)
+        temp_path = self.save_path + ".part"
+        large = None
+        try:
+            part_size = int(self.settings["download_part_size_mb"] * MB)
+            finished = False
+
+            # Dùng "with" để trả kết nối về pool kể cả khi không đọc hết body
+            with self.client.get(self.container, self.object_name, stream=True) as response:
+                if response.status_code == 200:
+                    self.object_size = int(response.headers.get("Content-Length", 0))
+                    if self.size is None:
+                        self.job.expected.add(self.object_size)
+                    if self.object_size > part_size and response.headers.get("Accept-Ranges") == "bytes":
+                        # Object lớn: bỏ stream này, chuyển sang tải song song theo Range
+                        large = (response.headers.get("Etag"), bool(response.headers.get("X-Static-Large-Object")))
+                    else:
+                        # Ghi ra .part rồi mới đổi tên, không để lại file dở trong thư mục đích.
+                        # Object thường có ETag là MD5 nội dung, được băm ngay trên đường ghi.
+                        etag = response.headers.get("Etag", "").strip('"')
+                        is_manifest = (response.headers.get("X-Static-Large-Object")
+                                       or response.headers.get("X-Object-Manifest"))
+                        md5 = hashlib.md5() if etag and not is_manifest else None
+                        os.makedirs(os.path.dirname(self.save_path), exist_ok=True)
+                        with open(temp_path, "wb") as f:
+                            for chunk in iter_counted(response.iter_content(chunk_size=MB), self.throttle):
+                                if chunk:
+                                    f.write(chunk)
+                                    if md5:
+                                        md5.update(chunk)
+                        if md5 and md5.hexdigest() != etag:
+                            raise ChecksumError(f"Checksum mismatch for '{self.object_name}'")
+                        os.replace(temp_path, self.save_path)
+                        finished = True
+                else:
+                    self.job.add_error(f"Error downloading '{self.object_name}' - HTTP {response.status_code}")
+
+            if large:
+                etag, is_slo = large
+                completed_parts, on_part_done = None, None
+                if self.journal:
+                    completed_parts = self.journal.completed_ranges(self.job_id, key, etag)
+                    on_part_done = lambda offset, length: self.journal.mark_range(
+                        self.job_id, key, etag, offset, length)
+                download_large_object(
+                    self.client, self.container, self.object_name, self.save_path,
+                    object_size=self.object_size, etag=etag,
+                    part_size=part_size, threads=self.settings["download_threads"],
+                    is_slo=is_slo,
+                    completed_parts=completed_parts, on_part_done=on_part_done,
+                    throttle=self.throttle
+                )
+                finished = True
+
+            if finished and self.journal:
+                self.journal.mark_done(self.job_id, key)
+            return finished
+        except Exception as e:
+            # File .part của object lớn do download_large_object quyết định giữ hay xóa
+            if not large and os.path.exists(temp_path):
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+            if not isinstance(e, JobCancelled):
+                self.job.add_error(f"Error downloading '{self.object_name}': {str(e)}")
+            return False
+
+# Khôi phục một file của snapshot backup về save_path: bỏ qua nếu file trên đĩa đã giống hệt,
+# snapshot thường tải bằng DownloadWorker (Range song song cho file lớn), snapshot chunked ghép từ các chunk.
+# Xong thì đặt lại mtime của file gốc.
+class RestoreWorker:
+    def __init__(self, client, snapshot, header, entry, save_path, job, settings=None, throttle=None):
+        self.client = client
+        self.snapshot = snapshot
+        self.header = header  # Dòng đầu của manifest (format, chunk_container)
+        self.entry = entry
+        self.save_path = save_path
+        self.job = job
+        self.settings = settings or load_transfer_settings()
+        self.throttle = throttle
 
-    @pyqtSlot()
     def run(self):
+        path = self.entry["path"]
+        mtime = self.entry.get("mtime")
         try:
-            url = f"{self.storage_url}/{self.container}/{self.object_name}"
-            headers = {"X-Auth-Token": self.token}
-            response = requests.get(url, headers=headers, stream=True)
-
-            if response.status_code == 200:
-                os.makedirs(os.path.dirname(self.save_path), exist_ok=True)
-                with open(self.save_path, "wb") as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        if chunk:
-                            f.write(chunk)
+            if os.path.isfile(self.save_path) and self.matches():
+                self.job.skipped.add(1)
+                self.job.expected.add(-self.entry["size"])
+            elif self.header["format"] == "chunked":
+                restore_chunked_file(self.client, self.entry, self.save_path,
+                                     chunk_container=self.header.get("chunk_container", CHUNK_CONTAINER),
+                                     threads=self.settings["download_threads"], throttle=self.throttle)
             else:
-                self.signals.error.emit(f"Error downloading '{self.object_name}' - HTTP {response.status_code}")
+                worker = DownloadWorker(self.client, SNAPSHOT_CONTAINER, f"{self.snapshot}/{path}", self.save_path,
+                                        self.job, self.settings, throttle=self.throttle, size=self.entry["size"])
+                if not worker.run():
+                    return  # Lỗi đã được DownloadWorker báo cho job
+            if mtime:
+                os.utime(self.save_path, ns=(mtime, mtime))
+        except JobCancelled:
+            pass
+        except Exception as e:
+            self.job.add_error(f"Error restoring '{path}': {str(e)}")
+
+    # Cùng kích thước và mtime thì coi như giống (như lúc backup), nếu không thì so nội dung với hash
+    def matches(self):
+        if os.path.getsize(self.save_path) != self.entry["size"]:
+            return False
+        if self.entry.get("mtime") and os.stat(self.save_path).st_mtime_ns == self.entry["mtime"]:
+            return True
+        on_read = lambda n: self.job.checkpoint()
+        if self.header["format"] == "chunked":
+            return chunked_file_matches(self.save_path, self.entry, on_read=on_read)
+        if self.entry.get("hash"):
+            return local_etag(self.client, self.save_path, self.settings, on_read=on_read) == self.entry["hash"]
+        return False
+
+#Luồng tải listing của folder theo từng trang để bảng file hiện dần
+class ListingWorkerSignals(QObject):
+    page = pyqtSignal(list)
+    finished = pyqtSignal()
+    error = pyqtSignal(str)
+
+class ListingWorker(QRunnable):
+    def __init__(self, client, container, prefix=None, delimiter=None):
+        super().__init__()
+        self.client = client
+        self.container = container
+        self.prefix = prefix
+        self.delimiter = delimiter
+        self.signals = ListingWorkerSignals()
+
+    @pyqtSlot()
+    def run(self):
+        try:
+            for page in self.client.iter_listing_pages(self.container, prefix=self.prefix,
+                                                       delimiter=self.delimiter):
+                self.signals.page.emit(page)
         except Exception as e:
-            self.signals.error.emit(f"Error downloading '{self.object_name}': {str(e)}")
+            self.signals.error.emit(str(e))
+        self.signals.finished.emit()
+
+# Thống kê cho Dashboard trong luồng nền: đi qua listing của mọi folder một lần để lấy
+# dung lượng/số file theo loại và thời điểm các file upload trong 1 giờ qua
+class DashboardStatsWorkerSignals(QObject):
+    finished = pyqtSignal(dict)  # sizes / counts theo loại file, timestamps (giờ Việt Nam)
+
+class DashboardStatsWorker(QRunnable):
+    def __init__(self, client, containers, file_types):
+        super().__init__()
+        self.client = client
+        self.containers = containers
+        self.file_types = file_types  # {loại: [extension]}, "Others" cho phần còn lại
+        self.signals = DashboardStatsWorkerSignals()
+
+    @pyqtSlot()
+    def run(self):
+        sizes = {key: 0 for key in self.file_types}
+        counts = {key: 0 for key in self.file_types}
+        timestamps = []
+        tz = ZoneInfo("Asia/Ho_Chi_Minh")
+        threshold = datetime.now(tz) - timedelta(hours=1)
 
-        self.signals.done.emit()
+        for container in self.containers:
+            try:
+                objects = list(self.client.iter_listing(container))
+            except Exception:
+                continue
+            for obj in objects:
+                name = obj.get("name")
+                if not name:
+                    continue
+                ext = os.path.splitext(name)[1].lower()
+                file_type = next((t for t, exts in self.file_types.items() if ext in exts), "Others")
+                sizes[file_type] += int(obj.get("bytes", 0))
+                counts[file_type] += 1
+
+                last_modified = obj.get("last_modified")
+                if last_modified:
+                    try:
+                        dt = datetime.fromisoformat(last_modified).replace(tzinfo=ZoneInfo("UTC")).astimezone(tz)
+                        if dt >= threshold:
+                            timestamps.append(dt)
+                    except Exception:
+                        pass
+        self.signals.finished.emit({"sizes": sizes, "counts": counts, "timestamps": timestamps})
 
 #Luồng truyền thông tin DICOM từ web về app
 class StudyListWorkerSignals(QObject):
@@ -232,10 +640,10 @@ class StudyListWorkerSignals(QObject):
     error = pyqtSignal(str)
 
 class StudyListWorker(QRunnable):
-    def __init__(self, dicom_url, study_ids, offset=0, limit=10):
+    def __init__(self, client, study_ids, offset=0, limit=10):
         super().__init__()
         self.signals = StudyListWorkerSignals()
-        self.dicom_url = dicom_url
+        self.client = client
         self.study_ids = study_ids
         self.offset = offset
         self.limit = limit
@@ -250,7 +658,7 @@ class StudyListWorker(QRunnable):
             # Bước 2: hàm tải từng study
             def fetch_study(study_id):
                 try:
-                    info = requests.get(f"{self.dicom_url}/studies/{study_id}").json()
+                    info = self.client.get(f"/studies/{study_id}").json()
                     tags = info.get("MainDicomTags", {})
                     patient_id = info.get("PatientMainDicomTags", {}).get("PatientID", "Unknown")
                     patient_name = info.get("PatientMainDicomTags", {}).get("PatientName", "Unknown")
@@ -261,8 +669,8 @@ class StudyListWorker(QRunnable):
                     print(f"[!] Error loading study {study_id}: {e}")
                     return None
 
-            # Bước 3: chạy song song
-            with ThreadPoolExecutor(max_workers=4) as executor:
+            # Bước 3: chạy song song, số request thật sự đồng thời do limiter của Orthanc quyết định
+            with ThreadPoolExecutor(max_workers=self.client.limiter.maximum) as executor:
                 for result in executor.map(fetch_study, study_subset):
                     if result:
                         results.append(result)
@@ -283,25 +691,26 @@ class DownloadDicomWorkerSignals(QObject):
         super().__init__()
 
 class DownloadDicomWorker(QRunnable):
-    def __init__(self, dicom_url, instance_ids, temp_dir):
+    def __init__(self, client, instance_ids, temp_dir, throttle=None):
         super().__init__()
-        self.dicom_url = dicom_url
+        self.client = client
+        self.throttle = throttle
         self.instance_ids = instance_ids
         self.temp_dir = temp_dir
         self.signals = DownloadDicomWorkerSignals()
 
     def run(self):
         try:
-            import os, requests
             os.makedirs(self.temp_dir, exist_ok=True)
 
             def download_one(instance_id):
                 try:
-                    url = f"{self.dicom_url}/instances/{instance_id}/file"
-                    dcm = requests.get(url).content
                     path = os.path.join(self.temp_dir, f"{instance_id}.dcm")
-                    with open(path, "wb") as f:
-                        f.write(dcm)
+                    with self.client.get(f"/instances/{instance_id}/file", stream=True) as response:
+                        response.raise_for_status()
+                        with open(path, "wb") as f:
+                            for chunk in iter_counted(response.iter_content(chunk_size=MB), self.throttle):
+                                f.write(chunk)
                     return path
                 except Exception as e:
                     print(f"[!] Failed to download {instance_id}: {e}")
@@ -309,7 +718,7 @@ class DownloadDicomWorker(QRunnable):
 
             filepaths = []
             total = len(self.instance_ids)
-            with ThreadPoolExecutor(max_workers=4) as executor:
+            with ThreadPoolExecutor(max_workers=self.client.limiter.maximum) as executor:
                 for idx, path in enumerate(executor.map(download_one, self.instance_ids)):
                     if path:
                         filepaths.append(path)
@@ -362,6 +771,196 @@ class FileViewerWindow(QMainWindow):
         if self.tab_widget.count() == 0:
             self.close()
 
+#Cửa sổ danh sách job upload/download: tạm dừng, tiếp tục, hủy
+class TransfersWindow(QDialog):
+    def __init__(self, jobs, parent=None):
+        super().__init__(parent)
+        self.jobs = jobs
+        self.setWindowTitle("Transfers")
+        self.resize(700, 350)
+
+        layout = QVBoxLayout(self)
+        self.table = QTableWidget(0, 7)
+        self.table.setHorizontalHeaderLabels(["Name", "Type", "Status", "Files", "Size", "Speed", "ETA"])
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SingleSelection)
+        layout.addWidget(self.table)
+
+        buttons = QHBoxLayout()
+        self.pause_btn = QPushButton("Pause")
+        self.resume_btn = QPushButton("Resume")
+        self.cancel_btn = QPushButton("Cancel")
+        self.pause_btn.clicked.connect(lambda: self.apply(self.jobs.pause))
+        self.resume_btn.clicked.connect(lambda: self.apply(self.jobs.resume))
+        self.cancel_btn.clicked.connect(self.cancel_selected)
+        buttons.addStretch()
+        for btn in [self.pause_btn, self.resume_btn, self.cancel_btn]:
+            buttons.addWidget(btn)
+        layout.addLayout(buttons)
+
+        self.jobs.changed.connect(self.refresh)
+        # Số byte thay đổi liên tục mà không có signal, làm mới định kỳ khi cửa sổ đang mở
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(1000)
+        self.refresh()
+
+    def refresh(self):
+        if not self.isVisible():
+            return
+        selected = self.selected_job()
+        jobs = list(reversed(self.jobs.jobs))
+        self.table.setRowCount(len(jobs))
+        for row, job in enumerate(jobs):
+            info = job.snapshot()
+            status = info["state"]
+            if info["skipped"]:
+                status += f" ({info['skipped']} unchanged)"
+            if info["errors"]:
+                status += f" ({info['errors']} error(s))"
+            values = [
+                info["name"], info["kind"].capitalize(), status,
+                f"{info['completed_files']}/{info['total_files']}",
+                f"{format_bytes(info['transferred_bytes'])} / {format_bytes(info['total_bytes'])}",
+                f"{format_bytes(info['rate'])}/s" if job.state == RUNNING else "",
+                format_eta(estimate_eta(info["transferred_bytes"], info["total_bytes"], info["rate"]))
+                if job.state == RUNNING else "",
+            ]
+            for col, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                item.setData(Qt.UserRole, job.id)
+                self.table.setItem(row, col, item)
+            if job is selected:
+                self.table.selectRow(row)
+
+    def selected_job(self):
+        row = self.table.currentRow()
+        item = self.table.item(row, 0) if row >= 0 else None
+        if not item:
+            return None
+        job_id = item.data(Qt.UserRole)
+        return next((job for job in self.jobs.jobs if job.id == job_id), None)
+
+    def apply(self, action):
+        job = self.selected_job()
+        if job:
+            action(job)
+
+    def cancel_selected(self):
+        job = self.selected_job()
+        if not job or job.finished:
+            return
+        confirm = QMessageBox.question(self, "Cancel transfer", f"Cancel '{job.name}'?",
+                                       QMessageBox.Yes | QMessageBox.No)
+        if confirm == QMessageBox.Yes:
+            self.jobs.cancel(job)
+
+# Xem nội dung các snapshot backup: danh sách snapshot đọc từ index (một GET),
+# cây file của một snapshot đọc từ manifest của nó (một GET), không phải listing container Backup
+class SnapshotBrowser(QDialog):
+    def __init__(self, client, on_restore=None, parent=None):
+        super().__init__(parent)
+        self.client = client
+        self.on_restore = on_restore  # on_restore(snapshot, subtree, target_dir)
+        self.manifest = None
+        self.setWindowTitle("Backup snapshots")
+        self.resize(750, 500)
+
+        layout = QVBoxLayout(self)
+        top = QHBoxLayout()
+        top.addWidget(QLabel("Snapshot:"))
+        self.snapshot_combo = QComboBox()
+        self.snapshot_combo.currentIndexChanged.connect(self.load_snapshot)
+        top.addWidget(self.snapshot_combo, 1)
+        self.refresh_btn = QPushButton("Refresh")
+        self.refresh_btn.clicked.connect(self.refresh)
+        top.addWidget(self.refresh_btn)
+        layout.addLayout(top)
+
+        self.summary_label = QLabel("")
+        layout.addWidget(self.summary_label)
+
+        self.tree = QTreeWidget()
+        self.tree.setHeaderLabels(["Name", "Size", "Modified"])
+        self.tree.header().setSectionResizeMode(0, QHeaderView.Stretch)
+        layout.addWidget(self.tree)
+
+        buttons = QHBoxLayout()
+        self.restore_btn = QPushButton("Restore...")
+        self.restore_btn.setToolTip("Restore the selected file or folder, or the whole snapshot if nothing is selected")
+        self.restore_btn.clicked.connect(self.restore_selected)
+        buttons.addStretch()
+        buttons.addWidget(self.restore_btn)
+        layout.addLayout(buttons)
+        self.refresh()
+
+    def refresh(self):
+        try:
+            snapshots = load_snapshot_index(self.client)
+        except Exception as e:
+            QMessageBox.warning(self, "Backup snapshots", str(e))
+            return
+        self.snapshot_combo.blockSignals(True)
+        self.snapshot_combo.clear()
+        for snapshot in reversed(snapshots):  # Snapshot mới nhất lên đầu
+            label = snapshot["name"]
+            if snapshot.get("files") is not None:
+                label += f"  ({snapshot['files']} files, {format_bytes(snapshot['bytes'])})"
+            self.snapshot_combo.addItem(label, snapshot["name"])
+        self.snapshot_combo.blockSignals(False)
+        self.load_snapshot()
+
+    def load_snapshot(self):
+        self.tree.clear()
+        self.manifest = None
+        name = self.snapshot_combo.currentData()
+        if not name:
+            self.summary_label.setText("No backup snapshots found")
+            return
+        try:
+            self.manifest = load_snapshot_manifest(self.client, name)
+        except Exception as e:
+            QMessageBox.warning(self, "Backup snapshots", str(e))
+            return
+
+        files = self.manifest["files"]
+        folders = {"": self.tree.invisibleRootItem()}
+        totals = {}
+        for path in sorted(files):
+            entry = files[path]
+            parts = path.split("/")
+            parent = ""
+            for part in parts[:-1]:
+                folder = f"{parent}{part}/"
+                if folder not in folders:
+                    folders[folder] = QTreeWidgetItem(folders[parent], [f"📁 {part}", "", ""])
+                    folders[folder].setData(0, Qt.UserRole, folder)
+                totals[folder] = totals.get(folder, 0) + entry["size"]
+                parent = folder
+            modified = ""
+            if entry.get("mtime"):
+                modified = datetime.fromtimestamp(entry["mtime"] / 1e9).strftime("%d/%m/%Y %H:%M")
+            item = QTreeWidgetItem(folders[parent], [parts[-1], format_bytes(entry["size"]), modified])
+            item.setData(0, Qt.UserRole, path)
+        for folder, size in totals.items():
+            folders[folder].setText(1, format_bytes(size))
+
+        self.summary_label.setText(
+            f"{len(files)} files, {format_bytes(self.manifest['total_bytes'])} "
+            f"({'deduplicated chunks' if self.manifest['format'] == 'chunked' else 'regular files'})")
+
+    # Phần được chọn: "" là cả snapshot, "a/b/" là một thư mục, "a/b.txt" là một file
+    def restore_selected(self):
+        if not self.manifest or not self.on_restore:
+            return
+        item = self.tree.currentItem()
+        subtree = item.data(0, Qt.UserRole) if item else ""
+        target = QFileDialog.getExistingDirectory(self, "Restore to folder")
+        if target:
+            self.on_restore(self.manifest["snapshot"], subtree, target)
+
 #Kéo thả file vào folder để upload
 class DraggableTableWidget(QTableWidget):
     def __init__(self, parent=None, main_window=None):
@@ -415,6 +1014,11 @@ class DraggableContainerTableWidget(QTableWidget):
         else:
             event.ignore()
 
+# Container nội bộ của app (segment SLO của file lớn, chunk của backup chunked): không hiện trong My Files,
+# không được xóa trực tiếp vì object ở container khác đang tham chiếu tới
+def is_internal_container(name):
+    return name == CHUNK_CONTAINER or name.endswith(SEGMENT_CONTAINER_SUFFIX)
+
 #Định dạng ngày giờ và dung lượng file
 def format_bytes(size):
     for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
@@ -433,25 +1037,62 @@ def format_datetime(date_str):
 
 class MainWindow(QWidget):
     #Phần UI của app
-    def __init__(self, token=None, storage_url=None, login_window=None):
+    def __init__(self, token=None, storage_url=None, login_window=None, token_manager=None):
         super().__init__()
 
         self.login_window = login_window
         self.logging_out = False
-        self.token = token
-        self.storage_url = storage_url
 
         self.viewer_window = None
 
         self.total_quota_bytes = self.load_quota()
         self.used_bytes = 0
+        self.container_bytes = {}  # Dung lượng từng container lấy từ listing của account
+        self.container_counts = {}  # Số object từng container lấy từ listing của account
+        self.file_type_sizes = {}  # Cache cho pie chart, tính lại trong DashboardStatsWorker
+        self.stats_running = False
+        self.stats_pending = False
+        self.account_generation = 0  # Tăng khi switch user: bỏ kết quả của worker còn chạy cho account cũ
+        self.account_workers = 0  # Worker xóa đang chạy trên account hiện tại (bulk delete, prune)
+        self.prune_running = False  # Đang xóa snapshot hết hạn: backup phải chờ, tránh mất chunk/segment vừa dùng
         self.container_sort_state = {"column": 0, "ascending": True}
         self.object_sort_state = {"column": 0, "ascending": True}
         self.object_sort_order = {}
         self.selected_container = None
+        self.current_prefix = ""  # Thư mục ảo đang xem trong folder (prefix của object, kết thúc bằng "/")
+        self.listing_generation = 0
+        self.transfer_settings = load_transfer_settings()
+        # Số request đồng thời tới Swift/Orthanc do limiter AIMD của từng client điều chỉnh,
+        # threadpool chỉ cần đủ luồng cho mức trần
+        swift_max = self.transfer_settings["swift_max_concurrency"]
         self.threadpool = QThreadPool()
-        self.completed_tasks = 0
-        self.total_tasks = 0
+        self.threadpool.setMaxThreadCount(max(self.threadpool.maxThreadCount(), swift_max))
+        # Một client Swift dùng chung với pool kết nối keep-alive.
+        # token_manager làm mới token trước khi hết hạn và cập nhật vào client.
+        self.token_manager = token_manager
+        # Lỗi tạm thời (503, reset kết nối...) được gửi lại theo chính sách retry trong config.json
+        self.swift = SwiftClient(token, storage_url, pool_size=swift_max, token_manager=token_manager,
+                                 limiter=AdaptiveLimiter("Swift", maximum=swift_max),
+                                 retry_policy=RetryPolicy.from_settings(self.transfer_settings))
+        if token_manager:
+            token_manager.add_listener(self.swift.set_auth)
+        self.orthanc = OrthancClient(self.get_dicom_url(), self.transfer_settings["orthanc_max_concurrency"],
+                                     retry_policy=RetryPolicy.from_settings(self.transfer_settings))
+        # Giới hạn băng thông dùng chung cho mọi worker (đổi được khi đang chạy)
+        self.bandwidth = BandwidthLimiter()
+        self.apply_bandwidth_settings()
+        self.journal = None  # Journal các job upload/download của user hiện tại (mở trong load_saved_users)
+        # Hàng đợi job truyền tải: giới hạn số job chạy cùng lúc và số worker trong threadpool
+        self.jobs = JobManager(self.threadpool, max_jobs=self.transfer_settings["max_running_jobs"],
+                               max_workers=swift_max)
+        self.jobs.progress.connect(self.update_transfer_progress)
+        self.jobs.error.connect(self.on_transfer_error)
+        # Quota được giữ chỗ dần theo từng batch file của các pipeline quét -> upload
+        self.quota = QuotaReservation(lambda: self.total_quota_bytes, lambda: self.used_bytes)
+        self.progress_reset_pending = False
+        self.transfers_window = None
+        # Tốc độ truyền của toàn app, lấy mẫu mỗi giây cho Dashboard
+        self.throughput = ThroughputMonitor()
 
         self.study_ids = []  # Toàn bộ danh sách study ID đã lấy từ Orthanc
         self.loaded_offset = 0  # Bao nhiêu study đã được load
@@ -609,6 +1250,16 @@ class MainWindow(QWidget):
 
         sidebar_layout.addStretch()
 
+        transfers_btn = QPushButton("⇅ Transfers")
+        transfers_btn.setStyleSheet("color: white;")
+        transfers_btn.clicked.connect(self.show_transfers_window)
+        sidebar_layout.addWidget(transfers_btn)
+
+        # Mức song song hiện tại của từng endpoint (limiter tự điều chỉnh)
+        self.concurrency_label = QLabel("")
+        self.concurrency_label.setStyleSheet("color: #bbbbbb; font-size: 12px;")
+        sidebar_layout.addWidget(self.concurrency_label)
+
         # === Pages ===
         self.stack = QStackedWidget()
 
@@ -702,6 +1353,13 @@ class MainWindow(QWidget):
 
         dashboard_layout.addLayout(chart_container)
 
+        # Tốc độ truyền hiện tại của toàn app
+        self.throughput_label = QLabel("Upload 0.0 B/s · Download 0.0 B/s")
+        self.throughput_label.setStyleSheet("font-size: 14px; color: gray;")
+        dashboard_layout.addWidget(self.throughput_label)
+        self.throughput_chart = ThroughputCanvas()
+        dashboard_layout.addWidget(self.throughput_chart)
+
         dashboard_layout.addSpacing(70)
 
         # My File page start
@@ -773,7 +1431,14 @@ class MainWindow(QWidget):
 
         object_header_layout = QHBoxLayout()
         object_header_layout.addWidget(QLabel("File list in Folder"))
+        self.path_label = QLabel("")
+        self.path_label.setStyleSheet("color: gray;")
+        object_header_layout.addWidget(self.path_label)
         object_header_layout.addStretch()
+        self.up_btn = QPushButton("⬆ Up")
+        self.up_btn.setEnabled(False)
+        self.up_btn.clicked.connect(self.go_up_folder)
+        object_header_layout.addWidget(self.up_btn)
         self.myfile_layout.addLayout(object_header_layout)
 
         self.table = DraggableTableWidget(main_window=self)
@@ -799,6 +1464,9 @@ class MainWindow(QWidget):
         self.progress_bar.setValue(0)
         self.progress_bar.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
         self.myfile_layout.addWidget(self.progress_bar)
+        # Số file, tốc độ và thời gian còn lại của các job đang chạy
+        self.transfer_status_label = QLabel("")
+        self.myfile_layout.addWidget(self.transfer_status_label)
 
         self.list_btn.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
         self.list_btn.clicked.connect(self.list_containers)
@@ -874,6 +1542,9 @@ class MainWindow(QWidget):
         self.btn_choose_folder = QPushButton("📂 Select backup folder")
         self.btn_backup_now = QPushButton("⚡ Backup now")
         self.btn_clear_setting = QPushButton("🗑️ Clear backup setting")
+        self.btn_backup_format = QPushButton("🧩 Backup format")
+        self.btn_browse_snapshots = QPushButton("🗂️ Browse snapshots")
+        self.btn_retention = QPushButton("♻️ Retention policy")
 
         # Style nút con
         btn_style = """
@@ -891,7 +1562,8 @@ class MainWindow(QWidget):
             }
         """
 
-        for btn in [self.btn_set_time, self.btn_choose_folder, self.btn_backup_now, self.btn_clear_setting]:
+        for btn in [self.btn_set_time, self.btn_choose_folder, self.btn_backup_now, self.btn_clear_setting,
+                    self.btn_backup_format, self.btn_browse_snapshots, self.btn_retention]:
             btn.setFixedHeight(40)
             btn.setStyleSheet(btn_style)
 
@@ -903,6 +1575,12 @@ class MainWindow(QWidget):
         backup_layout.addSpacing(15)
         backup_layout.addWidget(self.btn_clear_setting)
         backup_layout.addSpacing(15)
+        backup_layout.addWidget(self.btn_backup_format)
+        backup_layout.addSpacing(15)
+        backup_layout.addWidget(self.btn_browse_snapshots)
+        backup_layout.addSpacing(15)
+        backup_layout.addWidget(self.btn_retention)
+        backup_layout.addSpacing(15)
         backup_layout.addWidget(QLabel("Current setup status:"))
         backup_layout.addWidget(self.backup_info_label)
         backup_layout.addStretch()
@@ -984,14 +1662,19 @@ class MainWindow(QWidget):
         btn_backup.clicked.connect(lambda: (self.switch_tab(2), self.update_backup_status_label()))
         btn_dicom.clicked.connect(lambda: self.switch_tab(3))
 
+        self.auto_free_running = False  # Đang prune để về dưới quota, timer không gọi chồng lên
         self.calculate_total_used_bytes()
         self.list_containers()
-        self.update_file_type_stats()
 
         self.usage_timer = QTimer(self)
         self.usage_timer.timeout.connect(self.calculate_total_used_bytes)
         self.usage_timer.start(10000)
 
+        self.concurrency_timer = QTimer(self)
+        self.concurrency_timer.timeout.connect(self.update_concurrency_label)
+        self.concurrency_timer.timeout.connect(self.update_throughput)
+        self.concurrency_timer.start(1000)
+
         self.backup_dir = os.path.join(os.getcwd(), "backup")
         os.makedirs(self.backup_dir, exist_ok=True)
         self.backup_timer = QTimer(self)
@@ -1001,6 +1684,9 @@ class MainWindow(QWidget):
 
         self.btn_choose_folder.clicked.connect(self.choose_backup_folders)
         self.btn_clear_setting.clicked.connect(self.clear_backup_setting)
+        self.btn_backup_format.clicked.connect(self.choose_backup_format)
+        self.btn_browse_snapshots.clicked.connect(self.show_snapshot_browser)
+        self.btn_retention.clicked.connect(self.show_retention_dialog)
         self.btn_backup_now.clicked.connect(self.backup_now)
 
         self.dicom_refresh_btn.clicked.connect(self.load_studies_from_orthanc)
@@ -1043,12 +1729,16 @@ class MainWindow(QWidget):
         change_dicom_radio = QRadioButton("Change DICOMweb URL")
         change_password_radio = QRadioButton("Change user password")
         change_quota_radio = QRadioButton("Change cloud storage limit")
+        change_transfer_radio = QRadioButton("Change large file transfer settings")
+        change_bandwidth_radio = QRadioButton("Change bandwidth limits")
 
         user_manual_radio.setChecked(True)
         layout.addWidget(user_manual_radio)
         layout.addWidget(change_dicom_radio)
         layout.addWidget(change_password_radio)
         layout.addWidget(change_quota_radio)
+        layout.addWidget(change_transfer_radio)
+        layout.addWidget(change_bandwidth_radio)
 
         button_box = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
         layout.addWidget(button_box)
@@ -1111,9 +1801,7 @@ class MainWindow(QWidget):
                 )
                 if ok:
                     try:
-                        import json
-                        with open("config.json", "w") as f:
-                            json.dump({"quota_gb": new_quota}, f, indent=4)
+                        save_config({"quota_gb": new_quota})
                         QMessageBox.information(
                             self, "Success",
                             "Storage limit updated. Please restart app to apply change."
@@ -1121,12 +1809,103 @@ class MainWindow(QWidget):
                     except Exception as e:
                         QMessageBox.critical(self, "Error", str(e))
 
+            elif change_transfer_radio.isChecked():
+                self.show_transfer_settings_dialog()
+
+            elif change_bandwidth_radio.isChecked():
+                self.show_bandwidth_dialog()
+
             dialog.accept()
 
         button_box.accepted.connect(on_accept)
         button_box.rejected.connect(dialog.reject)
 
         dialog.exec_()
+    # Thay đổi các tùy chọn truyền file lớn: ngưỡng/kích thước segment upload, kích thước part tải về
+    # và số kết nối song song
+    def show_transfer_settings_dialog(self):
+        settings = dict(self.transfer_settings)
+
+        threshold, ok = QInputDialog.getInt(
+            self, "Large file settings", "Split files larger than (MB):",
+            settings["slo_threshold_mb"], 1, 1024 * 1024
+        )
+        if not ok:
+            return
+        segment_size, ok = QInputDialog.getInt(
+            self, "Large file settings", "Segment size (MB):", settings["segment_size_mb"], 1, 5 * 1024
+        )
+        if not ok:
+            return
+        threads, ok = QInputDialog.getInt(
+            self, "Large file settings", "Parallel segment uploads:", settings["segment_threads"], 1, 32
+        )
+        if not ok:
+            return
+        part_size, ok = QInputDialog.getInt(
+            self, "Large file settings", "Download part size (MB):", settings["download_part_size_mb"], 1, 5 * 1024
+        )
+        if not ok:
+            return
+        download_threads, ok = QInputDialog.getInt(
+            self, "Large file settings", "Parallel download connections:", settings["download_threads"], 1, 32
+        )
+        if not ok:
+            return
+
+        settings.update({
+            "slo_threshold_mb": threshold,
+            "segment_size_mb": segment_size,
+            "segment_threads": threads,
+            "download_part_size_mb": part_size,
+            "download_threads": download_threads,
+        })
+        try:
+            save_config(settings)
+            self.transfer_settings = settings
+            QMessageBox.information(self, "Success", "Transfer settings updated.")
+        except Exception as e:
+            QMessageBox.critical(self, "Error", str(e))
+
+    # Giới hạn băng thông upload/download (KB/s, 0 = không giới hạn), áp dụng ngay cho job đang chạy
+    def show_bandwidth_dialog(self):
+        settings = dict(self.transfer_settings)
+
+        upload_limit, ok = QInputDialog.getInt(
+            self, "Bandwidth limits", "Upload limit (KB/s, 0 = unlimited):", settings["upload_limit_kbps"], 0, 10 ** 7
+        )
+        if not ok:
+            return
+        download_limit, ok = QInputDialog.getInt(
+            self, "Bandwidth limits", "Download limit (KB/s, 0 = unlimited):", settings["download_limit_kbps"], 0, 10 ** 7
+        )
+        if not ok:
+            return
+        background_limit, ok = QInputDialog.getInt(
+            self, "Bandwidth limits", "Background jobs while you are transferring (KB/s):",
+            settings["background_yield_kbps"], 1, 10 ** 7
+        )
+        if not ok:
+            return
+
+        settings.update({
+            "upload_limit_kbps": upload_limit,
+            "download_limit_kbps": download_limit,
+            "background_yield_kbps": background_limit,
+        })
+        try:
+            save_config(settings)
+            self.transfer_settings = settings
+            self.apply_bandwidth_settings()
+            QMessageBox.information(self, "Success", "Bandwidth limits updated.")
+        except Exception as e:
+            QMessageBox.critical(self, "Error", str(e))
+
+    def apply_bandwidth_settings(self):
+        settings = self.transfer_settings
+        self.bandwidth.set_limits(settings["upload_limit_kbps"] * 1024, settings["download_limit_kbps"] * 1024,
+                                  settings["background_yield_kbps"] * 1024)
+
     # Chức năng thay đổi mật khẩu người dùng
     def show_change_password_dialog(self):
         dialog = QDialog(self)
@@ -1183,7 +1962,7 @@ class MainWindow(QWidget):
                     url = f"{auth_url}/v3/users/{user_id}/password"
 
                 headers = {
-                    "X-Auth-Token": self.token,
+                    "X-Auth-Token": self.swift.token,
                     "Content-Type": "application/json"
                 }
                 payload = {
@@ -1260,6 +2039,14 @@ class MainWindow(QWidget):
         self.backup_timer.stop()
         self.next_backup_time = None
         unmount_drive()
+        self.jobs.shutdown()
+        self.log_connection_stats()
+        if self.token_manager:
+            self.token_manager.stop()
+        self.swift.close()
+        self.orthanc.close()
+        if self.journal:
+            self.journal.close()
         self.close()  # Gọi close, nhưng đã đánh dấu là logout
         if self.login_window:
             self.login_window.show()
@@ -1281,6 +2068,13 @@ class MainWindow(QWidget):
                 self.backup_timer.stop()
                 self.next_backup_time = None
                 unmount_drive()
+                self.jobs.shutdown()
+                if self.token_manager:
+                    self.token_manager.stop()
+                self.swift.close()
+                self.orthanc.close()
+                if self.journal:
+                    self.journal.close()
                 event.accept()
             else:
                 event.ignore()
@@ -1329,6 +2123,7 @@ class MainWindow(QWidget):
 
         self.update_backup_status_label()
         self.schedule_backup_from_config()
+        self.open_transfer_journal()
     # Chuyển đổi user đã lưu
     def switch_saved_user(self, index):
         if index < 0 or index >= len(self.saved_users):
@@ -1358,6 +2153,48 @@ class MainWindow(QWidget):
             self.saved_user_dropdown.blockSignals(False)
             return
 
+        # Đang xóa (bulk delete, retention) trên account hiện tại: không đổi client giữa chừng
+        if self.account_workers:
+            QMessageBox.information(self, "Switch user",
+                                    "Files of the current user are being deleted. "
+                                    "Please switch user after it finishes.")
+            self.saved_user_dropdown.blockSignals(True)
+            self.saved_user_dropdown.setCurrentIndex(self.current_user_index)
+            self.saved_user_dropdown.blockSignals(False)
+            return
+
+        # Các job của user cũ dùng chung SwiftClient: phải dừng hẳn trước khi client trỏ sang account mới
+        active = self.jobs.active_jobs()
+        if active:
+            reply = QMessageBox.question(
+                self,
+                "Transfers in progress",
+                f"{len(active)} transfer(s) of the current user are still running.\n"
+                "Stop them and switch user? They can be resumed when you switch back.",
+                QMessageBox.Yes | QMessageBox.No
+            )
+            if reply != QMessageBox.Yes:
+                self.saved_user_dropdown.blockSignals(True)
+                self.saved_user_dropdown.setCurrentIndex(self.current_user_index)
+                self.saved_user_dropdown.blockSignals(False)
+                return
+            self.jobs.stop_all()
+            self.saved_user_dropdown.setEnabled(False)
+            self.when_jobs_stopped(lambda: self.finish_switch_user(user))
+            return
+        self.finish_switch_user(user)
+
+    # Gọi callback khi mọi job đã thoát (worker đang chạy dở dừng ở checkpoint tiếp theo) và không còn
+    # worker xóa nào (có thể được bắt đầu trong lúc chờ), không chặn UI
+    def when_jobs_stopped(self, callback):
+        if self.jobs.active_jobs() or self.account_workers:
+            self.transfer_status_label.setText("Stopping transfers...")
+            QTimer.singleShot(200, lambda: self.when_jobs_stopped(callback))
+        else:
+            callback()
+
+    def finish_switch_user(self, user):
+        self.saved_user_dropdown.setEnabled(True)
         # ✅ Nếu đúng, tiếp tục chuyển user
         try:
             from mount_manager import save_rclone_config, mount_drive, unmount_drive
@@ -1367,8 +2204,10 @@ class MainWindow(QWidget):
 
             # Re-authenticate để lấy token & storage_url
             token, storage_url = self.re_authenticate_user(user)
-            self.token = token
-            self.storage_url = storage_url
+            self.swift.set_auth(token, storage_url)
+            # Listing/thống kê còn chạy cho account cũ: bỏ kết quả khi về
+            self.account_generation += 1
+            self.listing_generation += 1
             self.selected_container = None
             self.list_containers()
             self.calculate_total_used_bytes()
@@ -1391,7 +2230,7 @@ class MainWindow(QWidget):
 
             # ✅ Đổi thành công → cập nhật index và UI
             self.current_user_index = 0  # Load lại và đưa user mới lên đầu
-            self.load_saved_users(select_user_display=user["user_display"])
+            self.load_saved_users(select_user_display=user["user_display"])  # Mở journal của user mới
 
             QMessageBox.information(self, "Switch user", f"Switched to user {user['user_display']} successfully")
             self.update_backup_status_label()
@@ -1404,52 +2243,16 @@ class MainWindow(QWidget):
             self.saved_user_dropdown.setCurrentIndex(self.current_user_index)
             self.saved_user_dropdown.blockSignals(False)
 
-    # Đăng nhập lại sau khi chuyển user
+    # Đăng nhập lại sau khi chuyển user, token manager sẽ tự làm mới token của user mới
     def re_authenticate_user(self, user):
-        payload = {
-            "auth": {
-                "identity": {
-                    "methods": ["password"],
-                    "password": {
-                        "user": {
-                            "name": user["username"],
-                            "domain": {"id": "default"},
-                            "password": user["password"]
-                        }
-                    }
-                },
-                "scope": {
-                    "project": {
-                        "name": user["project_name"],
-                        "domain": {"id": "default"}
-                    }
-                }
-            }
-        }
-
-        headers = {'Content-Type': 'application/json'}
-        url = user["auth_url"].rstrip("/") + "/auth/tokens"
-        response = requests.post(url, json=payload, headers=headers)
-
-        if response.status_code == 201:
-            token = response.headers.get("X-Subject-Token")
-
-            # ✅ Tìm đúng object-store service
-            catalog = response.json()["token"]["catalog"]
-            object_store = next((svc for svc in catalog if svc["type"] == "object-store"), None)
-            if not object_store:
-                raise Exception("Object-store service not found in catalog")
-
-            # ✅ Lấy đúng endpoint "public"
-            public_endpoint = next((ep for ep in object_store["endpoints"] if ep["interface"] == "public"), None)
-            if not public_endpoint:
-                raise Exception("Public endpoint for object-store not found")
-
-            storage_url = public_endpoint["url"]
-            return token, storage_url
+        def authenticate():
+            return keystone_login(user["auth_url"], user["username"], user["password"], user["project_name"])
 
+        if self.token_manager:
+            info = self.token_manager.switch(authenticate)
         else:
-            raise Exception(f"Login failed: {response.status_code} - {response.text}")
+            info = authenticate()
+        return info["token"], info["storage_url"]
     # Xóa user đã lưu
     def delete_selected_user(self):
         index = self.saved_user_dropdown.currentIndex()
@@ -1478,82 +2281,36 @@ class MainWindow(QWidget):
                 QTimer.singleShot(4000, lambda: self.logout(skip_confirm=True))
 
     #Tab Dashboard
-    # Lấy các extension file để cập nhật vào Dashboard
-    def get_file_type_sizes(self):
-        result = {key: 0 for key in self.file_type_stats.keys()}
-        containers = self.get_all_containers()
-
-        for container in containers:
-            objects = self.list_objects(container)
-            for obj in objects:
-                name = obj.get("name")
-                size = int(obj.get("bytes", 0))
-                ext = os.path.splitext(name)[1].lower()
-
-                matched = False
-                for file_type, info in self.file_type_stats.items():
-                    if ext in info["extensions"]:
-                        result[file_type] += size
-                        matched = True
-                        break
-                if not matched:
-                    result["Others"] += size
-        return result
-
+    # Tính lại thống kê Dashboard trong luồng nền; gọi chồng khi đang tính thì chạy thêm một lần sau đó
     def update_file_type_stats(self):
-        # Reset count
-        for info in self.file_type_stats.values():
-            info["count"] = 0
-
-        # Lấy danh sách tất cả containers
-        containers = self.get_all_containers()  # Cần có hàm này
-
-        for container in containers:
-            # Lấy danh sách file trong từng container
-            objects = self.list_objects(container)  # Cần có hàm này
-
-            for obj in objects:
-                filename = obj.get("name")  # hoặc obj.name tùy kiểu dữ liệu
-                if not filename:
-                    continue
+        if self.stats_running:
+            self.stats_pending = True
+            return
+        self.stats_running = True
+        self.stats_pending = False
+        file_types = {file_type: list(info["extensions"]) for file_type, info in self.file_type_stats.items()}
+        worker = DashboardStatsWorker(self.swift, list(self.get_all_containers()), file_types)
+        generation = self.account_generation
+        worker.signals.finished.connect(lambda stats: self.on_file_type_stats(stats, generation))
+        self.threadpool.start(worker)
 
-                ext = os.path.splitext(filename)[1].lower()
-                matched = False
-                for file_type, info in self.file_type_stats.items():
-                    if ext in info["extensions"]:
-                        info["count"] += 1
-                        matched = True
-                        break
-                if not matched:
-                    self.file_type_stats["Others"]["count"] += 1
-
-        # Cập nhật lại UI
+    def on_file_type_stats(self, stats, generation):
+        self.stats_running = False
+        if generation != self.account_generation:
+            # Thống kê của account trước khi switch user: tính lại cho account mới
+            self.update_file_type_stats()
+            return
+        for file_type, count in stats["counts"].items():
+            self.file_type_stats[file_type]["count"] = count
         for file_type, label in self.file_type_cards.items():
-            count = self.file_type_stats[file_type]["count"]
-            label.setText(f"{count} Files")
-
-    # Lấy mốc thời gian để upload vào linechart
-    def get_upload_timestamps_last_1h(self):
-        from datetime import datetime, timedelta
-        from zoneinfo import ZoneInfo
+            label.setText(f"{self.file_type_stats[file_type]['count']} Files")
 
-        now = datetime.now(ZoneInfo("Asia/Ho_Chi_Minh"))
-        threshold = now - timedelta(hours=1)
-        timestamps = []
+        self.file_type_sizes = stats["sizes"]
+        self.pie_chart.plot(self.file_type_sizes)
+        self.line_chart.plot(stats["timestamps"])
 
-        containers = self.get_all_containers()
-        for container in containers:
-            for obj in self.list_objects(container):
-                last_modified = obj.get("last_modified")
-                if last_modified:
-                    try:
-                        dt = datetime.fromisoformat(last_modified).replace(tzinfo=ZoneInfo("UTC")).astimezone(
-                            ZoneInfo("Asia/Ho_Chi_Minh"))
-                        if dt >= threshold:
-                            timestamps.append(dt)
-                    except Exception:
-                        pass
-        return timestamps
+        if self.stats_pending:
+            self.update_file_type_stats()
 
     #Tab My file
         #Xử lý chung
@@ -1584,29 +2341,12 @@ class MainWindow(QWidget):
         self.usage_label.setText(f"{used_str} / {total_str}")
         if hasattr(self, 'pie_chart'):
             self.pie_chart.usage_text = f"{used_str} / {total_str}"
-            self.pie_chart.plot(self.get_file_type_sizes())  # Gọi lại để vẽ lại text
+            self.pie_chart.plot(self.file_type_sizes)  # Gọi lại để vẽ lại text
 
     def calculate_total_used_bytes(self):
-        self.used_bytes = 0
-
+        # Dùng HEAD account (X-Account-Bytes-Used) thay vì tải listing của mọi container
         try:
-            headers = {"X-Auth-Token": self.token}
-            containers_url = f"{self.storage_url}"
-            r = requests.get(containers_url, headers=headers, params={"format": "json"})
-            r.raise_for_status()
-
-            containers = r.json()
-
-            for container in containers:
-                name = container["name"]
-                container_url = f"{self.storage_url}/{name}"
-                r2 = requests.get(container_url, headers=headers, params={"format": "json"})
-                r2.raise_for_status()
-
-                objects = r2.json()
-                for obj in objects:
-                    self.used_bytes += int(obj.get("bytes", 0))
-
+            self.used_bytes = self.swift.account_usage()["bytes"]
         except Exception as e:
             print("Error calculating usage:", e)
 
@@ -1614,13 +2354,37 @@ class MainWindow(QWidget):
         self.auto_free_space_if_needed()
 
     def auto_free_space_if_needed(self):
-        if self.used_bytes <= self.total_quota_bytes:
+        if self.used_bytes <= self.total_quota_bytes or self.auto_free_running:
             return  # Still under quota
 
-        headers = {"X-Auth-Token": self.token}
+        # Trước hết xóa các snapshot backup đã hết hạn theo retention policy (trong luồng nền),
+        # prune xong mà vẫn vượt quota mới xóa file
+        policy = self.read_backup_config().get("retention")
+        if retention_enabled(policy) and not self.backup_running():
+            self.auto_free_running = True
+
+            def after_prune(plan):
+                self.auto_free_running = False
+                if plan and plan.get("report"):
+                    self.used_bytes -= plan["bytes"]
+                    self.update_usage_display()
+                if self.used_bytes > self.total_quota_bytes:
+                    self.free_space_by_deleting_files()
+
+            self.run_retention(policy, dry_run=False, quiet=True, on_done=after_prune)
+            return
+
+        self.free_space_by_deleting_files()
+
+    # Xóa các file mới nhất (ngoài snapshot backup) tới khi dung lượng về dưới quota
+    def free_space_by_deleting_files(self):
         all_files = []
 
+        # Snapshot backup chỉ được xóa qua retention (prune giữ đúng segment/chunk dùng chung),
+        # container nội bộ đã bị loại khỏi get_all_containers
         for container in self.get_all_containers():
+            if container == SNAPSHOT_CONTAINER:
+                continue
             objects = self.list_objects(container)
             for obj in objects:
                 name = obj.get("name")
@@ -1641,23 +2405,28 @@ class MainWindow(QWidget):
         # Sort by newest first
         all_files.sort(key=lambda x: x["modified"], reverse=True)
 
-        files_deleted = 0
-
+        # Chọn đủ file để về dưới quota rồi xóa một lần bằng bulk delete
+        to_delete = []
+        bytes_to_free = self.used_bytes - self.total_quota_bytes
         for file in all_files:
-            if self.used_bytes <= self.total_quota_bytes:
+            if bytes_to_free <= 0:
                 break
+            to_delete.append(file)
+            bytes_to_free -= file["size"]
 
-            try:
-                url = f"{self.storage_url}/{file['container']}/{file['name']}"
-                response = requests.delete(url, headers=headers)
+        failed = set()
+        for container in {f["container"] for f in to_delete}:
+            names = [f["name"] for f in to_delete if f["container"] == container]
+            report = delete_with_segments(self.swift, container, names)
+            failed.update(path for path, _ in report["errors"])
+            for path, status in report["errors"]:
+                logger.warning("Failed to delete %s - %s", path, status)
 
-                if response.status_code in [204, 404]:
-                    self.used_bytes -= file["size"]
-                    files_deleted += 1
-                else:
-                    print(f"Failed to delete {file['name']} - HTTP {response.status_code}")
-            except Exception as e:
-                print(f"Error deleting {file['name']}: {e}")
+        files_deleted = 0
+        for file in to_delete:
+            if bulk_path(file["container"], file["name"]) not in failed:
+                self.used_bytes -= file["size"]
+                files_deleted += 1
 
         self.update_usage_display()
 
@@ -1680,17 +2449,12 @@ class MainWindow(QWidget):
         if not ok:
             return
 
-        file_tasks = []
-        total_upload_size = 0
-
+        roots = []
         if choice == "File":
             files, _ = QFileDialog.getOpenFileNames(self, "Select file to upload")
             if not files:
                 return
-            for f in files:
-                object_name = os.path.basename(f)
-                file_tasks.append((f, object_name))
-                total_upload_size += os.path.getsize(f)
+            roots = [(f, os.path.basename(f)) for f in files]
 
         elif choice == "Folder":
             selected_folders = []
@@ -1705,56 +2469,392 @@ class MainWindow(QWidget):
                 if reply == QMessageBox.No:
                     break
 
-            for folder_path in selected_folders:
-                base_folder = os.path.basename(folder_path)
-                for root, _, files in os.walk(folder_path):
-                    for file in files:
-                        full_path = os.path.join(root, file)
-                        rel_path = os.path.relpath(full_path, os.path.dirname(folder_path))
-                        object_name = rel_path.replace("\\", "/")
-                        file_tasks.append((full_path, object_name))
-                        total_upload_size += os.path.getsize(full_path)
+            roots = [(folder_path, os.path.basename(folder_path)) for folder_path in selected_folders]
 
-        # 🔴 Kiểm tra quota
-        available_space = self.total_quota_bytes - self.used_bytes
-        if total_upload_size > available_space:
-            QMessageBox.critical(self, "Insufficient Storage", "There is not enough storage to upload the selected files")
+        if not roots:
+            return
+        skip_unchanged = self.ask_skip_unchanged(self.selected_container)
+        self.start_upload_pipeline(self.selected_container, roots, skip_unchanged)
+
+    # Tạo job truyền tải cho một job trong journal. Task được thêm bằng add_upload_tasks/add_download_tasks
+    # trước khi submit vào self.jobs (sealed=False thì thêm dần rồi gọi self.jobs.seal).
+    # lane=BACKGROUND cho job chạy nền (backup, DICOM), nhường băng thông cho thao tác của người dùng.
+    def create_transfer_job(self, kind, name, journal_id=None, lane=FOREGROUND, sealed=True,
+                            on_finished=None, on_progress=None, error_title="Transfer error"):
+        return TransferJob(kind, name, journal_id=journal_id, lane=lane, sealed=sealed,
+                           on_finished=on_finished or self.on_transfer_job_finished,
+                           on_progress=on_progress, error_title=error_title)
+
+    # Thêm các task upload (filepath, container, object_name) vào job.
+    def add_upload_tasks(self, job, tasks, sizes=None):
+        job.tasks.extend(tasks)
+        for files, size, factory in self.upload_units(tasks, sizes):
+            job.add_unit(factory, files=files, size=size)
+
+    # Các unit (files, size, factory) upload một batch task: nhiều file nhỏ được gộp thành archive
+    # (extract-archive), còn lại dùng UploadWorker từng file.
+    # sizes: {filepath: kích thước} nếu đã có từ lúc quét thư mục (không phải stat lại từng file)
+    def upload_units(self, tasks, sizes=None):
+        sizes = sizes or {}
+        try:
+            archives, tasks = plan_archive_batches(self.swift, tasks, self.transfer_settings, sizes)
+        except Exception as e:
+            logger.warning("Cannot plan archive upload: %s", e)
+            archives = []
+
+        units = []
+        for batch in archives:
+            def make_archive_worker(job, batch=batch):
+                return ArchiveUploadWorker(self.swift, batch[0][1], batch, job,
+                                           journal=self.journal if job.journal_id else None,
+                                           throttle=self.job_throttle(job, "upload"))
+            units.append((len(batch), sum(sizes.get(t[0], self.local_size(t[0])) for t in batch),
+                          make_archive_worker))
+
+        for task in tasks:
+            units.append((1, sizes.get(task[0], self.local_size(task[0])), self.upload_worker_factory(task)))
+        return units
+
+    # Factory tạo UploadWorker cho một task khi tới lượt chạy trong job
+    def upload_worker_factory(self, task, remote_hash=None, copy_from=None):
+        def make_upload_worker(job):
+            filepath, container, object_name = task
+            return UploadWorker(
+                client=self.swift,
+                container=container,
+                filepath=filepath,
+                object_name=object_name,
+                job=job,
+                settings=self.transfer_settings,
+                journal=self.journal if job.journal_id else None,
+                throttle=self.job_throttle(job, "upload"),
+                remote_hash=remote_hash,
+                copy_from=copy_from
+            )
+        return make_upload_worker
+
+    # Listing một lần các object dưới prefix chung (tới dấu "/" cuối) của names: {(container, name): obj}
+    def remote_objects(self, container, names):
+        prefix = os.path.commonprefix(list(names))
+        prefix = prefix[:prefix.rfind("/") + 1]
+        return {(container, obj["name"]): obj for obj in self.swift.iter_listing(container, prefix=prefix or None)}
+
+    # Chế độ "chỉ upload file thay đổi": lấy listing của prefix chung một lần, file mới hoặc khác
+    # kích thước được upload ngay; file cùng kích thước được băm trong worker của job (song song
+    # với các upload còn lại) và chỉ upload nếu MD5/ETag khác ETag trong listing (listing_etag).
+    # remote: {(container, object_name): obj} lấy bằng remote_objects.
+    # Trả về (units, số byte của các file mới/khác kích thước): file cùng kích thước không làm tăng dung lượng
+    def changed_upload_units(self, tasks, remote, sizes=None):
+        sizes = sizes or {}
+        changed, units = [], []
+        for task in tasks:
+            obj = remote.get((task[1], task[2]))
+            size = sizes.get(task[0], self.local_size(task[0]))
+            etag = listing_etag(obj) if obj else None
+            if obj and obj.get("bytes") == size and etag:
+                units.append((1, size, self.upload_worker_factory(task, remote_hash=etag)))
+            else:
+                changed.append(task)
+        changed_units = self.upload_units(changed, sizes)
+        return changed_units + units, sum(size for _, size, _ in changed_units)
+
+    # Pipeline quét -> upload: TreeScanner đẩy từng batch file (mỗi thư mục một batch) qua hàng đợi có
+    # giới hạn, job đọc dần bằng add_source nên file đầu tiên được upload ngay khi quét tới và bộ nhớ
+    # không tăng theo kích thước cây thư mục. make_units(records) trả về (task cho journal, các unit
+    # (files, size, factory), số byte sẽ thực sự upload) của một batch. Số byte đó phải giữ được chỗ
+    # quota trước khi upload (file không đổi/được copy thì không tính): không đủ chỗ thì dừng quét,
+    # các file đã nhận vẫn upload xong.
+    def start_scan_pipeline(self, job, roots, make_units):
+        scanner = TreeScanner(roots)
+        self.quota.open()
+
+        def units():
+            for batch in scanner.iter_batches():
+                tasks, batch_units, size = make_units(batch)
+                if not self.quota.reserve(size):
+                    scanner.cancel()
+                    job.add_error(f"Not enough storage: stopped after {job.total_files} file(s), "
+                                  "the remaining files were not uploaded")
+                    break
+                if job.journal_id and tasks:
+                    self.journal.add_tasks(job.journal_id, tasks)
+                yield from batch_units
+            if job.journal_id:
+                self.journal.seal_job(job.journal_id)
+            if scanner.errors:
+                logger.warning("Skipped %s unreadable path(s) while scanning, e.g. %s",
+                               len(scanner.errors), scanner.errors[0])
+
+        on_finished = job.on_finished
+
+        def finished(job):
+            scanner.cancel()
+            self.quota.close()
+            on_finished(job)
+
+        job.on_finished = finished
+        job.add_source(units())
+        return self.submit_transfer_job(job)
+
+    # Upload các root (đường dẫn local, object_name) vào container theo pipeline quét -> upload
+    def start_upload_pipeline(self, container, roots, skip_unchanged=False):
+        job_id = self.journal.start_job("upload", container)
+        job = self.create_transfer_job("upload", container, job_id, error_title="Uploading error")
+        remote = None
+
+        def make_units(records):
+            nonlocal remote, skip_unchanged
+            tasks = [(record.path, container, record.object_name) for record in records]
+            sizes = {record.path: record.size for record in records}
+            if skip_unchanged and remote is None:
+                # Listing lấy một lần ở batch đầu (trong luồng của job), theo prefix của các root
+                try:
+                    remote = self.remote_objects(container, [f"{name}/" if os.path.isdir(path) else name
+                                                             for path, name in roots])
+                except Exception as e:
+                    job.add_error(f"Cannot compare with files on server, uploading everything: {e}")
+                    skip_unchanged = False
+            if skip_unchanged:
+                units, size = self.changed_upload_units(tasks, remote, sizes)
+                return tasks, units, size
+            units = self.upload_units(tasks, sizes)
+            return tasks, units, sum(size for _, size, _ in units)
+
+        return self.start_scan_pipeline(job, roots, make_units)
+
+    # Hỏi có bỏ qua các file đã có sẵn trên server không (chỉ hỏi khi folder đã có object)
+    def ask_skip_unchanged(self, container):
+        if not self.container_counts.get(container):
+            return False
+        reply = QMessageBox.question(
+            self,
+            "Upload mode",
+            f"Folder '{container}' already contains files.\n"
+            "Only upload files that are new or changed?",
+            QMessageBox.Yes | QMessageBox.No
+        )
+        return reply == QMessageBox.Yes
+
+    # Thêm các task download (container, object_name, save_path) vào job.
+    # sizes: kích thước từng object nếu đã có từ listing (để tính % và ETA theo byte ngay từ đầu)
+    def add_download_tasks(self, job, tasks, sizes=None):
+        job.tasks.extend(tasks)
+        for files, size, factory in self.download_units(tasks, sizes):
+            job.add_unit(factory, files=files, size=size)
+
+    # Các unit (files, size, factory) tải từng task bằng DownloadWorker
+    def download_units(self, tasks, sizes=None):
+        units = []
+        for idx, task in enumerate(tasks):
+            size = sizes[idx] if sizes else None
+
+            def make_download_worker(job, task=task, size=size):
+                container, object_name, save_path = task
+                return DownloadWorker(
+                    client=self.swift,
+                    container=container,
+                    object_name=object_name,
+                    save_path=save_path,
+                    job=job,
+                    settings=self.transfer_settings,
+                    journal=self.journal if job.journal_id else None,
+                    throttle=self.job_throttle(job, "download"),
+                    size=size
+                )
+            units.append((1, size or 0, make_download_worker))
+        return units
+
+    # Tải các object của container theo prefix: listing đọc từng trang trong luồng slot của job
+    # (add_source) nên tải ngay từ trang đầu và luồng UI không chờ listing.
+    # save_path(object_name) trả về đường dẫn lưu, None để bỏ qua object.
+    # Task của từng trang được ghi vào journal trước khi chạy.
+    def start_listing_download(self, job, container, prefix, save_path):
+        def units():
+            for page in self.swift.iter_listing_pages(container, prefix=prefix):
+                tasks, sizes = [], []
+                for obj in page:
+                    path = save_path(obj.get("name", ""))
+                    if path:
+                        tasks.append((container, obj["name"], path))
+                        sizes.append(obj.get("bytes", 0))
+                if not tasks:
+                    continue
+                job.tasks.extend(tasks)
+                if job.journal_id:
+                    self.journal.add_tasks(job.journal_id, tasks)
+                yield from self.download_units(tasks, sizes)
+            if job.journal_id:
+                self.journal.seal_job(job.journal_id)
+
+        job.add_source(units())
+        return self.submit_transfer_job(job)
+
+    # Hàm throttle cho worker của job: qua checkpoint của job (pause/cancel) rồi tới giới hạn băng thông
+    def job_throttle(self, job, direction):
+        return job.throttle(self.transfer_meter(direction, job.lane))
+
+    # Đếm byte vào tốc độ chung của app rồi áp giới hạn băng thông
+    def transfer_meter(self, direction, lane=FOREGROUND):
+        return chain_callbacks(self.throughput.meter(direction), self.bandwidth.throttle(direction, lane))
+
+    @staticmethod
+    def local_size(path):
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+    def submit_transfer_job(self, job):
+        self.jobs.submit(job)
+        self.update_transfer_progress()
+        return job
+
+    # Mở journal của user hiện tại, các job còn dở từ lần chạy trước sẽ được hỏi tiếp tục
+    def open_transfer_journal(self):
+        directory = os.path.join(os.getcwd(), "transfers", self.get_current_username())
+        if self.journal and self.journal.directory == directory:
+            return
+        if self.journal:
+            self.journal.close()
+        self.journal = TransferJournal(directory)
+        QTimer.singleShot(0, self.offer_resume_transfers)
+
+    def offer_resume_transfers(self):
+        jobs = self.journal.pending_jobs()
+        if not jobs:
             return
 
-        # Bắt đầu upload
-        self.completed_tasks = 0
-        self.total_tasks = len(file_tasks)
-        if self.total_tasks == 0:
+        lines = []
+        for job in jobs:
+            remaining = len(job["keys"] - job["done"])
+            lines.append(f"- {job['kind'].capitalize()} '{job['name']}': {remaining} file(s) left")
+        reply = QMessageBox.question(
+            self,
+            "Unfinished transfers",
+            "Some transfers were interrupted last time:\n" + "\n".join(lines) +
+            "\n\nWould you like to resume them?",
+            QMessageBox.Yes | QMessageBox.No
+        )
+        if reply != QMessageBox.Yes:
+            for job in jobs:
+                self.discard_transfer_job(job)
             return
 
-        self.progress_bar.setValue(0)
+        resumed = []
+        for job in jobs:
+            tasks = self.journal.resume_job(job["id"])
+            if job["kind"] == "upload":
+                for task in [t for t in tasks if not os.path.isfile(t[0])]:
+                    # File gốc không còn trên máy: bỏ qua task này
+                    self.journal.mark_done(job["id"], task_key(task[1], task[2]))
+                tasks = [t for t in tasks if os.path.isfile(t[0])]
+            if tasks:
+                resumed.append((job, tasks))
+
+        for job, tasks in resumed:
+            # Backup được tiếp tục ở lane nền như lúc đầu
+            lane = BACKGROUND if job["name"].startswith("Backup/") else FOREGROUND
+            transfer = self.create_transfer_job(job["kind"], job["name"], job["id"], lane=lane,
+                                                error_title=f"{job['kind'].capitalize()} error")
+            if job["kind"] == "upload":
+                self.add_upload_tasks(transfer, tasks)
+            else:
+                self.add_download_tasks(transfer, tasks)
+            self.submit_transfer_job(transfer)
 
-        for idx, (filepath, object_name) in enumerate(file_tasks):
-            worker = UploadWorker(
-                token=self.token,
-                storage_url=self.storage_url,
-                container=self.selected_container,
-                filepath=filepath,
-                object_name=object_name,
-                index=idx,
-                total=self.total_tasks
-            )
-            worker.signals.progress.connect(self.progress_bar.setValue)
-            worker.signals.error.connect(lambda msg: QMessageBox.warning(self, "Uploading error", msg))
-            worker.signals.done.connect(self.on_work_done)
-            self.threadpool.start(worker)
+    # Bỏ một job cũ: xóa journal và các file .part còn sót lại
+    def discard_transfer_job(self, job):
+        self.discard_journal_job(job["kind"], job["id"], job["tasks"])
+
+    def discard_journal_job(self, kind, job_id, tasks):
+        if kind == "download":
+            for container, object_name, save_path in tasks:
+                try:
+                    os.remove(save_path + ".part")
+                except OSError:
+                    pass
+        self.journal.discard_job(job_id)
+
+    # Mặc định khi một job xong: làm mới dung lượng, danh sách folder và thống kê
+    def on_transfer_job_finished(self, job):
+        self.cleanup_cancelled_job(job)
+        if self.jobs.active_jobs():
+            return
+        self.log_connection_stats()
+        self.calculate_total_used_bytes()
+        self.list_containers()
+
+    # Job bị người dùng hủy: bỏ luôn journal và file tải dở
+    def cleanup_cancelled_job(self, job):
+        if job.state == CANCELLED and job.journal_id and self.journal:
+            self.discard_journal_job(job.kind, job.journal_id, job.tasks)
+
+    def show_transfers_window(self):
+        if self.transfers_window is None:
+            self.transfers_window = TransfersWindow(self.jobs, self)
+        self.transfers_window.show()
+        self.transfers_window.raise_()
+        self.transfers_window.refresh()
+
+    def on_transfer_error(self, job, msg):
+        QMessageBox.warning(self, job.error_title, msg)
+
+    # Progress bar chung cho các job chưa kết thúc, đọc từ bộ đếm của job ở mỗi tick của JobManager.
+    # Tính theo byte khi đã biết tổng dung lượng, nếu không thì theo số file.
+    def update_transfer_progress(self):
+        jobs = [job for job in self.jobs.active_jobs() if job.on_progress is None]
+        total_files = sum(job.total_files for job in jobs)
+        if not total_files:
+            self.transfer_status_label.setText("")
+            if self.progress_bar.value() and not self.progress_reset_pending:
+                self.progress_bar.setValue(100)
+                self.progress_reset_pending = True
+                QTimer.singleShot(1000, self.reset_transfer_progress)
+            return
 
-    def on_work_done(self):
-        self.completed_tasks += 1
-        percent = int((self.completed_tasks / self.total_tasks) * 100)
+        done_files = sum(job.completed_files for job in jobs)
+        total_bytes = sum(job.expected_bytes for job in jobs)
+        done_bytes = sum(job.transferred_bytes for job in jobs)
+        rate = sum(job.rate.rate for job in jobs)
+        if total_bytes:
+            percent = min(100, int(done_bytes * 100 / total_bytes))
+            eta = estimate_eta(done_bytes, total_bytes, rate)
+        else:
+            percent = int(done_files * 100 / total_files)
+            eta = None
         self.progress_bar.setValue(percent)
+        # Job còn source (vd. pipeline đang quét thư mục): tổng số file còn tăng
+        scanning = " (scanning...)" if any(job.source is not None for job in jobs) else ""
+        self.transfer_status_label.setText(
+            f"{done_files}/{total_files}{scanning} files · {format_bytes(rate)}/s · ETA {format_eta(eta)}"
+        )
 
-        if self.completed_tasks == self.total_tasks:
-            self.progress_bar.setValue(100)
-            self.calculate_total_used_bytes()
-            self.list_containers()
-            self.update_file_type_stats()
-            QTimer.singleShot(1000, lambda: self.progress_bar.setValue(0))
+    def reset_transfer_progress(self):
+        self.progress_reset_pending = False
+        if not self.jobs.active_jobs():
+            self.progress_bar.setValue(0)
+
+    def update_throughput(self):
+        self.throughput.sample()
+        upload, download = self.throughput.rate("upload"), self.throughput.rate("download")
+        self.throughput_label.setText(f"Upload {format_bytes(upload)}/s · Download {format_bytes(download)}/s")
+        if self.stack.currentIndex() == 0:  # Chỉ vẽ lại khi đang xem Dashboard
+            history = self.throughput.history
+            self.throughput_chart.plot(list(history["upload"]), list(history["download"]))
+
+    def update_concurrency_label(self):
+        lines = []
+        for client in (self.swift, self.orthanc):
+            info = client.limiter.snapshot()
+            lines.append(f"{info['name']}: {info['in_flight']} active / limit {info['limit']}, "
+                         f"{client.retry_policy.retries} retries")
+        self.concurrency_label.setText("\n".join(lines))
+
+    # In thống kê pool kết nối Swift (pool hit / kết nối mới)
+    def log_connection_stats(self):
+        stats = self.swift.connection_stats()
+        logger.info("%s requests, %s pool hits, %s new connections, %s retries",
+                    stats["requests"], stats["pool_hits"], stats["new_connections"], stats["retries"])
 
         #Xử lý folder
 
@@ -1768,22 +2868,16 @@ class MainWindow(QWidget):
             self.list_containers()
             return
 
-        headers = {"X-Auth-Token": self.token}
         matched_containers = []
 
         for container in self.get_all_containers():
             try:
-                url = f"{self.storage_url}/{container}?format=json"
-                response = requests.get(url, headers=headers)
-                if response.status_code != 200:
-                    continue
-
-                objects = response.json()
+                objects = list(self.swift.iter_listing(container))
                 matched_objects = [obj for obj in objects if keyword in obj.get("name", "").lower()]
 
                 if matched_objects:
                     # Hiển thị container nếu có object trùng
-                    total_size = sum(int(obj.get("bytes", 0)) for obj in objects)
+                    total_size = self.container_bytes.get(container, 0)
                     row = self.container_table.rowCount()
                     self.container_table.insertRow(row)
                     self.container_table.setItem(row, 0, QTableWidgetItem(container))
@@ -1834,8 +2928,7 @@ class MainWindow(QWidget):
         if not urls:
             return
 
-        file_tasks = []
-        containers_to_create = set()
+        folders = {}  # Tên folder (container) mới -> thư mục local
         system_containers = {"backup", "dicom"}  # lowercase để so sánh
 
         existing_containers = set(self.get_all_containers())
@@ -1851,7 +2944,7 @@ class MainWindow(QWidget):
 
             container_name = os.path.basename(local_path)
 
-            if container_name.lower() in system_containers:
+            if container_name.lower() in system_containers or is_internal_container(container_name):
                 QMessageBox.critical(self, "Error", f"Cannot create folder with system name '{container_name}'")
                 return
 
@@ -1859,79 +2952,27 @@ class MainWindow(QWidget):
                 QMessageBox.critical(self, "Error", f"Already have container with name '{container_name}'")
                 return
 
-            containers_to_create.add(container_name)
-
-            for root, _, files in os.walk(local_path):
-                for file in files:
-                    full_path = os.path.join(root, file)
-                    rel_path = os.path.relpath(full_path, local_path).replace("\\", "/")
-                    object_name = rel_path
-                    file_tasks.append((container_name, full_path, object_name))
+            folders[container_name] = local_path
 
-        if not containers_to_create:
-            return
-
-            # ✅ Thêm kiểm tra quota
-        total_size = sum(os.path.getsize(path) for _, path, _ in file_tasks)
-        if self.used_bytes + total_size > self.total_quota_bytes:
-            QMessageBox.critical(self, "Storage Exceeded", "Not enough storage to upload these folders.")
+        if not folders:
             return
 
         confirm = QMessageBox.question(
             self,
             "Confirm Upload",
-            f"Create {len(containers_to_create)} folder(s) and upload {len(file_tasks)} file(s)?",
+            f"Create {len(folders)} folder(s) and upload their contents?",
             QMessageBox.Yes | QMessageBox.No
         )
         if confirm != QMessageBox.Yes:
             return
 
-        # Tạo container (kể cả rỗng)
-        headers = {"X-Auth-Token": self.token}
-        for container_name in containers_to_create:
-            url = f"{self.storage_url}/{container_name}"
-            resp = requests.put(url, headers=headers)
-            if resp.status_code not in [201, 202, 204]:
-                QMessageBox.warning(self, "Error", f"Failed to create container '{container_name}'")
-
-        # Nếu có file thì upload
-        if file_tasks:
-            self.upload_files_to_new_containers(file_tasks)
-
-        QTimer.singleShot(2000, self.list_containers)
-
-    def upload_files_to_new_containers(self, file_tasks):
-        headers = {"X-Auth-Token": self.token}
-
-        grouped = {}
-        for container, path, obj_name in file_tasks:
-            grouped.setdefault(container, []).append((path, obj_name))
-
-        for container_name, items in grouped.items():
-            url = f"{self.storage_url}/{container_name}"
-            resp = requests.put(url, headers=headers)
+        # Tạo container (kể cả rỗng) rồi upload nội dung từng thư mục, quota được kiểm tra trong lúc quét
+        for container_name, local_path in folders.items():
+            resp = self.swift.put(container_name)
             if resp.status_code not in [201, 202, 204]:
                 QMessageBox.warning(self, "Error", f"Failed to create container '{container_name}'")
                 continue
-
-            total = len(items)
-            self.completed_tasks = 0
-            self.total_tasks = total
-            self.progress_bar.setValue(0)
-
-            for idx, (filepath, object_name) in enumerate(items):
-                worker = UploadWorker(
-                    token=self.token,
-                    storage_url=self.storage_url,
-                    container=container_name,
-                    filepath=filepath,
-                    object_name=object_name,
-                    index=idx,
-                    total=total
-                )
-                worker.signals.error.connect(lambda msg: QMessageBox.warning(self, "Upload Error", msg))
-                worker.signals.done.connect(self.on_work_done)
-                self.threadpool.start(worker)
+            self.start_upload_pipeline(container_name, [(local_path, "")])
 
         QTimer.singleShot(2000, self.list_containers)
 
@@ -1985,76 +3026,114 @@ class MainWindow(QWidget):
     def list_containers(self):
         self.calculate_total_used_bytes()
         try:
-            headers = {"X-Auth-Token": self.token}
-            response = requests.get(self.storage_url, headers=headers)
-
             self.container_table.setRowCount(0)
             self.table.setRowCount(0)
+            self.current_prefix = ""
+            self.path_label.setText("")
+            self.up_btn.setEnabled(False)
 
             self.containers = []  # 🔥 Thêm dòng này để reset danh sách container
+            self.container_bytes = {}
+            self.container_counts = {}
 
-            if response.status_code == 200:
-                containers = response.text.strip().split('\n')
-                for container in containers:
-                    if not container:
-                        continue
-
-                    self.containers.append(container)  # 🔥 Lưu container vào self.containers
+            # Listing của account đã có sẵn bytes/count của từng container
+            for entry in self.swift.iter_listing():
+                container = entry["name"]
+                if is_internal_container(container):
+                    continue
+                self.containers.append(container)  # 🔥 Lưu container vào self.containers
+                self.container_bytes[container] = int(entry.get("bytes", 0))
+                self.container_counts[container] = int(entry.get("count", 0))
+                formatted_size = format_bytes(self.container_bytes[container])
 
-                    try:
-                        container_url = f"{self.storage_url}/{container}"
-                        r2 = requests.get(container_url, headers=headers, params={"format": "json"})
-                        r2.raise_for_status()
-                        objects = r2.json()
-                        total_size = sum(int(obj.get("bytes", 0)) for obj in objects)
-                        formatted_size = format_bytes(total_size)
-                    except Exception:
-                        formatted_size = "?"
+                row = self.container_table.rowCount()
+                self.container_table.insertRow(row)
+                self.container_table.setItem(row, 0, QTableWidgetItem(container))
+                self.container_table.setItem(row, 1, QTableWidgetItem(formatted_size))
 
-                    row = self.container_table.rowCount()
-                    self.container_table.insertRow(row)
-                    self.container_table.setItem(row, 0, QTableWidgetItem(container))
-                    self.container_table.setItem(row, 1, QTableWidgetItem(formatted_size))
-            else:
+            if not self.containers:
                 QMessageBox.information(self, "Notification", "There are currently no folders")
         except Exception as e:
             self.container_table.setRowCount(0)
             self.table.setRowCount(0)
             QMessageBox.critical(self, "Error", f"Connection error: {str(e)}")
 
-        if hasattr(self, 'pie_chart') and hasattr(self, 'line_chart'):
-            self.pie_chart.plot(self.get_file_type_sizes())
-            self.line_chart.plot(self.get_upload_timestamps_last_1h())
+        self.update_file_type_stats()
 
     def on_container_clicked(self, row, column):
         container_name_item = self.container_table.item(row, 0)
         if not container_name_item:
             return
-        container_name = container_name_item.text()
-        self.selected_container = container_name
+        self.selected_container = container_name_item.text()
+        self.current_prefix = ""
+        self.load_object_listing()
+
+    # Hiện các con trực tiếp của thư mục ảo current_prefix (delimiter="/"), tải theo từng trang
+    def load_object_listing(self):
+        container_name = self.selected_container
+        if not container_name:
+            return
+        prefix = self.current_prefix
+        self.table.setRowCount(0)
+        self.path_label.setText(f"{container_name}/{prefix}")
+        self.up_btn.setEnabled(bool(prefix))
 
-        try:
-            headers = {"X-Auth-Token": self.token}
-            url = f"{self.storage_url}/{container_name}?format=json"
-            response = requests.get(url, headers=headers)
-
-            if response.status_code == 200:
-                objects = response.json()
-                self.table.setRowCount(0)
-                for obj in objects:
-                    name = obj.get("name", "")
-                    size_bytes = obj.get("bytes", 0)
-                    last_modified = obj.get("last_modified", "")
-
-                    row = self.table.rowCount()
-                    self.table.insertRow(row)
-                    self.table.setItem(row, 0, QTableWidgetItem(name))
-                    self.table.setItem(row, 1, QTableWidgetItem(format_bytes(size_bytes)))
-                    self.table.setItem(row, 2, QTableWidgetItem(format_datetime(last_modified)))
-            else:
-                QMessageBox.information(self, "Notification", f"Unable to load files in the folder {container_name}")
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Connection error: {str(e)}")
+        # Mỗi lần tải tăng generation để bỏ qua các trang của listing cũ còn đang tải
+        self.listing_generation += 1
+        generation = self.listing_generation
+
+        def on_page(objects):
+            if generation != self.listing_generation:
+                return
+            self.append_object_rows(objects)
+
+        def on_error(msg):
+            if generation != self.listing_generation:
+                return
+            QMessageBox.information(self, "Notification",
+                                    f"Unable to load files in the folder {container_name}\n{msg}")
+
+        worker = ListingWorker(self.swift, container_name, prefix=prefix, delimiter="/")
+        worker.signals.page.connect(on_page)
+        worker.signals.error.connect(on_error)
+        self.threadpool.start(worker)
+
+    def open_virtual_folder(self, prefix):
+        self.current_prefix = prefix
+        self.load_object_listing()
+
+    def go_up_folder(self):
+        parent = self.current_prefix.rstrip("/").rpartition("/")[0]
+        self.open_virtual_folder(parent + "/" if parent else "")
+
+    def append_object_rows(self, objects):
+        self.table.setUpdatesEnabled(False)
+        for obj in objects:
+            if "subdir" in obj:
+                # Thư mục ảo: tên kết thúc bằng "/", không có size/ngày
+                row = self.table.rowCount()
+                self.table.insertRow(row)
+                self.table.setItem(row, 0, QTableWidgetItem(obj["subdir"]))
+                self.table.setItem(row, 1, QTableWidgetItem(""))
+                self.table.setItem(row, 2, QTableWidgetItem(""))
+                continue
+
+            name = obj.get("name", "")
+            if name == self.current_prefix:
+                continue  # Object đánh dấu thư mục (tên "a/b/") của chính thư mục đang xem
+            size_bytes = obj.get("bytes", 0)
+            last_modified = obj.get("last_modified", "")
+
+            row = self.table.rowCount()
+            self.table.insertRow(row)
+            self.table.setItem(row, 0, QTableWidgetItem(name))
+            self.table.setItem(row, 1, QTableWidgetItem(format_bytes(size_bytes)))
+            self.table.setItem(row, 2, QTableWidgetItem(format_datetime(last_modified)))
+        self.table.setUpdatesEnabled(True)
+
+        # Áp dụng lại ô tìm kiếm cho các dòng vừa thêm
+        if self.object_search.text():
+            self.filter_objects(self.object_search.text())
 
     def on_container_header_clicked(self, column_index):
         current_order = self.container_sort_state.get("ascending", True)
@@ -2073,21 +3152,14 @@ class MainWindow(QWidget):
                 return
 
             try:
-                headers = {"X-Auth-Token": self.token}
-
                 # Kiểm tra xem container đã tồn tại chưa
-                check_url = f"{self.storage_url}/{name}"
-                check_resp = requests.head(check_url, headers=headers)
+                check_resp = self.swift.head(name)
                 if check_resp.status_code == 204:  # Container exists
                     QMessageBox.warning(self, "Failure", f"Folder '{name}' already exists")
                     return
 
                 # Nếu chưa có thì tạo mới
-                create_headers = {
-                    "X-Auth-Token": self.token,
-                    "Content-Length": "0"
-                }
-                create_resp = requests.put(check_url, headers=create_headers)
+                create_resp = self.swift.put(name, headers={"Content-Length": "0"})
 
                 if create_resp.status_code == 201:
                     QMessageBox.information(self, "Success", f"Folder '{name}' has been created")
@@ -2127,36 +3199,11 @@ class MainWindow(QWidget):
             return
 
         try:
-            headers = {"X-Auth-Token": self.token}
-            url = f"{self.storage_url}/{container_name}?format=json"
-            response = requests.get(url, headers=headers)
-
-            if response.status_code != 200:
-                QMessageBox.warning(self, "Error",
-                                    f"Unable to retrieve object for download\nHTTP {response.status_code}")
-                return
-
-            objects = response.json()
-            self.total_tasks = len(objects)
-            self.completed_tasks = 0
-            self.progress_bar.setValue(0)
-
-            for idx, obj in enumerate(objects):
-                object_name = obj.get("name", "")
-                save_path = os.path.join(save_dir, container_name, object_name.replace("/", os.sep))
-
-                worker = DownloadWorker(
-                    token=self.token,
-                    storage_url=self.storage_url,
-                    container=container_name,
-                    object_name=object_name,
-                    save_path=save_path,
-                    index=idx,
-                    total=self.total_tasks
-                )
-                worker.signals.done.connect(self.on_work_done)
-                worker.signals.error.connect(lambda msg: QMessageBox.warning(self, "Downloading error", msg))
-                self.threadpool.start(worker)
+            job_id = self.journal.start_job("download", container_name)
+            job = self.create_transfer_job("download", container_name, job_id, error_title="Downloading error")
+            self.start_listing_download(
+                job, container_name, None,
+                lambda name: os.path.join(save_dir, container_name, name.replace("/", os.sep)))
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Error downloading folder: {str(e)}")
 
@@ -2172,65 +3219,68 @@ class MainWindow(QWidget):
         if reply != QMessageBox.Yes:
             return  # Người dùng bấm No => thoát luôn
 
-        try:
-            headers = {"X-Auth-Token": self.token}
-            url = f"{self.storage_url}/{container_name}?format=json"
-            response = requests.get(url, headers=headers)
+        # Liệt kê và xóa ngay trong worker: object trước, rồi segment của file lớn, container cuối cùng
+        def on_finished(report):
+            container_path = bulk_path(container_name)
+            for path, status in report["errors"]:
+                if path == container_path and "409" in str(status):
+                    QMessageBox.warning(self, "Error", "Unable to delete folder: Files still exist")
+            self.calculate_total_used_bytes()  # Cập nhật dung lượng
+            self.list_containers()
 
-            objects = response.json() if response.status_code == 200 else []
-            num_objects = len(objects)
+        total = self.container_counts.get(container_name, 0) + 1  # +1 là container
+        self.start_bulk_delete(container_name, None, total, on_finished)
 
-            self.total_tasks = num_objects + 1  # +1 là container
-            self.completed_tasks = 0
-            self.progress_bar.setValue(0)
+    # Chạy BulkDeleteWorker, cập nhật progress theo số item và báo lỗi gộp một lần khi xong
+    # prefix: xóa các object theo prefix, worker liệt kê rồi báo lại tổng số (names, total bỏ qua)
+    def start_bulk_delete(self, container, names, total, on_finished=None, prefix=None):
+        progress = {"done": 0, "total": max(total, 1)}
+        self.progress_bar.setValue(0)
 
-            # Biến nội bộ đếm số lượng object đã xóa xong
-            self.object_delete_done = 0
+        def on_listed(count):
+            progress["total"] = max(count, 1)
 
-            def delete_container():
-                try:
-                    url = f"{self.storage_url}/{container_name}"
-                    del_response = requests.delete(url, headers=headers)
-                    if del_response.status_code == 204:
-                        print(f"Đã xóa container: {container_name}")
-                    elif del_response.status_code == 409:
-                        QMessageBox.warning(self, "Error", "Unable to delete folder: Files still exist")
-                    else:
-                        QMessageBox.information(self, "Notification",
-                                                f"Folder '{container_name}' still exists or encountered an error")
-                except Exception as e:
-                    QMessageBox.critical(self, "Error", f"Error deleting folder: {str(e)}")
-                self.on_work_done()
-                self.calculate_total_used_bytes()  # Cập nhật dung lượng
+        def on_progress(count):
+            progress["done"] += count
+            percent = min(100, int((progress["done"] / progress["total"]) * 100))
+            self.progress_bar.setValue(percent)
 
-            if num_objects == 0:
-                # Nếu không có object, xóa luôn container
-                delete_container()
-                return
+        def on_done(report):
+            self.progress_bar.setValue(100)
+            QTimer.singleShot(1000, lambda: self.progress_bar.setValue(0))
+            self.show_delete_report(report)
+            if on_finished:
+                on_finished(report)
+
+        worker = BulkDeleteWorker(self.swift, container, names, prefix)
+        self.track_account_worker(worker)
+        worker.signals.listed.connect(on_listed)
+        worker.signals.progress.connect(on_progress)
+        worker.signals.finished.connect(on_done)
+        worker.signals.error.connect(lambda msg: QMessageBox.critical(self, "Delete Error", msg))
+        self.threadpool.start(worker)
 
-            # Khi từng object được xóa xong
-            def on_object_deleted():
-                self.object_delete_done += 1
-                self.on_work_done()
-                if self.object_delete_done == num_objects:
-                    delete_container()
-
-            for idx, obj in enumerate(objects):
-                object_name = obj.get("name")
-                worker = DeleteWorker(
-                    token=self.token,
-                    storage_url=self.storage_url,
-                    container=container_name,
-                    object_name=object_name,
-                    index=idx,
-                    total=self.total_tasks
-                )
-                worker.signals.done.connect(on_object_deleted)
-                worker.signals.error.connect(lambda msg: QMessageBox.warning(self, "Delete Error", msg))
-                self.threadpool.start(worker)
+    # Đếm worker xóa đang chạy trên self.swift: switch user phải chờ chúng xong, nếu không chúng sẽ
+    # xóa tiếp trên account mới sau khi client được set_auth. Gọi trước khi nối các handler khác.
+    def track_account_worker(self, worker):
+        self.account_workers += 1
 
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Error deleting folder: {str(e)}")
+        def done(*args):
+            self.account_workers -= 1
+
+        worker.signals.finished.connect(done)
+        worker.signals.error.connect(done)
+
+    def show_delete_report(self, report):
+        errors = report["errors"]
+        logger.info("Delete: %s deleted, %s not found, %s failed", report["deleted"], report["not_found"], len(errors))
+        if not errors:
+            return
+        lines = [f"{path} - {status}" for path, status in errors[:10]]
+        if len(errors) > 10:
+            lines.append(f"... and {len(errors) - 10} more")
+        QMessageBox.warning(self, "Delete Error",
+                            f"{len(errors)} item(s) could not be deleted:\n" + "\n".join(lines))
 
         #Xử lý file
 
@@ -2248,36 +3298,22 @@ class MainWindow(QWidget):
             return
 
         try:
-            headers = {"X-Auth-Token": self.token}
-
             # Kiểm tra xem container mới đã tồn tại chưa
-            check_url = f"{self.storage_url}/{quote(new_name)}"
-            check_resp = requests.head(check_url, headers=headers)
+            check_resp = self.swift.head(new_name)
             if check_resp.status_code == 204:  # Container đã tồn tại
                 QMessageBox.warning(self, "Failure", f"Folder '{new_name}' already exists")
                 return
 
             # Tạo container mới
-            create_resp = requests.put(check_url, headers=headers)
+            create_resp = self.swift.put(new_name)
             if create_resp.status_code not in (201, 202):
                 raise Exception("Unable to create new folder")
 
-            # Lấy danh sách object từ container cũ
-            list_url = f"{self.storage_url}/{quote(old_container_name)}?format=json"
-            list_resp = requests.get(list_url, headers=headers)
-            if list_resp.status_code != 200:
-                raise Exception("Unable to retrieve file list from the old folder")
-            objects = list_resp.json()
-
-            # Copy từng object sang folder mới
-            for obj in objects:
+            # Copy từng object sang folder mới (listing của container cũ được duyệt theo từng trang)
+            for obj in self.swift.iter_listing(old_container_name):
                 object_name = obj["name"]
-                copy_url = f"{self.storage_url}/{quote(new_name)}/{quote(object_name)}"
-                headers_copy = {
-                    "X-Auth-Token": self.token,
-                    "X-Copy-From": f"/{quote(old_container_name)}/{quote(object_name)}"
-                }
-                copy_resp = requests.put(copy_url, headers=headers_copy)
+                headers_copy = {"X-Copy-From": f"/{quote(old_container_name)}/{quote(object_name)}"}
+                copy_resp = self.swift.put(new_name, object_name, headers=headers_copy)
                 if copy_resp.status_code not in (201, 202):
                     raise Exception(f"Unable to copy object: {object_name}")
 
@@ -2318,13 +3354,16 @@ class MainWindow(QWidget):
         row = item.row()
         object_name = self.table.item(row, 0).text()
 
+        if object_name.endswith("/"):
+            self.open_virtual_folder(object_name)
+            return
+
         # Kiểm tra phần mở rộng
         ext = os.path.splitext(object_name)[1].lower()
         if ext in ['.txt', '.json', '.xml']:
             try:
-                headers = {"X-Auth-Token": self.token}
-                url = f"{self.storage_url}/{self.selected_container}/{object_name}"
-                response = requests.get(url, headers=headers)
+                with self.bandwidth.interactive():
+                    response = self.swift.get(self.selected_container, object_name)
 
                 if response.status_code != 200:
                     raise Exception(f"HTTP {response.status_code}")
@@ -2343,9 +3382,8 @@ class MainWindow(QWidget):
 
     def show_image_viewer(self, object_name):
         try:
-            headers = {"X-Auth-Token": self.token}
-            url = f"{self.storage_url}/{self.selected_container}/{object_name}"
-            response = requests.get(url, headers=headers)
+            with self.bandwidth.interactive():
+                response = self.swift.get(self.selected_container, object_name)
 
             if response.status_code != 200:
                 raise Exception(f"HTTP {response.status_code}")
@@ -2380,12 +3418,9 @@ class MainWindow(QWidget):
             return
 
         try:
-            headers = {
-                "X-Auth-Token": self.token,
-                "Content-Type": "text/plain"
-            }
-            url = f"{self.storage_url}/{self.selected_container}/{filename}"
-            response = requests.put(url, headers=headers, data=updated_content.encode('utf-8'))
+            headers = {"Content-Type": "text/plain"}
+            response = self.swift.put(self.selected_container, filename, headers=headers,
+                                      data=updated_content.encode('utf-8'))
 
             if response.status_code not in [201, 202]:
                 raise Exception(f"HTTP {response.status_code}")
@@ -2396,11 +3431,7 @@ class MainWindow(QWidget):
 
     def list_objects(self, container_name):
         try:
-            headers = {"X-Auth-Token": self.token}
-            container_url = f"{self.storage_url}/{container_name}"
-            response = requests.get(container_url, headers=headers, params={"format": "json"})
-            response.raise_for_status()
-            return response.json()
+            return list(self.swift.iter_listing(container_name))
         except Exception as e:
             return []
 
@@ -2413,50 +3444,16 @@ class MainWindow(QWidget):
         if not urls:
             return
 
-        file_tasks = []
-        total_upload_size = 0
-
+        roots = []
         for url in urls:
             local_path = url.toLocalFile()
-            if os.path.isdir(local_path):
-                for root, _, files in os.walk(local_path):
-                    for file in files:
-                        full_path = os.path.join(root, file)
-                        rel_path = os.path.relpath(full_path, os.path.dirname(local_path))
-                        object_name = rel_path.replace("\\", "/")
-                        file_tasks.append((full_path, object_name))
-                        total_upload_size += os.path.getsize(full_path)
-            elif os.path.isfile(local_path):
-                object_name = os.path.basename(local_path)
-                file_tasks.append((local_path, object_name))
-                total_upload_size += os.path.getsize(local_path)
-
-        available_space = self.total_quota_bytes - self.used_bytes
-        if total_upload_size > available_space:
-            QMessageBox.critical(self, "Insufficient storage", "Not enough storage to upload")
+            if os.path.exists(local_path):
+                roots.append((local_path, os.path.basename(local_path.rstrip("/\\"))))
+        if not roots:
             return
 
-        self.completed_tasks = 0
-        self.total_tasks = len(file_tasks)
-        if self.total_tasks == 0:
-            return
-
-        self.progress_bar.setValue(0)
-
-        for idx, (filepath, object_name) in enumerate(file_tasks):
-            worker = UploadWorker(
-                token=self.token,
-                storage_url=self.storage_url,
-                container=self.selected_container,
-                filepath=filepath,
-                object_name=object_name,
-                index=idx,
-                total=self.total_tasks
-            )
-            worker.signals.progress.connect(self.progress_bar.setValue)
-            worker.signals.error.connect(lambda msg: QMessageBox.warning(self, "Uploading error", msg))
-            worker.signals.done.connect(self.on_work_done)
-            self.threadpool.start(worker)
+        skip_unchanged = self.ask_skip_unchanged(self.selected_container)
+        self.start_upload_pipeline(self.selected_container, roots, skip_unchanged)
 
     def on_object_header_clicked(self, column_index):
         # Toggle sort order
@@ -2530,6 +3527,22 @@ class MainWindow(QWidget):
 
         menu = QMenu()
 
+        if len(selected_rows) == 1 and self.table.item(selected_rows[0], 0).text().endswith("/"):
+            # Dòng thư mục ảo
+            prefix = self.table.item(selected_rows[0], 0).text()
+            open_action = menu.addAction("📂 Open folder")
+            download_folder_action = menu.addAction("📁 Download folder")
+            delete_folder_action = menu.addAction("🗑️ Delete folder")
+
+            action = menu.exec_(self.table.viewport().mapToGlobal(pos))
+            if action == open_action:
+                self.open_virtual_folder(prefix)
+            elif action == download_folder_action:
+                self.download_prefix(prefix)
+            elif action == delete_folder_action:
+                self.delete_prefix(prefix)
+            return
+
         if len(selected_rows) == 1:
             object_name = self.table.item(selected_rows[0], 0).text()
             download_action = menu.addAction("📥 Download file")
@@ -2565,7 +3578,10 @@ class MainWindow(QWidget):
             QMessageBox.information(self, "Invalid", "Selected file is not inside any folder.")
             return
 
-        folder_prefix = object_name.rsplit('/', 1)[0] + '/'  # ví dụ: codau/test/
+        self.download_prefix(object_name.rsplit('/', 1)[0] + '/')  # ví dụ: codau/test/
+
+    # Tải thư mục ảo: chỉ liệt kê các object có prefix (lọc phía server)
+    def download_prefix(self, folder_prefix):
         folder_name = folder_prefix.rstrip('/').split('/')[-1]  # ví dụ: test
 
         # 🗂️ Hỏi user chọn nơi lưu folder
@@ -2573,52 +3589,30 @@ class MainWindow(QWidget):
         if not save_root:
             return
 
-        try:
-            headers = {"X-Auth-Token": self.token}
-            url = f"{self.storage_url}/{self.selected_container}?format=json"
-            response = requests.get(url, headers=headers)
-            response.raise_for_status()
-            objects = response.json()
-
-            to_download = [obj["name"] for obj in objects if obj["name"].startswith(folder_prefix)]
+        container = self.selected_container
 
-            if not to_download:
+        def on_download_done(job):
+            self.cleanup_cancelled_job(job)
+            if job.state == CANCELLED:
+                return
+            if not job.total_files and not job.errors:
                 QMessageBox.information(self, "Not Found", f"No files found in folder '{folder_name}'")
                 return
+            QMessageBox.information(self, "Download Completed",
+                                    f"Folder '{folder_name}' downloaded successfully.")
 
-            self.completed_tasks = 0
-            self.total_tasks = len(to_download)
-            self.progress_bar.setValue(0)
-
-            def on_download_done():
-                self.completed_tasks += 1
-                percent = int((self.completed_tasks / self.total_tasks) * 100)
-                self.progress_bar.setValue(percent)
-
-                if self.completed_tasks == self.total_tasks:
-                    QMessageBox.information(self, "Download Completed",
-                                            f"Folder '{folder_name}' downloaded successfully.")
-                    self.progress_bar.setValue(0)
-
-            def on_download_error(msg):
-                QMessageBox.warning(self, "Download Error", msg)
-
-            for idx, obj_name in enumerate(to_download):
-                relative_path = obj_name[len(folder_prefix):]  # phần còn lại sau prefix
-                save_path = os.path.join(save_root, folder_name, relative_path)
+        def save_path(obj_name):
+            if obj_name.endswith("/"):
+                return None  # Object đánh dấu thư mục ảo
+            relative_path = obj_name[len(folder_prefix):]  # phần còn lại sau prefix
+            return os.path.join(save_root, folder_name, relative_path.replace("/", os.sep))
 
-                worker = DownloadWorker(
-                    token=self.token,
-                    storage_url=self.storage_url,
-                    container=self.selected_container,
-                    object_name=obj_name,
-                    save_path=save_path,
-                    index=idx,
-                    total=self.total_tasks
-                )
-                worker.signals.done.connect(on_download_done)
-                worker.signals.error.connect(on_download_error)
-                self.threadpool.start(worker)
+        try:
+            name = f"{container}/{folder_prefix}"
+            job_id = self.journal.start_job("download", name)
+            job = self.create_transfer_job("download", name, job_id, on_finished=on_download_done,
+                                           error_title="Download Error")
+            self.start_listing_download(job, container, folder_prefix, save_path)
 
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Error downloading folder:\n{str(e)}")
@@ -2629,7 +3623,10 @@ class MainWindow(QWidget):
             return
 
         # ✅ Lấy folder chứa file (cấp ngay trên)
-        folder_prefix = object_name.rsplit('/', 1)[0] + '/'  # ví dụ: codau/test/
+        self.delete_prefix(object_name.rsplit('/', 1)[0] + '/')  # ví dụ: codau/test/
+
+    # Xóa thư mục ảo: liệt kê theo prefix rồi xóa bằng bulk delete
+    def delete_prefix(self, folder_prefix):
         folder_name = folder_prefix.rstrip('/').split('/')[-1]  # ví dụ: test
 
         confirm = QMessageBox.question(
@@ -2641,56 +3638,24 @@ class MainWindow(QWidget):
         if confirm != QMessageBox.Yes:
             return
 
-        try:
-            headers = {"X-Auth-Token": self.token}
-            url = f"{self.storage_url}/{self.selected_container}?format=json"
-            response = requests.get(url, headers=headers)
-            response.raise_for_status()
-            objects = response.json()
-
-            # ✅ Lọc các object có prefix đúng folder cần xoá
-            to_delete = [obj["name"] for obj in objects if obj["name"].startswith(folder_prefix)]
-
-            if not to_delete:
+        # Liệt kê theo prefix và xóa ngay trong worker, không chờ listing trên luồng UI
+        def on_finished(report):
+            if not report["deleted"] and not report["not_found"] and not report["errors"]:
                 QMessageBox.information(self, "Not Found", f"No files found in folder '{folder_name}'")
                 return
+            if not report["errors"]:
+                QMessageBox.information(self, "Deleted", f"Folder '{folder_name}' deleted successfully.")
+            if self.current_prefix.startswith(folder_prefix):
+                self.current_prefix = ""
+            self.load_object_listing()
 
-            self.completed_tasks = 0
-            self.total_tasks = len(to_delete)
-            self.progress_bar.setValue(0)
-
-            def on_delete_done():
-                self.completed_tasks += 1
-                percent = int((self.completed_tasks / self.total_tasks) * 100)
-                self.progress_bar.setValue(percent)
-
-                if self.completed_tasks == self.total_tasks:
-                    QMessageBox.information(self, "Deleted", f"Folder '{folder_name}' deleted successfully.")
-                    self.progress_bar.setValue(0)
-                    self.on_container_clicked(self.container_table.currentRow(), 0)
-
-            def on_delete_error(msg):
-                QMessageBox.warning(self, "Delete Error", msg)
-
-            for idx, obj_name in enumerate(to_delete):
-                worker = DeleteWorker(
-                    token=self.token,
-                    storage_url=self.storage_url,
-                    container=self.selected_container,
-                    object_name=obj_name,
-                    index=idx,
-                    total=self.total_tasks
-                )
-                worker.signals.done.connect(on_delete_done)
-                worker.signals.error.connect(on_delete_error)
-                self.threadpool.start(worker)
-
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Error deleting folder:\n{str(e)}")
+        self.start_bulk_delete(self.selected_container, None, 0, on_finished, prefix=folder_prefix)
 
     def download_selected_objects(self, rows):
         for row in rows:
             object_name = self.table.item(row, 0).text()
+            if object_name.endswith("/"):
+                continue  # Bỏ qua dòng thư mục ảo
             self.download_single_object(object_name)
 
     def delete_selected_objects(self, rows):
@@ -2701,13 +3666,8 @@ class MainWindow(QWidget):
             QMessageBox.Yes | QMessageBox.No
         )
         if confirm == QMessageBox.Yes:
-            self.total_tasks = len(rows)
-            self.completed_tasks = 0
-            self.progress_bar.setValue(0)
-
-            for row in sorted(rows, reverse=True):
-                object_name = self.table.item(row, 0).text()
-                self.delete_single_object(object_name, confirm=False, is_batch=True)
+            object_names = [self.table.item(row, 0).text() for row in sorted(rows, reverse=True)]
+            self.delete_objects([name for name in object_names if not name.endswith("/")])
 
     def download_single_object(self, object_name):
         if not self.selected_container:
@@ -2718,24 +3678,13 @@ class MainWindow(QWidget):
         if not save_path:
             return
 
-        self.total_tasks = 1
-        self.completed_tasks = 0
-        self.progress_bar.setValue(0)
-
-        worker = DownloadWorker(
-            token=self.token,
-            storage_url=self.storage_url,
-            container=self.selected_container,
-            object_name=object_name,
-            save_path=save_path,
-            index=0,
-            total=1
-        )
-        worker.signals.done.connect(self.on_work_done)
-        worker.signals.error.connect(lambda msg: QMessageBox.warning(self, "Downloading error", msg))
-        self.threadpool.start(worker)
+        tasks = [(self.selected_container, object_name, save_path)]
+        job_id = self.journal.start_job("download", object_name, tasks)
+        job = self.create_transfer_job("download", object_name, job_id, error_title="Downloading error")
+        self.add_download_tasks(job, tasks)
+        self.submit_transfer_job(job)
 
-    def delete_single_object(self, object_name, confirm=True, is_batch=False):
+    def delete_single_object(self, object_name, confirm=True):
         if not self.selected_container:
             QMessageBox.warning(self, "Error", "No folder selected")
             return
@@ -2750,22 +3699,20 @@ class MainWindow(QWidget):
             if user_confirm != QMessageBox.Yes:
                 return
 
-        if not is_batch:
-            self.total_tasks = 1
-            self.completed_tasks = 0
-            self.progress_bar.setValue(0)
+        self.delete_objects([object_name])
 
-        worker = DeleteWorker(
-            token=self.token,
-            storage_url=self.storage_url,
-            container=self.selected_container,
-            object_name=object_name,
-            index=0,
-            total=1
-        )
-        worker.signals.done.connect(self.on_work_done)
-        worker.signals.error.connect(lambda msg: QMessageBox.warning(self, "Delete error", msg))
-        self.threadpool.start(worker)
+    # Xóa các object trong folder đang chọn bằng một lần bulk delete
+    def delete_objects(self, object_names):
+        if not self.selected_container:
+            QMessageBox.warning(self, "Error", "No folder selected")
+            return
+
+        def on_finished(report):
+            self.calculate_total_used_bytes()
+            self.list_containers()
+
+        object_names = list(object_names)
+        self.start_bulk_delete(self.selected_container, object_names, len(object_names), on_finished)
 
     def rename_object(self, row):
         old_object_name = self.table.item(row, 0).text()
@@ -2789,32 +3736,25 @@ class MainWindow(QWidget):
             if not container:
                 raise Exception("No folder selected")
 
-            headers = {"X-Auth-Token": self.token}
-
             # ✅ Kiểm tra object mới có tồn tại chưa
-            check_url = f"{self.storage_url}/{quote(container)}/{quote(new_name)}"
-            check_resp = requests.head(check_url, headers=headers)
+            check_resp = self.swift.head(container, new_name)
             if check_resp.status_code == 200:  # Object đã tồn tại
                 QMessageBox.warning(self, "Failure", f"A file named '{new_name}' already exists in this folder.")
                 return
 
             # Copy object với tên mới
-            copy_headers = {
-                "X-Auth-Token": self.token,
-                "X-Copy-From": f"/{quote(container)}/{quote(old_object_name)}"
-            }
-            copy_resp = requests.put(check_url, headers=copy_headers)
+            copy_headers = {"X-Copy-From": f"/{quote(container)}/{quote(old_object_name)}"}
+            copy_resp = self.swift.put(container, new_name, headers=copy_headers)
             if copy_resp.status_code not in (201, 202):
                 raise Exception("Failed to copy file")
 
-            # Xoá object cũ
-            delete_url = f"{self.storage_url}/{quote(container)}/{quote(old_object_name)}"
-            delete_resp = requests.delete(delete_url, headers=headers)
+            # Xoá object cũ (file lớn: xóa cả segment, bản copy là object thường)
+            delete_resp = self.swift.delete(container, old_object_name, params={"multipart-manifest": "delete"})
             if delete_resp.status_code not in (204, 404):
                 raise Exception("Failed to delete old file")
 
             QMessageBox.information(self, "Success", "File renamed successfully")
-            self.on_container_clicked(QListWidgetItem(self.selected_container))
+            self.load_object_listing()
 
         except Exception as e:
             QMessageBox.critical(self, "Error", str(e))
@@ -2822,6 +3762,10 @@ class MainWindow(QWidget):
     #Tab Backup
     # Hàm thực hiện backup chính
     def do_backup(self, is_now=True):
+        if self.prune_running:
+            # plan_prune đã tính chunk/segment không còn ai dùng, backup mới có thể dùng lại chúng
+            QMessageBox.information(self, "Backup", "Please wait until the cleanup of old snapshots finishes")
+            return
         username = self.get_current_username()
         json_path = os.path.join(self.backup_dir, f"{username}_backup.json")
 
@@ -2839,10 +3783,8 @@ class MainWindow(QWidget):
                 return
 
             # === 1. Tạo container "Backup" nếu chưa có
-            headers = {"X-Auth-Token": self.token}
             backup_container = "Backup"
-            container_url = f"{self.storage_url}/{backup_container}"
-            response = requests.put(container_url, headers=headers)
+            response = self.swift.put(backup_container)
             if response.status_code not in [201, 202, 204]:  # 204 nếu đã tồn tại
                 raise Exception(f"Unable to create Backup container: HTTP {response.status_code}")
 
@@ -2850,52 +3792,346 @@ class MainWindow(QWidget):
             now = datetime.now()
             folder_name = f"NOW.{now.strftime('%d.%m.%Y.%H.%M.%S')}" if is_now else now.strftime('%d.%m.%Y.%H.%M.%S')
 
-            file_tasks = []
-            for folder_path in folders:
-                base_name = os.path.basename(folder_path)
-                for root, _, files in os.walk(folder_path):
-                    for file in files:
-                        full_path = os.path.join(root, file)
-                        rel_path = os.path.relpath(full_path, folder_path).replace("\\", "/")
-                        object_name = f"{folder_name}/{base_name}/{rel_path}"
-                        file_tasks.append((full_path, object_name))
-
-            if not file_tasks:
-                QMessageBox.information(self, "No data available", "The selected folders do not contain any files")
+            roots = [(folder_path, f"{folder_name}/{os.path.basename(folder_path)}") for folder_path in folders]
+            if config.get("format") == "chunked":
+                self.start_chunked_backup(username, folder_name, roots)
                 return
 
-            # === 3. Thực hiện upload (dùng lại UploadWorker)
-            self.completed_tasks = 0
-            self.total_tasks = len(file_tasks)
-            self.progress_bar.setValue(0)
+            # === 3. So với manifest của snapshot trước: chỉ upload file đã thay đổi,
+            # file không đổi được copy trên server từ object của snapshot trước
+            manifest = BackupManifest(os.path.join(self.backup_dir, f"{username}_manifest.json"))
+            states = {}
+
+            # === 4. Quét và upload theo pipeline (dùng lại UploadWorker)
+            # Journal giữ lại snapshot folder_name để lần sau backup tiếp vào đúng chỗ
+            name = f"{backup_container}/{folder_name}"
+            job_id = self.journal.start_job("upload", name)
+            job = self.create_transfer_job(
+                "upload", name, job_id, lane=BACKGROUND, error_title="Backup Error",
+                on_finished=lambda job: self.on_backup_job_finished(job, manifest, folder_name, states))
+
+            def make_units(records):
+                changed, unchanged, batch_states = manifest.plan(records)
+                states.update(batch_states)
+                sizes = {record.path: record.size for record in records}
+                units = self.upload_units([(filepath, backup_container, object_name)
+                                           for filepath, object_name in changed], sizes)
+                changed_bytes = sum(size for _, size, _ in units)
+                for filepath, object_name, source, remote_hash in unchanged:
+                    task = (filepath, backup_container, object_name)
+                    units.append((1, sizes[filepath],
+                                  self.upload_worker_factory(task, remote_hash=remote_hash, copy_from=source)))
+                tasks = [(record.path, backup_container, record.object_name) for record in records]
+                return tasks, units, changed_bytes
+
+            self.start_scan_pipeline(job, roots, make_units)
 
-            for idx, (filepath, object_name) in enumerate(file_tasks):
-                worker = UploadWorker(
-                    token=self.token,
-                    storage_url=self.storage_url,
-                    container=backup_container,
-                    filepath=filepath,
-                    object_name=object_name,
-                    index=idx,
-                    total=self.total_tasks
-                )
-                worker.signals.progress.connect(self.progress_bar.setValue)
-                worker.signals.done.connect(self.on_backup_task_done)
-                worker.signals.error.connect(lambda msg: QMessageBox.warning(self, "Backup Error", msg))
-                self.threadpool.start(worker)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Backup error: {str(e)}")
+    # Thông báo khi job backup xong
+    def on_backup_job_finished(self, job, manifest=None, snapshot=None, states=None):
+        self.on_transfer_job_finished(job)
+        if job.state != DONE:
+            return
+        if manifest is not None and not states and not job.errors:
+            QMessageBox.information(self, "No data available", "The selected folders do not contain any files")
+            return
+        def on_saved():
+            QMessageBox.information(self, "Backup successful", "Backup completed successfully.")
+            self.apply_retention_after_backup()
+
+        # Manifest local chỉ ghi khi snapshot đầy đủ, nếu không lần sau vẫn so với snapshot trước đó.
+        # Retention chạy sau khi manifest đã ghi xong.
+        if manifest is not None:
+            self.save_backup_manifest(manifest, snapshot, states, local=not job.errors, on_finished=on_saved)
+        else:
+            on_saved()
+
+    # Backup dạng chunked: file không đổi so với manifest local dùng lại danh sách chunk cũ,
+    # các file còn lại được chia chunk trong job; chunk trùng (giữa các file/snapshot) chỉ lưu một lần
+    def start_chunked_backup(self, username, folder_name, roots):
+        manifest = BackupManifest(os.path.join(self.backup_dir, f"{username}_manifest.json"))
+        store = ChunkStore(self.swift, self.transfer_settings)
+        entries = {}
+        job = self.create_transfer_job(
+            "upload", f"Backup/{folder_name}", lane=BACKGROUND, error_title="Backup Error",
+            on_finished=lambda job: self.on_chunked_backup_finished(job, store, manifest, folder_name, entries))
+
+        def make_units(records):
+            units = []
+            for record in records:
+                filepath, object_name = record.path, record.object_name
+                state = file_state(record)
+                old = manifest.unchanged(filepath, state)
+                if old and old.get("chunks"):
+                    entries[filepath] = dict(state, object=object_name, chunks=old["chunks"])
+                    continue
+
+                def make_chunk_worker(job, filepath=filepath, object_name=object_name, state=state):
+                    return ChunkBackupWorker(store, filepath, object_name, state, job, entries,
+                                             throttle=self.job_throttle(job, "upload"))
+                units.append((1, state["size"], make_chunk_worker))
+            return [], units, sum(size for _, size, _ in units)
 
+        self.start_scan_pipeline(job, roots, make_units)
+
+    # Ghi manifest snapshot lên server (file nào lỗi thì không có trong snapshot) và manifest local
+    def on_chunked_backup_finished(self, job, store, manifest, snapshot, entries):
+        store.close()
+        self.on_transfer_job_finished(job)
+        if job.state != DONE:
+            return
+        if not entries and not job.total_files and not job.errors:
+            QMessageBox.information(self, "No data available", "The selected folders do not contain any files")
+            return
+        files = {}
+        for entry in entries.values():
+            name = entry["object"][len(snapshot) + 1:]
+            files[name] = {"size": entry["size"], "mtime": entry["mtime"], "chunks": entry["chunks"]}
+        try:
+            save_snapshot_manifest(self.swift, snapshot, "chunked", files, chunk_container=CHUNK_CONTAINER)
+            manifest.save(snapshot, entries)
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Backup error: {str(e)}")
-    # Thanh progress sau khi backup xong
-    def on_backup_task_done(self):
-        self.completed_tasks += 1
-        percent = int((self.completed_tasks / self.total_tasks) * 100)
-        self.progress_bar.setValue(percent)
+            return
+        QMessageBox.information(self, "Backup successful", "Backup completed successfully.")
+        self.apply_retention_after_backup()
+
+    # Mở cửa sổ xem snapshot (tạo lại mỗi lần để dùng đúng tài khoản đang đăng nhập)
+    def show_snapshot_browser(self):
+        self.snapshot_browser = SnapshotBrowser(self.swift, on_restore=self.restore_snapshot, parent=self)
+        self.snapshot_browser.show()
+
+    # Khôi phục snapshot (hoặc một thư mục/file trong đó) vào target_dir. Manifest được đọc theo stream
+    # ngay trong các slot của job (add_source), nên bộ nhớ không tăng theo số file của snapshot.
+    def restore_snapshot(self, snapshot, subtree, target_dir):
+        try:
+            entries = iter_snapshot_manifest(self.swift, snapshot)
+            header = next(entries)
+        except Exception as e:
+            QMessageBox.critical(self, "Restore error", str(e))
+            return
+        # Phần được chọn được đặt trực tiếp trong target_dir (giữ tên thư mục/file được chọn)
+        base = subtree.rstrip("/").rpartition("/")[0]
+        base = f"{base}/" if base else ""
+        job = self.create_transfer_job("download", f"Restore {snapshot}/{subtree}".rstrip("/"),
+                                       error_title="Restore error", on_finished=self.on_restore_finished)
+
+        def units():
+            matched = False
+            for entry in entries:
+                path = entry["path"]
+                if subtree and path != subtree and not (subtree.endswith("/") and path.startswith(subtree)):
+                    if matched:
+                        break  # Manifest sắp theo đường dẫn: đã qua hết phần được chọn
+                    continue
+                matched = True
+                parts = path[len(base):].split("/")
+                if any(part in ("", ".", "..") for part in parts):
+                    job.add_error(f"Skipped invalid path in snapshot: {path}")
+                    continue
+                save_path = os.path.join(target_dir, *parts)
+
+                def make_restore_worker(job, entry=entry, save_path=save_path):
+                    return RestoreWorker(self.swift, snapshot, header, entry, save_path, job,
+                                         settings=self.transfer_settings,
+                                         throttle=self.job_throttle(job, "download"))
+                yield 1, entry["size"], make_restore_worker
+
+        job.add_source(units())
+        self.submit_transfer_job(job)
+
+    def on_restore_finished(self, job):
+        self.on_transfer_job_finished(job)
+        if job.state == DONE and not job.errors:
+            QMessageBox.information(self, "Restore", f"Restored {job.completed_files} file(s).")
+
+    def read_backup_config(self):
+        json_path = os.path.join(self.backup_dir, f"{self.get_current_username()}_backup.json")
+        if not os.path.exists(json_path):
+            return {}
+        with open(json_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def write_backup_config(self, config):
+        json_path = os.path.join(self.backup_dir, f"{self.get_current_username()}_backup.json")
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(config, f, indent=2)
+
+    # Quy tắc giữ snapshot (keep last / daily / weekly / monthly), xem trước dung lượng giải phóng
+    # (dry run) hoặc xóa ngay các snapshot hết hạn
+    def show_retention_dialog(self):
+        config = self.read_backup_config()
+        policy = dict(DEFAULT_RETENTION, **config.get("retention", {}))
+
+        dialog = QDialog(self)
+        dialog.setWindowTitle("Retention policy")
+        layout = QVBoxLayout(dialog)
+        layout.addWidget(QLabel("Number of snapshots to keep for each rule (0 = rule not used).\n"
+                                "Snapshots not kept by any rule are deleted after each backup."))
+        form = QFormLayout()
+        spins = {}
+        for key, label in [("keep_last", "Last snapshots"), ("keep_daily", "Daily"),
+                           ("keep_weekly", "Weekly"), ("keep_monthly", "Monthly")]:
+            spin = QSpinBox()
+            spin.setRange(0, 1000)
+            spin.setValue(int(policy.get(key, 0)))
+            spins[key] = spin
+            form.addRow(label, spin)
+        layout.addLayout(form)
+
+        buttons = QHBoxLayout()
+        preview_btn = QPushButton("Preview")
+        prune_btn = QPushButton("Prune now")
+        buttons.addWidget(preview_btn)
+        buttons.addWidget(prune_btn)
+        buttons.addStretch()
+        layout.addLayout(buttons)
+        btn_box = QDialogButtonBox(QDialogButtonBox.Save | QDialogButtonBox.Cancel)
+        layout.addWidget(btn_box)
+
+        def current_policy():
+            return {key: spin.value() for key, spin in spins.items()}
+
+        def on_prune():
+            if not retention_enabled(current_policy()):
+                QMessageBox.information(dialog, "Retention policy", "Set at least one rule first")
+                return
+            confirm = QMessageBox.question(dialog, "Prune snapshots",
+                                           "Delete all snapshots not kept by these rules?",
+                                           QMessageBox.Yes | QMessageBox.No)
+            if confirm == QMessageBox.Yes:
+                self.run_retention(current_policy(), dry_run=False)
+
+        def on_save():
+            config = self.read_backup_config()
+            config["retention"] = current_policy()
+            self.write_backup_config(config)
+            self.update_backup_status_label()
+            dialog.accept()
+
+        preview_btn.clicked.connect(lambda: self.run_retention(current_policy(), dry_run=True))
+        prune_btn.clicked.connect(on_prune)
+        btn_box.accepted.connect(on_save)
+        btn_box.rejected.connect(dialog.reject)
+        dialog.exec_()
+
+    # Snapshot mà manifest local đang dựa vào (copy / dùng lại chunk ở lần backup sau) không được xóa
+    def retention_protected_snapshots(self):
+        manifest = BackupManifest(os.path.join(self.backup_dir, f"{self.get_current_username()}_manifest.json"))
+        return [manifest.snapshot] if manifest.snapshot else []
+
+    def backup_running(self):
+        return any(job.name.startswith(f"{SNAPSHOT_CONTAINER}/") for job in self.jobs.active_jobs())
+
+    # Tính (dry_run) hoặc thực hiện xóa snapshot hết hạn trong luồng nền; quiet=True chỉ báo khi có lỗi
+    # on_done(plan) thay cho việc tự làm mới dung lượng khi xong; plan là None nếu không chạy được
+    def run_retention(self, policy, dry_run=True, quiet=False, on_done=None):
+        if not dry_run and (self.backup_running() or self.prune_running):
+            # Backup đang chạy có thể dựa vào chunk/object sắp bị xóa
+            if not quiet:
+                QMessageBox.information(self, "Retention policy",
+                                        "Please wait until the running backup or cleanup finishes")
+            if on_done:
+                on_done(None)
+            return
+        if not dry_run:
+            self.prune_running = True
+
+        def on_finished(plan):
+            if not dry_run:
+                self.prune_running = False
+            if on_done:
+                if not quiet or plan.get("report", {}).get("errors"):
+                    QMessageBox.information(self, "Retention policy", self.format_prune_report(plan, dry_run))
+                on_done(plan)
+                return
+            if quiet and not plan.get("report", {}).get("errors"):
+                if plan.get("report"):
+                    self.calculate_total_used_bytes()
+                return
+            QMessageBox.information(self, "Retention policy", self.format_prune_report(plan, dry_run))
+            if plan.get("report"):
+                self.calculate_total_used_bytes()
+
+        def on_error(msg):
+            if not dry_run:
+                self.prune_running = False
+            QMessageBox.warning(self, "Retention policy", f"Cannot apply retention policy: {msg}")
+            if on_done:
+                on_done(None)
+
+        worker = PruneWorker(self.swift, policy, self.retention_protected_snapshots(), dry_run=dry_run)
+        self.track_account_worker(worker)
+        worker.signals.finished.connect(on_finished)
+        worker.signals.error.connect(on_error)
+        self.threadpool.start(worker)
+
+    @staticmethod
+    def format_prune_report(plan, dry_run):
+        expired = plan["expired"]
+        if not expired:
+            return f"Nothing to delete. All {len(plan['kept'])} snapshot(s) are kept by the current rules."
+        names = "\n".join(f"  - {s['name']}" for s in expired[:MAX_ERROR_LINES])
+        if len(expired) > MAX_ERROR_LINES:
+            names += f"\n  ... and {len(expired) - MAX_ERROR_LINES} more"
+        details = (f"{plan['objects']} object(s), {len(plan['segments'])} segment(s), "
+                   f"{len(plan['chunks'])} chunk(s)")
+        if dry_run:
+            return (f"{len(expired)} snapshot(s) would be deleted, {len(plan['kept'])} kept:\n{names}\n\n"
+                    f"{details}\nSpace reclaimed: {format_bytes(plan['bytes'])}")
+        report = plan["report"]
+        message = (f"Deleted {report['snapshots']} snapshot(s):\n{names}\n\n{details}\n"
+                   f"Space reclaimed: about {format_bytes(plan['bytes'])}")
+        if report["errors"]:
+            message += f"\n\n{len(report['errors'])} item(s) could not be deleted and will be retried next time."
+        return message
+
+    # Sau mỗi lần backup thành công: xóa snapshot hết hạn theo policy đã lưu
+    def apply_retention_after_backup(self):
+        policy = self.read_backup_config().get("retention")
+        if retention_enabled(policy):
+            self.run_retention(policy, dry_run=False, quiet=True)
+
+    # Chọn định dạng backup: file thường (mỗi file một object) hoặc chunk khử trùng lặp
+    def choose_backup_format(self):
+        username = self.get_current_username()
+        json_path = os.path.join(self.backup_dir, f"{username}_backup.json")
+        config = {}
+        if os.path.exists(json_path):
+            with open(json_path, "r", encoding="utf-8") as f:
+                config = json.load(f)
+
+        reply = QMessageBox.question(
+            self,
+            "Backup format",
+            "Use the deduplicated format?\n\n"
+            "Files are split into chunks and only new chunks are uploaded, so large files with small "
+            "changes and duplicate files are stored once. Snapshots can then only be restored from this app.",
+            QMessageBox.Yes | QMessageBox.No
+        )
+        config["format"] = "chunked" if reply == QMessageBox.Yes else "files"
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(config, f, indent=2)
+        self.update_backup_status_label()
+
+    # Ghi manifest của snapshot vừa xong lên server và (nếu local=True) manifest local.
+    # Hash lấy từ listing của snapshot (một lần), file không có trong listing sẽ được upload lại ở lần sau
+    # Listing cả snapshot để lấy hash có thể lâu nên chạy trong BackupManifestWorker
+    def save_backup_manifest(self, manifest, snapshot, states, local=True, on_finished=None):
+        worker = BackupManifestWorker(self.swift, manifest, snapshot, states, local)
+        self.track_account_worker(worker)
+
+        def on_error(message):
+            logger.warning("Cannot save backup manifest: %s", message)
+            if on_finished:
+                on_finished()
+
+        if on_finished:
+            worker.signals.finished.connect(on_finished)
+        worker.signals.error.connect(on_error)
+        self.threadpool.start(worker)
 
-        if self.completed_tasks == self.total_tasks:
-            QMessageBox.information(self, "Backup successful", "Backup completed successfully.")
-            self.progress_bar.setValue(100)
-            QTimer.singleShot(1500, lambda: self.progress_bar.setValue(0))
     # Chọn thư mục backup
     def choose_backup_folders(self):
         folders = []
@@ -2963,6 +4199,9 @@ class MainWindow(QWidget):
             self.do_backup(is_now=True)
     # Thực hiện backup đúng lịch hẹn đã lên trước đó.
     def perform_scheduled_backup(self):
+        if self.prune_running:
+            QTimer.singleShot(PRUNE_WAIT_MS, self.perform_scheduled_backup)  # Thử lại khi xóa snapshot cũ xong
+            return
         QMessageBox.information(self, "Backup", "Performing automatic backup")
         self.do_backup(is_now=False)
 
@@ -3151,6 +4390,18 @@ class MainWindow(QWidget):
             else:
                 message_lines.append("❌ No backup folder selected")
 
+            if config.get("format") == "chunked":
+                message_lines.append("🧩 Format: deduplicated chunks")
+            else:
+                message_lines.append("📄 Format: regular files")
+
+            policy = config.get("retention")
+            if retention_enabled(policy):
+                rules = [f"{policy[key]} {label}" for key, label in
+                         [("keep_last", "last"), ("keep_daily", "daily"), ("keep_weekly", "weekly"),
+                          ("keep_monthly", "monthly")] if policy.get(key)]
+                message_lines.append(f"♻️ Keep: {', '.join(rules)}")
+
             # Countdown (nếu có)
             if self.next_backup_time:
                 delta = self.next_backup_time - datetime.now()
@@ -3181,6 +4432,7 @@ class MainWindow(QWidget):
         try:
             with open("dicomurl.json", "w") as f:
                 json.dump({"url": new_url}, f, indent=2)
+            self.orthanc.set_base_url(new_url)
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Cannot save DICOM URL:\n{str(e)}")
 
@@ -3202,12 +4454,9 @@ class MainWindow(QWidget):
             return
 
         study_id = self.study_list.item(row, 4).text()
-        dicom_url = self.get_dicom_url()
 
         try:
-            response = requests.get(f"{dicom_url}/studies/{study_id}")
-            response.raise_for_status()
-            data = response.json()
+            data = self.orthanc.get_json(f"/studies/{study_id}")
 
             dialog = QDialog(self)
             dialog.setWindowTitle("Study Metadata Details")
@@ -3240,14 +4489,12 @@ class MainWindow(QWidget):
 
                 def fetch_series_info(series_id):
                     try:
-                        resp = requests.get(f"{dicom_url}/series/{series_id}")
-                        resp.raise_for_status()
-                        instance_count = len(resp.json().get("Instances", []))
+                        instance_count = len(self.orthanc.get_json(f"/series/{series_id}").get("Instances", []))
                         return (series_id, instance_count)
                     except:
                         return (series_id, "?")
 
-                with ThreadPoolExecutor(max_workers=4) as executor:
+                with ThreadPoolExecutor(max_workers=self.orthanc.limiter.maximum) as executor:
                     results = list(executor.map(fetch_series_info, series))
 
                 for idx, (series_id, instance_count) in enumerate(results):
@@ -3273,9 +4520,7 @@ class MainWindow(QWidget):
         self.loaded_offset = 0
 
         try:
-            r = requests.get(f"{self.get_dicom_url()}/studies")
-            r.raise_for_status()
-            self.study_ids = sorted(r.json(), reverse=True)  # hoặc sort theo nhu cầu
+            self.study_ids = sorted(self.orthanc.get_json("/studies"), reverse=True)  # hoặc sort theo nhu cầu
             self.load_more_studies()  # Tải 10 study đầu tiên
 
         except Exception as e:
@@ -3302,7 +4547,6 @@ class MainWindow(QWidget):
         self.dicom_progress_bar.setValue(0)
         QApplication.processEvents()
 
-        dicom_url = self.get_dicom_url()
         row = self.study_list.currentRow()
         if row < 0:
             QMessageBox.warning(self, "No Selection", "Please select a study to upload.")
@@ -3311,9 +4555,7 @@ class MainWindow(QWidget):
         study_id = self.study_list.item(row, 4).text()
 
         try:
-            study_info = requests.get(f"{dicom_url}/studies/{study_id}")
-            study_info.raise_for_status()
-            study_info = study_info.json()
+            study_info = self.orthanc.get_json(f"/studies/{study_id}")
 
             patient_name = study_info.get("PatientMainDicomTags", {}).get("PatientName", "Unknown")
             study_date = study_info.get("MainDicomTags", {}).get("StudyDate", "Unknown")
@@ -3327,7 +4569,7 @@ class MainWindow(QWidget):
             series_ids = study_info.get("Series", [])
             instance_ids = []
             for series_id in series_ids:
-                series_info = requests.get(f"{dicom_url}/series/{series_id}").json()
+                series_info = self.orthanc.get_json(f"/series/{series_id}")
                 instance_ids += series_info.get("Instances", [])
 
             if not instance_ids:
@@ -3336,7 +4578,8 @@ class MainWindow(QWidget):
 
             # Tạo thư mục tạm & worker tải DICOM
             temp_dir = os.path.join(os.getcwd(), "temp_dicom")
-            worker = DownloadDicomWorker(dicom_url, instance_ids, temp_dir)
+            worker = DownloadDicomWorker(self.orthanc, instance_ids, temp_dir,
+                                         throttle=self.transfer_meter("download", BACKGROUND))
 
             def on_download_done(filepaths):
                 self.start_upload_dicom(filepaths, folder_name, temp_dir)
@@ -3352,25 +4595,18 @@ class MainWindow(QWidget):
 
     def start_upload_dicom(self, filepaths, folder_name, temp_dir):
         container = "DICOM"
-        container_url = f"{self.storage_url}/{container}"
-        headers = {"X-Auth-Token": self.token}
-        create_resp = requests.put(container_url, headers=headers)
+        create_resp = self.swift.put(container)
         if not create_resp.ok:
             QMessageBox.critical(self, "Error", f"Failed to create/access container '{container}'")
             return
 
-        self.completed_tasks = 0
-        self.total_tasks = len(filepaths)
-
-        def on_upload_step_done():
-            self.completed_tasks += 1
-            percent = int(50 + (self.completed_tasks / self.total_tasks) * 50)
+        def on_upload_step_done(job):
+            percent = int(50 + (job.completed_files / max(job.total_files, 1)) * 50)
             self.dicom_progress_bar.setValue(percent)
-            if self.completed_tasks == self.total_tasks:
-                self.dicom_progress_bar.setValue(100)
-                QTimer.singleShot(2000, lambda: self.dicom_progress_bar.setVisible(False))
 
-        def on_all_done():
+        def on_all_done(job):
+            self.dicom_progress_bar.setValue(100)
+            QTimer.singleShot(2000, lambda: self.dicom_progress_bar.setVisible(False))
             try:
                 for f in os.listdir(temp_dir):
                     fp = os.path.join(temp_dir, f)
@@ -3379,22 +4615,13 @@ class MainWindow(QWidget):
             except Exception as cleanup_err:
                 print("Cleanup error:", cleanup_err)
 
-        for idx, filepath in enumerate(filepaths):
-            object_name = f"{folder_name}/{os.path.basename(filepath)}"
-            worker = UploadWorker(
-                token=self.token,
-                storage_url=self.storage_url,
-                container=container,
-                filepath=filepath,
-                object_name=object_name,
-                index=idx,
-                total=self.total_tasks
-            )
-            worker.signals.error.connect(lambda msg: QMessageBox.warning(self, "Upload Error", msg))
-            worker.signals.done.connect(on_upload_step_done)
-            if idx == len(filepaths) - 1:
-                worker.signals.done.connect(on_all_done)
-            self.threadpool.start(worker)
+        # File tạm sẽ bị xóa khi xong nên job DICOM không ghi journal
+        job = self.create_transfer_job("upload", f"{container}/{folder_name}", lane=BACKGROUND,
+                                       on_finished=on_all_done, on_progress=on_upload_step_done,
+                                       error_title="Upload Error")
+        tasks = [(filepath, container, f"{folder_name}/{os.path.basename(filepath)}") for filepath in filepaths]
+        self.add_upload_tasks(job, tasks)
+        self.submit_transfer_job(job)
 
     def load_more_studies(self):
         if self.loaded_offset >= len(self.study_ids):
@@ -3402,7 +4629,7 @@ class MainWindow(QWidget):
             return
 
         worker = StudyListWorker(
-            dicom_url=self.get_dicom_url(),
+            client=self.orthanc,
             study_ids=self.study_ids,
             offset=self.loaded_offset,
             limit=10
@@ -3421,6 +4648,8 @@ class MainWindow(QWidget):
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # Process pool băm chunk khi chạy dạng exe
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s [%(name)s] %(message)s")
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
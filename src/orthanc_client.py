@@ -0,0 +1,40 @@
+import requests
+from requests.adapters import HTTPAdapter
+
+from concurrency import AdaptiveLimiter
+from retry import RetryPolicy
+
+
+# Client dùng chung cho REST API của Orthanc: một session keep-alive và limiter riêng,
+# tách biệt với limiter của Swift vì hai server chịu tải khác nhau. Lỗi tạm thời được gửi lại theo retry_policy.
+class OrthancClient:
+    def __init__(self, base_url, max_concurrency=8, retry_policy=None):
+        self.base_url = (base_url or "").rstrip("/")
+        self.limiter = AdaptiveLimiter("Orthanc", initial=2, maximum=max_concurrency)
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def set_base_url(self, base_url):
+        self.base_url = (base_url or "").rstrip("/")
+
+    # path dạng "/studies/<id>"
+    def get(self, path, **kwargs):
+        return self.retry_policy.call("GET", lambda: self._send(path, **kwargs), label=path)
+
+    def _send(self, path, **kwargs):
+        with self.limiter.slot() as slot:
+            response = self.session.get(self.base_url + path, **kwargs)
+            slot["status"] = response.status_code
+            slot["bytes"] = int(response.headers.get("Content-Length") or 0)
+        return response
+
+    def get_json(self, path):
+        response = self.get(path)
+        response.raise_for_status()
+        return response.json()
+
+    def close(self):
+        self.session.close()
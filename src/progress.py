@@ -0,0 +1,101 @@
+import threading
+import time
+from collections import deque
+
+# UI đọc tiến độ của các job theo chu kỳ cố định (ms), không nhận signal theo từng file
+FRAME_INTERVAL_MS = 100
+# Tốc độ tính trên các mẫu trong khoảng này (giây)
+RATE_WINDOW = 5.0
+
+
+# Bộ đếm cộng dồn từ nhiều luồng không cần lock: mỗi luồng ghi vào ô riêng của nó,
+# luồng UI cộng các ô lại khi đọc. Chỉ lấy lock một lần khi một luồng ghi lần đầu.
+class Counter:
+    def __init__(self):
+        self._local = threading.local()
+        self._cells = []
+        self._cells_lock = threading.Lock()
+
+    def add(self, count=1):
+        cell = getattr(self._local, "cell", None)
+        if cell is None:
+            cell = self._local.cell = [0]
+            with self._cells_lock:
+                self._cells.append(cell)
+        cell[0] += count
+
+    @property
+    def value(self):
+        return sum(cell[0] for cell in list(self._cells))
+
+
+# Tốc độ (đơn vị/giây) từ các mẫu (thời điểm, giá trị tích lũy) lấy ở mỗi lần UI đọc
+class RateMeter:
+    def __init__(self, window=RATE_WINDOW):
+        self.window = window
+        self.samples = []
+
+    def sample(self, value, now=None):
+        now = time.monotonic() if now is None else now
+        self.samples.append((now, value))
+        while len(self.samples) > 2 and now - self.samples[0][0] > self.window:
+            self.samples.pop(0)
+        return self.rate
+
+    @property
+    def rate(self):
+        if len(self.samples) < 2:
+            return 0.0
+        (t0, v0), (t1, v1) = self.samples[0], self.samples[-1]
+        return (v1 - v0) / (t1 - t0) if t1 > t0 else 0.0
+
+    def reset(self):
+        self.samples = []
+
+
+# Thời gian còn lại (giây) hoặc None nếu chưa ước lượng được
+def estimate_eta(done, total, rate):
+    if rate <= 0 or total <= 0 or done >= total:
+        return None
+    return (total - done) / rate
+
+
+def format_eta(seconds):
+    if seconds is None:
+        return "--:--"
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes:02d}:{seconds:02d}"
+
+
+# Bọc vòng lặp iter_content / generator body: gọi on_bytes(n) cho mỗi chunk đi qua
+def iter_counted(chunks, on_bytes=None):
+    for chunk in chunks:
+        if chunk and on_bytes:
+            on_bytes(len(chunk))
+        yield chunk
+
+
+# Tốc độ upload/download của toàn app: worker cộng byte vào Counter theo chiều truyền,
+# UI gọi sample() mỗi giây để lưu lịch sử tốc độ (vẽ sparkline trên Dashboard)
+class ThroughputMonitor:
+    def __init__(self, history=120):
+        self.counters = {"upload": Counter(), "download": Counter()}
+        self.meters = {"upload": RateMeter(), "download": RateMeter()}
+        self.history = {"upload": deque(maxlen=history), "download": deque(maxlen=history)}
+
+    # Hàm on_bytes(n) cho một chiều truyền
+    def meter(self, direction):
+        return self.counters[direction].add
+
+    def sample(self, now=None):
+        now = time.monotonic() if now is None else now
+        for direction, counter in self.counters.items():
+            rate = self.meters[direction].sample(counter.value, now)
+            self.history[direction].append(rate)
+
+    def rate(self, direction):
+        return self.meters[direction].rate
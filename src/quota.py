@@ -0,0 +1,34 @@
+import threading
+
+
+# Giữ chỗ quota cho các pipeline quét -> upload đang chạy: mỗi batch file phải reserve() được
+# trước khi upload, không đủ chỗ thì pipeline dừng. Dung lượng đã dùng được chụp lại khi pipeline
+# đầu tiên mở; phần các pipeline đã giữ (kể cả pipeline đã xong) được cộng dồn tới khi không còn
+# pipeline nào, vì used_bytes làm mới định kỳ cũng đã tính phần vừa upload.
+class QuotaReservation:
+    def __init__(self, quota, used):
+        self.quota = quota  # Hàm trả về tổng quota (byte)
+        self.used = used    # Hàm trả về dung lượng đã dùng trên server (byte)
+        self._lock = threading.Lock()
+        self._open = 0
+        self._base = 0
+        self._reserved = 0
+
+    def open(self):
+        with self._lock:
+            if not self._open:
+                self._base = self.used()
+                self._reserved = 0
+            self._open += 1
+
+    def close(self):
+        with self._lock:
+            self._open = max(self._open - 1, 0)
+
+    # Gọi từ luồng của job: True nếu giữ được size byte
+    def reserve(self, size):
+        with self._lock:
+            if self._base + self._reserved + size > self.quota():
+                return False
+            self._reserved += size
+            return True
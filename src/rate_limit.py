@@ -0,0 +1,108 @@
+import threading
+import time
+from contextlib import contextmanager
+
+FOREGROUND = "foreground"
+BACKGROUND = "background"
+
+# Truyền tải foreground trong khoảng này (giây) vẫn được xem là đang hoạt động
+FOREGROUND_GRACE = 1.0
+
+
+# Token bucket theo byte/giây, rate=0 là không giới hạn. Đổi rate được khi đang chạy:
+# luồng đang chờ sẽ tính lại sau tối đa 0.1s.
+class TokenBucket:
+    def __init__(self, rate=0):
+        self.rate = rate
+        self.tokens = 0.0
+        self.last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def set_rate(self, rate):
+        with self._lock:
+            self._refill()
+            self.rate = rate
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.rate > 0:
+            # Cho phép dồn tối đa 1 giây để không bùng nổ sau khi rảnh lâu
+            self.tokens = min(self.rate, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+
+    def consume(self, count):
+        with self._lock:
+            self._refill()
+            if self.rate <= 0:
+                return
+            self.tokens -= count  # Có thể âm: các luồng sau sẽ chờ trả nợ
+        while True:
+            with self._lock:
+                self._refill()
+                if self.rate <= 0 or self.tokens >= 0:
+                    return
+                wait = -self.tokens / self.rate
+            time.sleep(min(wait, 0.1))
+
+
+# Giới hạn băng thông dùng chung cho mọi worker: cap riêng cho upload và download.
+# Lane background (backup, DICOM) còn bị giới hạn thêm ở background_yield khi đang có
+# truyền tải foreground (thao tác của người dùng), để nhường đường cho foreground.
+class BandwidthLimiter:
+    def __init__(self, upload_rate=0, download_rate=0, background_yield=512 * 1024):
+        self.buckets = {"upload": TokenBucket(upload_rate), "download": TokenBucket(download_rate)}
+        self.background_buckets = {"upload": TokenBucket(background_yield),
+                                   "download": TokenBucket(background_yield)}
+        self._lock = threading.Lock()
+        self._foreground_users = 0
+        self._last_foreground = 0.0
+
+    # Đổi giới hạn (byte/giây, 0 = không giới hạn), áp dụng ngay cho các job đang chạy
+    def set_limits(self, upload_rate, download_rate, background_yield=None):
+        self.buckets["upload"].set_rate(upload_rate)
+        self.buckets["download"].set_rate(download_rate)
+        if background_yield is not None:
+            for bucket in self.background_buckets.values():
+                bucket.set_rate(background_yield)
+
+    def foreground_active(self):
+        with self._lock:
+            return self._foreground_users > 0 or time.monotonic() - self._last_foreground < FOREGROUND_GRACE
+
+    def consume(self, direction, count, lane=FOREGROUND):
+        if lane == BACKGROUND:
+            if self.foreground_active():
+                self.background_buckets[direction].consume(count)
+        else:
+            with self._lock:
+                self._last_foreground = time.monotonic()
+        self.buckets[direction].consume(count)
+
+    # Hàm throttle(n) cho worker: gọi sau mỗi n byte đọc/ghi
+    def throttle(self, direction, lane=FOREGROUND):
+        return lambda count: self.consume(direction, count, lane)
+
+    # Đánh dấu thao tác tương tác (mở file, xem ảnh...) để các job background nhường băng thông
+    @contextmanager
+    def interactive(self):
+        with self._lock:
+            self._foreground_users += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._foreground_users -= 1
+                self._last_foreground = time.monotonic()
+
+
+def chain_callbacks(*callbacks):
+    callbacks = [c for c in callbacks if c]
+    if not callbacks:
+        return None
+    if len(callbacks) == 1:
+        return callbacks[0]
+
+    def call(*args):
+        for callback in callbacks:
+            callback(*args)
+    return call
@@ -0,0 +1,165 @@
+from datetime import datetime
+
+from chunk_store import CHUNK_CONTAINER
+from large_object import SEGMENT_CONTAINER_SUFFIX, get_slo_manifest
+from snapshots import SNAPSHOT_CONTAINER, load_snapshot_index, modify_snapshot_index, iter_snapshot_manifest
+from swift_client import bulk_path
+
+# Số snapshot giữ lại theo từng quy tắc, 0 = không dùng quy tắc đó. Mọi quy tắc bằng 0 thì giữ tất cả.
+DEFAULT_RETENTION = {"keep_last": 0, "keep_daily": 0, "keep_weekly": 0, "keep_monthly": 0}
+
+# Tên snapshot do do_backup tạo: "NOW.<thời điểm>" (backup ngay) hoặc "<thời điểm>" (theo lịch)
+SNAPSHOT_NAME_FORMAT = "%d.%m.%Y.%H.%M.%S"
+
+
+def retention_enabled(policy):
+    return any((policy or {}).get(key) for key in DEFAULT_RETENTION)
+
+
+def snapshot_time(snapshot):
+    if snapshot.get("created"):
+        return datetime.fromtimestamp(snapshot["created"])
+    name = snapshot["name"]
+    if name.startswith("NOW."):
+        name = name[len("NOW."):]
+    try:
+        return datetime.strptime(name, SNAPSHOT_NAME_FORMAT)
+    except ValueError:
+        return None
+
+
+# Chia snapshot thành (giữ, hết hạn) theo policy: giữ keep_last snapshot mới nhất, và snapshot mới nhất
+# của mỗi ngày/tuần/tháng trong keep_daily/keep_weekly/keep_monthly ngày/tuần/tháng gần nhất có backup.
+# Luôn giữ snapshot mới nhất, các snapshot trong protected (vd. snapshot mà manifest local đang dựa vào)
+# và snapshot không đọc được thời điểm.
+def apply_retention(snapshots, policy, protected=()):
+    if not retention_enabled(policy):
+        return list(snapshots), []
+    dated = sorted(((snapshot_time(s), s) for s in snapshots if snapshot_time(s)),
+                   key=lambda item: item[0], reverse=True)
+    keep = set(protected)
+    if dated:
+        keep.add(dated[0][1]["name"])
+    for _, snapshot in dated[:policy.get("keep_last", 0)]:
+        keep.add(snapshot["name"])
+
+    periods = [
+        ("keep_daily", lambda t: t.date()),
+        ("keep_weekly", lambda t: tuple(t.isocalendar())[:2]),
+        ("keep_monthly", lambda t: (t.year, t.month)),
+    ]
+    for key, period_of in periods:
+        seen = set()
+        for when, snapshot in dated:
+            if len(seen) >= policy.get(key, 0):
+                break
+            period = period_of(when)
+            if period not in seen:
+                seen.add(period)
+                keep.add(snapshot["name"])
+
+    expired_names = {s["name"] for _, s in dated if s["name"] not in keep}
+    kept = [s for s in snapshots if s["name"] not in expired_names]
+    expired = [s for s in snapshots if s["name"] in expired_names]
+    return kept, expired
+
+
+# Tính trước những gì sẽ bị xóa (dùng cho dry run và cho prune_snapshots):
+#   - mọi object dưới prefix của snapshot hết hạn,
+#   - segment SLO dưới prefix của snapshot hết hạn mà không snapshot còn giữ nào tham chiếu
+#     (snapshot sau copy manifest SLO nên dùng chung segment với snapshot trước),
+#   - chunk chỉ được các snapshot chunked hết hạn dùng.
+# "bytes" là dung lượng thực sự được giải phóng (manifest SLO không tính kích thước logical).
+def plan_prune(client, policy, protected=(), container=SNAPSHOT_CONTAINER):
+    snapshots = load_snapshot_index(client, container)
+    kept, expired = apply_retention(snapshots, policy, protected)
+    plan = {"container": container, "kept": kept, "expired": expired, "objects": 0,
+            "segments": [], "chunks": [], "bytes": 0}
+    if not expired:
+        return plan
+
+    for snapshot in expired:
+        for obj in client.iter_listing(container, prefix=f"{snapshot['name']}/"):
+            plan["objects"] += 1
+            if "slo_etag" not in obj:
+                plan["bytes"] += obj.get("bytes", 0)
+
+    # Segment: nhóm theo object gốc (<snapshot>/<path>/slo/...), chỉ hỏi manifest SLO của
+    # snapshot còn giữ nào có cùng đường dẫn (bản copy của object đó)
+    segment_container = container + SEGMENT_CONTAINER_SUFFIX
+    groups = {}
+    for snapshot in expired:
+        prefix = f"{snapshot['name']}/"
+        try:
+            for obj in client.iter_listing(segment_container, prefix=prefix):
+                path = obj["name"][len(prefix):].partition("/slo/")[0]
+                groups.setdefault(path, []).append(obj)
+        except Exception:
+            continue  # Chưa có container segment
+    if groups:
+        referenced = set()
+        for snapshot in kept:
+            if snapshot.get("format") == "chunked":
+                continue
+            entries = iter_snapshot_manifest(client, snapshot["name"], container)
+            next(entries)
+            for entry in entries:
+                if entry["path"] in groups:
+                    manifest = get_slo_manifest(client, container, f"{snapshot['name']}/{entry['path']}") or []
+                    referenced.update(s.get("path") or s.get("name") for s in manifest)
+        for objects in groups.values():
+            for obj in objects:
+                if f"/{segment_container}/{obj['name']}" not in referenced:
+                    plan["segments"].append(obj["name"])
+                    plan["bytes"] += obj.get("bytes", 0)
+
+    # Chunk: khử trùng lặp giữa các snapshot nên chỉ xóa chunk không còn snapshot nào giữ lại dùng
+    if any(s.get("format") == "chunked" for s in expired):
+        chunk_container = CHUNK_CONTAINER
+        referenced = set()
+        for snapshot in kept:
+            if snapshot.get("format") == "chunked":
+                entries = iter_snapshot_manifest(client, snapshot["name"], container)
+                chunk_container = next(entries).get("chunk_container", chunk_container)
+                for entry in entries:
+                    referenced.update(digest for digest, _ in entry["chunks"])
+        orphans = {}
+        for snapshot in expired:
+            if snapshot.get("format") == "chunked":
+                entries = iter_snapshot_manifest(client, snapshot["name"], container)
+                chunk_container = next(entries).get("chunk_container", chunk_container)
+                for entry in entries:
+                    for digest, length in entry["chunks"]:
+                        if digest not in referenced:
+                            orphans[digest] = length
+        plan["chunk_container"] = chunk_container
+        plan["chunks"] = sorted(orphans)
+        plan["bytes"] += sum(orphans.values())
+    return plan
+
+
+# Xóa theo plan bằng bulk delete rồi cập nhật index. Snapshot còn object xóa lỗi vẫn nằm trong index
+# để lần prune sau xóa tiếp.
+def prune_snapshots(client, plan, progress_callback=None):
+    container = plan["container"]
+    segment_container = container + SEGMENT_CONTAINER_SUFFIX
+
+    def items():
+        for snapshot in plan["expired"]:
+            for obj in client.iter_listing(container, prefix=f"{snapshot['name']}/"):
+                yield container, obj["name"]
+        for name in plan["segments"]:
+            yield segment_container, name
+        for digest in plan["chunks"]:
+            yield plan["chunk_container"], digest
+
+    report = client.bulk_delete(items(), progress_callback=progress_callback)
+    failed = [path for path, _ in report["errors"]]
+    remaining = [s for s in plan["expired"]
+                 if any(path.startswith(bulk_path(container, f"{s['name']}/")) for path in failed)]
+    removed = {s["name"] for s in plan["expired"]} - {s["name"] for s in remaining}
+
+    # Đọc lại index ngay trước khi ghi (trong lock) để không làm mất snapshot vừa được thêm trong lúc xóa
+    modify_snapshot_index(client, lambda snapshots: [s for s in snapshots if s["name"] not in removed], container)
+    report["snapshots"] = len(removed)
+    return report
@@ -0,0 +1,93 @@
+import logging
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Mã trả về tạm thời: proxy bận, quá tải hoặc lỗi gateway
+RETRY_STATUSES = (408, 429, 500, 502, 503, 504)
+# Chỉ gửi lại các method idempotent: gửi lại PUT cùng body vẫn cho cùng một object
+IDEMPOTENT_METHODS = ("GET", "HEAD", "PUT", "DELETE", "OPTIONS")
+# Lỗi kết nối (reset, timeout) trước khi nhận được response
+RETRY_EXCEPTIONS = (requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+
+
+# Retry-After dạng số giây hoặc HTTP-date, trả về số giây (None nếu không có / không đọc được)
+def parse_retry_after(value, now=None):
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when - (time.time() if now is None else now))
+
+
+# Chính sách gửi lại request bị lỗi tạm thời: tối đa max_attempts lần gửi, chờ giữa các lần theo
+# backoff mũ có jitter (full jitter: ngẫu nhiên trong [0, min(max_delay, base_delay * 2^n)]),
+# hoặc theo Retry-After của server nếu lâu hơn (không quá max_retry_after).
+class RetryPolicy:
+    def __init__(self, max_attempts=5, base_delay=0.5, max_delay=30.0, statuses=RETRY_STATUSES,
+                 methods=IDEMPOTENT_METHODS, max_retry_after=120.0):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.statuses = set(statuses)
+        self.methods = set(methods)
+        self.max_retry_after = max_retry_after
+        self._lock = threading.Lock()
+        self.retries = 0  # Tổng số lần gửi lại (thống kê)
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(
+            max_attempts=settings["retry_max_attempts"],
+            base_delay=settings["retry_base_delay"],
+            max_delay=settings["retry_max_delay"],
+            statuses=settings["retry_statuses"],
+        )
+
+    def backoff(self, attempt, response=None):
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        if response is not None:
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if retry_after is not None:
+                delay = max(delay, min(retry_after, self.max_retry_after))
+        return delay
+
+    # send() gửi một lần và trả về response; rewind() được gọi trước mỗi lần gửi lại
+    # (vd. seek body về vị trí ban đầu), trả về False nếu không gửi lại được.
+    def call(self, method, send, rewind=None, label=""):
+        attempt = 0
+        while True:
+            try:
+                response = send()
+            except RETRY_EXCEPTIONS as e:
+                if not self._should_retry(method, attempt, rewind):
+                    raise
+                delay = self.backoff(attempt)
+                logger.info("%s %s failed (%s), retry in %.1fs", method, label, e.__class__.__name__, delay)
+            else:
+                if response.status_code not in self.statuses or not self._should_retry(method, attempt, rewind):
+                    return response
+                delay = self.backoff(attempt, response)
+                logger.info("%s %s - HTTP %s, retry in %.1fs", method, label, response.status_code, delay)
+                response.close()
+
+            with self._lock:
+                self.retries += 1
+            attempt += 1
+            time.sleep(delay)
+
+    def _should_retry(self, method, attempt, rewind):
+        if method not in self.methods or attempt + 1 >= self.max_attempts:
+            return False
+        return rewind is None or rewind()
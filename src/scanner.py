@@ -0,0 +1,133 @@
+import os
+import queue
+import threading
+from collections import namedtuple
+
+from progress import Counter
+
+# Số luồng quét thư mục song song (I/O: os.scandir nhả GIL khi đọc thư mục)
+SCAN_THREADS = 8
+# Số batch (mỗi thư mục một batch) chờ bên consumer; đầy thì các luồng quét tạm dừng
+RESULT_QUEUE_SIZE = 256
+
+# Một file tìm thấy khi quét: mtime là st_mtime_ns, inode dùng để so với manifest backup
+ScanRecord = namedtuple("ScanRecord", "path object_name size mtime inode")
+
+
+# Quét nhiều cây thư mục cùng lúc bằng os.scandir, dùng luôn thông tin stat của DirEntry
+# (không gọi os.path.getsize / relpath cho từng file). roots là các cặp (đường dẫn local, object_name):
+# root là file thì object_name là tên của chính file đó, root là thư mục thì object_name là prefix
+# ("" = đặt các file con ngay ở gốc). Kết quả trả về dần theo từng thư mục; files/bytes là
+# bộ đếm tăng dần để UI đọc định kỳ. Giống os.walk: không đi vào symlink thư mục, bỏ qua lỗi đọc.
+class TreeScanner:
+    def __init__(self, roots, threads=SCAN_THREADS):
+        self.roots = list(roots)
+        self.threads = max(1, threads)
+        self.files = Counter()
+        self.bytes = Counter()
+        self.errors = []  # (đường dẫn, lỗi) của thư mục/file không đọc được
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def __iter__(self):
+        for batch in self.iter_batches():
+            yield from batch
+
+    # Các list ScanRecord, mỗi list là các file của một thư mục (thứ tự giữa các thư mục không cố định)
+    def iter_batches(self):
+        dirs = queue.Queue()
+        results = queue.Queue(maxsize=RESULT_QUEUE_SIZE)
+        lock = threading.Lock()
+        pending = [0]  # Số thư mục đã đưa vào hàng đợi mà chưa quét xong
+
+        files = []
+        for path, object_name in self.roots:
+            try:
+                if os.path.isdir(path):
+                    pending[0] += 1
+                    dirs.put((path, object_name))
+                elif os.path.isfile(path):
+                    st = os.stat(path)
+                    files.append(ScanRecord(path, object_name, st.st_size, st.st_mtime_ns, st.st_ino))
+                    self.files.add(1)
+                    self.bytes.add(st.st_size)
+            except OSError as e:
+                self.errors.append((path, str(e)))
+        if files:
+            yield files
+        if not pending[0]:
+            return
+
+        def scan(path, prefix):
+            batch = []
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if self.cancelled:
+                        break
+                    name = f"{prefix}/{entry.name}" if prefix else entry.name
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            with lock:
+                                pending[0] += 1
+                            dirs.put((entry.path, name))
+                        elif entry.is_file():
+                            st = entry.stat()
+                            batch.append(ScanRecord(entry.path, name, st.st_size, st.st_mtime_ns, entry.inode()))
+                            self.files.add(1)
+                            self.bytes.add(st.st_size)
+                    except OSError as e:
+                        self.errors.append((entry.path, str(e)))
+            return batch
+
+        # Consumer đã dừng (hủy, hoặc generator bị bỏ giữa chừng) thì bỏ kết quả thay vì chờ mãi ở hàng đợi đầy
+        def put_result(item):
+            while True:
+                try:
+                    results.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    if self.cancelled:
+                        return
+
+        def worker():
+            while True:
+                item = dirs.get()
+                if item is None:
+                    return
+                batch = []
+                if not self.cancelled:
+                    try:
+                        batch = scan(*item)
+                    except OSError as e:
+                        self.errors.append((item[0], str(e)))
+                if batch:
+                    put_result(batch)
+                with lock:
+                    pending[0] -= 1
+                    finished = pending[0] == 0
+                if finished:
+                    for _ in range(self.threads):
+                        dirs.put(None)
+                    put_result(None)
+
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(self.threads)]
+        for thread in threads:
+            thread.start()
+        finished = False
+        try:
+            while True:
+                batch = results.get()
+                if batch is None:
+                    finished = True
+                    break
+                yield batch
+        finally:
+            # Consumer dừng sớm: các luồng quét bỏ phần còn lại và thoát
+            if not finished:
+                self.cancel()
@@ -0,0 +1,111 @@
+import gzip
+import hashlib
+import json
+import threading
+import time
+
+from large_object import listing_etag
+
+# Mỗi lần backup là một snapshot <tên snapshot>/... trong container Backup
+SNAPSHOT_CONTAINER = "Backup"
+# Manifest nén của một snapshot: <snapshot>/SNAPSHOT_MANIFEST_NAME
+SNAPSHOT_MANIFEST_NAME = ".snapshot_manifest.json.gz"
+# Index nhỏ liệt kê mọi snapshot, đọc bằng một GET thay vì listing cả container
+SNAPSHOT_INDEX_NAME = ".snapshots.json"
+SNAPSHOT_MANIFEST_VERSION = 1
+
+# Mọi lần đọc-sửa-ghi index trong app đi qua lock này (backup thêm snapshot, prune xóa snapshot
+# chạy ở hai luồng khác nhau). Swift không hỗ trợ If-Match cho PUT nên không ghi có điều kiện được.
+_index_lock = threading.Lock()
+
+
+# Manifest của snapshot (gzip JSON Lines, đọc dần được cho snapshot rất nhiều file):
+#   dòng đầu: {"version", "snapshot", "format": "files" | "chunked", "created", "files", "total_bytes"}
+#   mỗi dòng sau là một file: {"path": "<đường dẫn trong snapshot>", "size", "mtime", "hash"}
+# Snapshot dạng chunked có thêm "chunk_container" ở dòng đầu và "chunks": [[sha256, length], ...] ở mỗi file.
+# mtime là st_mtime_ns của file gốc (None với snapshot cũ dựng lại từ listing).
+def save_snapshot_manifest(client, snapshot, fmt, files, container=SNAPSHOT_CONTAINER, **extra):
+    header = dict(extra, version=SNAPSHOT_MANIFEST_VERSION, snapshot=snapshot, format=fmt, created=time.time(),
+                  files=len(files), total_bytes=sum(entry["size"] for entry in files.values()))
+    lines = [json.dumps(header, separators=(",", ":"))]
+    for path in sorted(files):
+        lines.append(json.dumps(dict(files[path], path=path), separators=(",", ":")))
+    body = gzip.compress("\n".join(lines).encode("utf-8"))
+    response = client.put(container, f"{snapshot}/{SNAPSHOT_MANIFEST_NAME}", data=body,
+                          headers={"Content-Type": "application/gzip", "ETag": hashlib.md5(body).hexdigest()})
+    if response.status_code not in [201, 202]:
+        raise Exception(f"Error saving snapshot manifest - HTTP {response.status_code}")
+
+    update_snapshot_index(client, {
+        "name": snapshot, "format": fmt, "created": header["created"],
+        "files": header["files"], "bytes": header["total_bytes"],
+    }, container)
+    return header
+
+
+# Đọc manifest theo stream: phần tử đầu là dòng header, sau đó là từng file theo thứ tự đường dẫn.
+# Snapshot cũ chưa có manifest được dựng lại từ listing của prefix (header không có tổng số file/byte).
+def iter_snapshot_manifest(client, snapshot, container=SNAPSHOT_CONTAINER):
+    response = client.get(container, f"{snapshot}/{SNAPSHOT_MANIFEST_NAME}", stream=True)
+    if response.status_code == 404:
+        response.close()
+        yield {"version": SNAPSHOT_MANIFEST_VERSION, "snapshot": snapshot, "format": "files", "created": None,
+               "files": None, "total_bytes": None}
+        prefix = f"{snapshot}/"
+        for obj in client.iter_listing(container, prefix=prefix):
+            yield {"path": obj["name"][len(prefix):], "size": obj.get("bytes", 0), "mtime": None,
+                   "hash": listing_etag(obj)}
+        return
+
+    with response:
+        if response.status_code != 200:
+            raise Exception(f"Cannot read snapshot manifest of '{snapshot}' - HTTP {response.status_code}")
+        with gzip.GzipFile(fileobj=response.raw) as lines:
+            for line in lines:
+                if line.strip():
+                    yield json.loads(line)
+
+
+# Đọc toàn bộ manifest: header kèm "files": {path: entry} (dùng để hiển thị cây file)
+def load_snapshot_manifest(client, snapshot, container=SNAPSHOT_CONTAINER):
+    entries = iter_snapshot_manifest(client, snapshot, container)
+    manifest = dict(next(entries))
+    manifest["files"] = {entry.pop("path"): entry for entry in entries}
+    if manifest["total_bytes"] is None:
+        manifest["total_bytes"] = sum(entry["size"] for entry in manifest["files"].values())
+    return manifest
+
+
+# Danh sách snapshot (mới nhất cuối cùng). Chưa có index thì dựng từ các prefix của container (chỉ lần đầu).
+def load_snapshot_index(client, container=SNAPSHOT_CONTAINER):
+    response = client.get(container, SNAPSHOT_INDEX_NAME)
+    if response.status_code == 200:
+        return response.json().get("snapshots", [])
+    if response.status_code != 404:
+        raise Exception(f"Cannot read snapshot index - HTTP {response.status_code}")
+    snapshots = []
+    for obj in client.iter_listing(container, delimiter="/"):
+        if "subdir" in obj:
+            snapshots.append({"name": obj["subdir"].rstrip("/"), "format": "files", "created": None,
+                              "files": None, "bytes": None})
+    return snapshots
+
+
+def save_snapshot_index(client, snapshots, container=SNAPSHOT_CONTAINER):
+    body = json.dumps({"snapshots": snapshots}, separators=(",", ":")).encode("utf-8")
+    response = client.put(container, SNAPSHOT_INDEX_NAME, data=body, headers={"Content-Type": "application/json"})
+    if response.status_code not in [201, 202]:
+        raise Exception(f"Error saving snapshot index - HTTP {response.status_code}")
+
+
+# Đọc index, sửa bằng change(snapshots) -> snapshots mới rồi ghi lại, không xen với lần sửa khác
+def modify_snapshot_index(client, change, container=SNAPSHOT_CONTAINER):
+    with _index_lock:
+        snapshots = change(load_snapshot_index(client, container))
+        save_snapshot_index(client, snapshots, container)
+        return snapshots
+
+
+def update_snapshot_index(client, entry, container=SNAPSHOT_CONTAINER):
+    modify_snapshot_index(
+        client, lambda snapshots: [s for s in snapshots if s["name"] != entry["name"]] + [entry], container)
@@ -0,0 +1,317 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from concurrency import AdaptiveLimiter
+from retry import RetryPolicy
+
+logger = logging.getLogger(__name__)
+
+# Swift trả tối đa 10.000 dòng cho một lần listing
+LISTING_PAGE_SIZE = 10000
+
+
+# Client dùng chung cho mọi request tới Swift.
+# Giữ token, storage_url và một pool kết nối keep-alive (thread-safe) cho tất cả worker.
+# Token được đọc lại ở mỗi request; có token_manager thì request bị 401 được gửi lại sau khi làm mới token.
+# Số request chạy đồng thời do limiter (AIMD) quyết định, pool_size là mức trần.
+# Lỗi tạm thời (503, mất kết nối...) được gửi lại theo retry_policy.
+class SwiftClient:
+    def __init__(self, token, storage_url, pool_size=10, token_manager=None, limiter=None, retry_policy=None):
+        self.token = token
+        self.storage_url = (storage_url or "").rstrip("/")
+        self.pool_size = pool_size
+        self.token_manager = token_manager
+        self.limiter = limiter or AdaptiveLimiter("Swift", maximum=pool_size)
+        self.retry_policy = retry_policy or RetryPolicy()
+        self._lock = threading.Lock()
+        self._info = None
+
+        self.session = requests.Session()
+        self.adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+
+    # Đổi token / storage_url khi làm mới token hoặc switch user (giữ nguyên pool kết nối)
+    def set_auth(self, token, storage_url):
+        storage_url = (storage_url or "").rstrip("/")
+        with self._lock:
+            self.token = token
+            if storage_url != self.storage_url:
+                self.storage_url = storage_url
+                self._info = None
+
+    def url(self, container=None, object_name=None):
+        url = self.storage_url
+        if container:
+            url += "/" + quote(container)
+        if object_name:
+            url += "/" + quote(object_name)
+        return url
+
+    def request(self, method, container=None, object_name=None, headers=None, **kwargs):
+        body = kwargs.get("data")
+        position = body.tell() if hasattr(body, "seek") and hasattr(body, "tell") else None
+        replayable = body is None or isinstance(body, (bytes, str, dict)) or position is not None
+
+        # Body dạng generator (vd. archive) không gửi lại được
+        def rewind():
+            if position is not None:
+                body.seek(position)
+            return replayable
+
+        def send(token):
+            return self.retry_policy.call(
+                method, lambda: self._send(method, container, object_name, token, headers, **kwargs),
+                rewind, label=self.url(container, object_name)[len(self.storage_url):] or "/")
+
+        token = self.token
+        response = send(token)
+
+        # Token hết hạn: làm mới (một lần chung cho mọi luồng) rồi gửi lại nếu body đọc lại được
+        if response.status_code == 401 and self.token_manager and replayable:
+            new_token = self.token_manager.refresh_after_401(token)
+            if new_token:
+                rewind()
+                response.close()
+                response = send(new_token)
+        return response
+
+    def _send(self, method, container, object_name, token, headers, **kwargs):
+        all_headers = {"X-Auth-Token": token}
+        if headers:
+            all_headers.update(headers)
+        # Với stream=True slot được trả ngay khi nhận header: limiter đo thời gian tới byte đầu tiên
+        with self.limiter.slot(body_size(kwargs.get("data"))) as slot:
+            response = self.session.request(method, self.url(container, object_name), headers=all_headers, **kwargs)
+            slot["status"] = response.status_code
+            if method == "GET":
+                slot["bytes"] += int(response.headers.get("Content-Length") or 0)
+        return response
+
+    def get(self, container=None, object_name=None, **kwargs):
+        return self.request("GET", container, object_name, **kwargs)
+
+    def head(self, container=None, object_name=None, **kwargs):
+        return self.request("HEAD", container, object_name, **kwargs)
+
+    def put(self, container=None, object_name=None, **kwargs):
+        return self.request("PUT", container, object_name, **kwargs)
+
+    def post(self, container=None, object_name=None, **kwargs):
+        return self.request("POST", container, object_name, **kwargs)
+
+    def delete(self, container=None, object_name=None, **kwargs):
+        return self.request("DELETE", container, object_name, **kwargs)
+
+    # Copy trên server (X-Copy-From), dữ liệu không đi qua máy client.
+    # Với manifest SLO, multipart-manifest=get chỉ copy manifest: object mới dùng chung segment với nguồn.
+    def copy(self, container, object_name, source_container, source_object, headers=None):
+        all_headers = {"X-Copy-From": f"/{quote(source_container)}/{quote(source_object)}", "Content-Length": "0"}
+        if headers:
+            all_headers.update(headers)
+        return self.put(container, object_name, headers=all_headers, params={"multipart-manifest": "get"})
+
+    # Cấu hình của cluster lấy từ /info (bulk_delete, slo, ...), cache sau lần gọi đầu
+    def cluster_info(self):
+        if self._info is None:
+            base_url = self.storage_url.split("/v1/")[0]
+            try:
+                response = self.session.get(f"{base_url}/info", timeout=10)
+                self._info = response.json() if response.status_code == 200 else {}
+            except Exception as e:
+                logger.warning("Cannot read cluster info: %s", e)
+                self._info = {}
+        return self._info
+
+    # Dung lượng account lấy từ HEAD, không cần tải listing
+    def account_usage(self):
+        response = self.head()
+        response.raise_for_status()
+        return {
+            "bytes": int(response.headers.get("X-Account-Bytes-Used", 0)),
+            "containers": int(response.headers.get("X-Account-Container-Count", 0)),
+            "objects": int(response.headers.get("X-Account-Object-Count", 0)),
+        }
+
+    # Duyệt listing (account nếu container=None) theo từng trang marker/limit,
+    # trả về mỗi trang ngay khi nhận được thay vì chờ toàn bộ danh sách.
+    # prefix lọc phía server; delimiter="/" chỉ trả về con trực tiếp, các "thư mục" con
+    # xuất hiện dưới dạng {"subdir": "a/b/"}.
+    def iter_listing_pages(self, container=None, limit=LISTING_PAGE_SIZE, prefix=None, delimiter=None):
+        marker = None
+        while True:
+            params = {"format": "json", "limit": limit}
+            if marker:
+                params["marker"] = marker
+            if prefix:
+                params["prefix"] = prefix
+            if delimiter:
+                params["delimiter"] = delimiter
+            response = self.get(container, params=params)
+            if response.status_code == 204:
+                return
+            response.raise_for_status()
+            page = response.json()
+            if not page:
+                return
+            yield page
+            if len(page) < limit:
+                return
+            marker = page[-1].get("name") or page[-1].get("subdir")
+
+    def iter_listing(self, container=None, limit=LISTING_PAGE_SIZE, prefix=None, delimiter=None):
+        for page in self.iter_listing_pages(container, limit=limit, prefix=prefix, delimiter=delimiter):
+            yield from page
+
+    # Xóa hàng loạt: items là các cặp (container, object_name); object_name=None để xóa container
+    # (container phải đứng sau các object của nó). Dùng middleware bulk-delete nếu cluster hỗ trợ,
+    # nếu không thì gửi DELETE song song. Trả về một báo cáo gộp cho toàn bộ items.
+    def bulk_delete(self, items, progress_callback=None):
+        report = {"deleted": 0, "not_found": 0, "errors": []}
+        bulk_info = self.cluster_info().get("bulk_delete")
+
+        if bulk_info:
+            batch_size = int(bulk_info.get("max_deletes_per_request", 10000))
+            containers = []
+            failed = set()  # Container còn object xóa lỗi
+            batch = []
+            for item in items:
+                if item[1] is None:
+                    containers.append(item)
+                    continue
+                batch.append(item)
+                if len(batch) >= batch_size:
+                    failed.update(self._bulk_delete_batch(batch, report, progress_callback))
+                    batch = []
+            if batch:
+                failed.update(self._bulk_delete_batch(batch, report, progress_callback))
+
+            # Container gửi riêng ở request cuối, sau khi object bên trong đã xóa xong (cùng batch sẽ bị 409)
+            batch = []
+            for container, _ in containers:
+                if container in failed:
+                    report["errors"].append((bulk_path(container), "409 Conflict"))
+                    if progress_callback:
+                        progress_callback(1)
+                    continue
+                batch.append((container, None))
+                if len(batch) >= batch_size:
+                    self._bulk_delete_batch(batch, report, progress_callback)
+                    batch = []
+            if batch:
+                self._bulk_delete_batch(batch, report, progress_callback)
+        else:
+            self._single_delete_all(items, report, progress_callback)
+
+        return report
+
+    # Trả về các container có item xóa lỗi trong batch
+    def _bulk_delete_batch(self, batch, report, progress_callback):
+        paths = {bulk_path(container, object_name): container for container, object_name in batch}
+        body = "\n".join(paths)
+        headers = {"Content-Type": "text/plain", "Accept": "application/json"}
+        failed = set()
+        try:
+            response = self.post(params={"bulk-delete": ""}, headers=headers, data=body.encode("utf-8"))
+            if response.status_code != 200:
+                raise Exception(f"HTTP {response.status_code}")
+            result = response.json()
+            report["deleted"] += int(result.get("Number Deleted", 0))
+            report["not_found"] += int(result.get("Number Not Found", 0))
+            for path, status in result.get("Errors", []):
+                report["errors"].append((path, status))
+                failed.add(paths.get(path, path.lstrip("/").split("/", 1)[0]))
+        except Exception as e:
+            for path, container in paths.items():
+                report["errors"].append((path, str(e)))
+                failed.add(container)
+
+        if progress_callback:
+            progress_callback(len(batch))
+        return failed
+
+    def _single_delete_all(self, items, report, progress_callback):
+        containers = []
+
+        def delete_one(item):
+            container, object_name = item
+            try:
+                response = self.delete(container, object_name)
+                return item, response.status_code, None
+            except Exception as e:
+                return item, None, str(e)
+
+        def collect(result):
+            (container, object_name), status, error = result
+            if status == 204:
+                report["deleted"] += 1
+            elif status == 404:
+                report["not_found"] += 1
+            else:
+                report["errors"].append((bulk_path(container, object_name), error or f"HTTP {status}"))
+            if progress_callback:
+                progress_callback(1)
+
+        def objects_only():
+            for item in items:
+                if item[1] is None:
+                    containers.append(item)
+                else:
+                    yield item
+
+        with ThreadPoolExecutor(max_workers=self.pool_size) as executor:
+            for result in executor.map(delete_one, objects_only()):
+                collect(result)
+
+        # Container chỉ xóa được sau khi đã xóa hết object bên trong
+        for item in containers:
+            collect(delete_one(item))
+
+    # Thống kê pool: số request tái sử dụng kết nối cũ (pool hit) và số kết nối mới phải mở
+    def connection_stats(self):
+        new_connections = 0
+        total_requests = 0
+        pools = self.adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            new_connections += pool.num_connections
+            total_requests += pool.num_requests
+        return {
+            "requests": total_requests,
+            "new_connections": new_connections,
+            "pool_hits": max(0, total_requests - new_connections),
+            "retries": self.retry_policy.retries,
+        }
+
+    def close(self):
+        self.session.close()
+
+
+# Số byte của body request nếu biết trước (bytes, file, FileSegmentReader), 0 nếu không biết
+def body_size(body):
+    if body is None:
+        return 0
+    if hasattr(body, "__len__"):
+        return len(body)
+    if hasattr(body, "fileno"):
+        try:
+            return os.fstat(body.fileno()).st_size - body.tell()
+        except (OSError, ValueError):
+            return 0
+    return 0
+
+
+# Đường dẫn "/container/object" (đã encode) dùng trong body của bulk-delete
+def bulk_path(container, object_name=None):
+    path = "/" + quote(container)
+    if object_name:
+        path += "/" + quote(object_name)
+    return path
@@ -0,0 +1,171 @@
+import logging
+import threading
+import time
+from datetime import datetime
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Làm mới token trước khi hết hạn chừng này giây
+REFRESH_MARGIN = 300
+# Làm mới nền bị lỗi (mất mạng...) thì thử lại sau chừng này giây
+RETRY_DELAY = 60
+
+
+class AuthError(Exception):
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def parse_expires_at(value):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+# Đăng nhập Keystone v3 bằng password, scope theo project.
+# identity_url là endpoint identity v3 (vd. http://host/identity/v3).
+# Trả về token, storage_url (public object-store), expires_at (epoch), user_id, project_id.
+def keystone_login(identity_url, username, password, project):
+    payload = {
+        "auth": {
+            "identity": {
+                "methods": ["password"],
+                "password": {
+                    "user": {
+                        "name": username,
+                        "domain": {"id": "default"},
+                        "password": password
+                    }
+                }
+            },
+            "scope": {
+                "project": {
+                    "name": project,
+                    "domain": {"id": "default"}
+                }
+            }
+        }
+    }
+
+    headers = {"Content-Type": "application/json"}
+    response = requests.post(identity_url.rstrip("/") + "/auth/tokens", json=payload, headers=headers, timeout=30)
+    if response.status_code != 201:
+        raise AuthError(f"Login failed: {response.status_code} - {response.text}", response.status_code)
+
+    body = response.json()["token"]
+    storage_url = None
+    for service in body.get("catalog", []):
+        if service["type"] == "object-store":
+            endpoint = next((ep for ep in service["endpoints"] if ep["interface"] == "public"), None)
+            if endpoint:
+                storage_url = endpoint["url"]
+            break
+    if not storage_url:
+        raise AuthError("Swift endpoint not found")
+
+    project_id = body["project"]["id"]
+    if "/v1/" not in storage_url:
+        storage_url = storage_url.rstrip("/") + f"/v1/AUTH_{project_id}"
+
+    return {
+        "token": response.headers["X-Subject-Token"],
+        "storage_url": storage_url,
+        "expires_at": parse_expires_at(body.get("expires_at")),
+        "user_id": body["user"]["id"],
+        "project_id": project_id,
+    }
+
+
+# Quản lý vòng đời token: làm mới nền trước expires_at, và làm mới một lần duy nhất khi
+# nhiều worker cùng gặp 401. Các listener (vd. SwiftClient.set_auth) được báo mỗi khi token đổi.
+class TokenManager:
+    def __init__(self, authenticate, margin=REFRESH_MARGIN):
+        self.authenticate = authenticate  # () -> dict như keystone_login
+        self.margin = margin
+        self.token = None
+        self.storage_url = None
+        self.expires_at = None
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._timer = None
+        self._stopped = False
+
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    # Dùng kết quả đăng nhập sẵn có (không gọi Keystone lại)
+    def set_session(self, info):
+        with self._lock:
+            self._apply(info)
+
+    # Đổi sang user khác: đăng nhập ngay bằng authenticate mới
+    def switch(self, authenticate):
+        with self._lock:
+            info = authenticate()
+            self.authenticate = authenticate
+            self._apply(info)
+            return info
+
+    def refresh(self):
+        with self._lock:
+            self._apply(self.authenticate())
+            return self.token
+
+    # Gọi khi request bị 401 với failed_token. Nếu luồng khác đã làm mới thì dùng luôn token mới,
+    # nên cả batch chỉ đăng nhập lại một lần. Trả về None nếu không đăng nhập lại được.
+    def refresh_after_401(self, failed_token):
+        with self._lock:
+            if self.token != failed_token:
+                return self.token
+            try:
+                self._apply(self.authenticate())
+                logger.info("Token refreshed after 401")
+                return self.token
+            except Exception as e:
+                logger.warning("Token refresh failed: %s", e)
+                return None
+
+    def stop(self):
+        with self._lock:
+            self._stopped = True
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+
+    def _apply(self, info):
+        self.token = info["token"]
+        self.storage_url = info["storage_url"]
+        self.expires_at = info.get("expires_at")
+        for callback in self._listeners:
+            callback(self.token, self.storage_url)
+        self._schedule(self._delay_until_refresh())
+
+    def _delay_until_refresh(self):
+        if not self.expires_at:
+            return None
+        return max(RETRY_DELAY / 6, self.expires_at - time.time() - self.margin)
+
+    def _schedule(self, delay):
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        if self._stopped or delay is None:
+            return
+        self._timer = threading.Timer(delay, self._background_refresh)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+            logger.info("Token refreshed, expires at %s", datetime.fromtimestamp(self.expires_at or 0))
+        except Exception as e:
+            logger.warning("Background token refresh failed: %s", e)
+            with self._lock:
+                self._schedule(RETRY_DELAY)
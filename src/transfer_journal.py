@@ -0,0 +1,199 @@
+import json
+import os
+import threading
+import time
+import uuid
+
+
+def task_key(container, object_name):
+    return f"{container}/{object_name}"
+
+
+# Nhật ký các job upload/download đang chạy, ghi ra đĩa để tiếp tục sau khi app bị tắt,
+# token hết hạn hoặc mất mạng. Mỗi job là một file JSON lines (append-only):
+#   {"type": "job", ...}       dòng đầu: loại job và danh sách task
+#   {"type": "tasks", ...}     thêm task (job có listing được duyệt theo từng trang)
+#   {"type": "sealed"}         đã thêm đủ task
+#   {"type": "done", ...}      một file đã truyền xong
+#   {"type": "segment", ...}   một segment SLO đã upload xong
+#   {"type": "range", ...}     một đoạn byte của file lớn đã tải xong
+# Khi job đã đủ task và tất cả task xong, file của job bị xóa.
+class TransferJournal:
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._files = {}
+        self._active = set()  # Job đang chạy trong phiên này (không hỏi tiếp tục lại)
+
+    def _path(self, job_id):
+        return os.path.join(self.directory, f"{job_id}.jsonl")
+
+    # kind: "upload" với task (filepath, container, object_name)
+    #       "download" với task (container, object_name, save_path)
+    # tasks=None: job chưa biết hết task, thêm dần bằng add_tasks rồi gọi seal_job
+    def start_job(self, kind, name, tasks=None):
+        job_id = f"{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        header = {"type": "job", "id": job_id, "kind": kind, "name": name, "created": time.time(),
+                  "tasks": [list(t) for t in tasks or []], "sealed": tasks is not None}
+        with self._lock:
+            self._jobs[job_id] = self._new_state(header)
+            self._active.add(job_id)
+            self._write(job_id, header)
+        return job_id
+
+    def add_tasks(self, job_id, tasks):
+        self._record(job_id, {"type": "tasks", "tasks": [list(t) for t in tasks]})
+
+    def seal_job(self, job_id):
+        self._record(job_id, {"type": "sealed"})
+
+    def mark_done(self, job_id, key):
+        self._record(job_id, {"type": "done", "key": key})
+
+    def mark_segment(self, job_id, key, segment):
+        self._record(job_id, {"type": "segment", "key": key, "segment": segment})
+
+    def mark_range(self, job_id, key, etag, offset, length):
+        self._record(job_id, {"type": "range", "key": key, "etag": etag, "offset": offset, "length": length})
+
+    def completed_segments(self, job_id, key):
+        with self._lock:
+            state = self._jobs.get(job_id)
+            return dict(state["segments"].get(key, {})) if state else {}
+
+    def completed_ranges(self, job_id, key, etag):
+        with self._lock:
+            state = self._jobs.get(job_id)
+            ranges = state["ranges"].get(key) if state else None
+            if not ranges or ranges["etag"] != etag:
+                return set()
+            return set(ranges["parts"])
+
+    # Các job chưa xong từ lần chạy trước (đọc lại từ đĩa)
+    def pending_jobs(self):
+        jobs = []
+        for filename in sorted(os.listdir(self.directory)):
+            if not filename.endswith(".jsonl"):
+                continue
+            job_id = filename[:-len(".jsonl")]
+            with self._lock:
+                if job_id in self._active:
+                    continue
+                state = self._jobs.get(job_id) or self._load(job_id)
+                if state is None:
+                    continue
+                self._jobs[job_id] = state
+            jobs.append(state)
+        return jobs
+
+    # Bắt đầu chạy lại một job cũ, trả về các task chưa xong.
+    # Job có listing bị ngắt giữa chừng chỉ tiếp tục với các task đã được ghi lại.
+    def resume_job(self, job_id):
+        with self._lock:
+            state = self._jobs.get(job_id)
+            if not state:
+                return []
+            self._active.add(job_id)
+            remaining = [t for t in state["tasks"] if self._key_of(state, t) not in state["done"]]
+        if not state["sealed"]:
+            self.seal_job(job_id)
+        return remaining
+
+    def discard_job(self, job_id):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+            self._active.discard(job_id)
+            self._remove(job_id)
+
+    def close(self):
+        with self._lock:
+            for f in self._files.values():
+                f.close()
+            self._files = {}
+
+    def _record(self, job_id, record):
+        with self._lock:
+            state = self._jobs.get(job_id)
+            if state is None:
+                return
+            self._apply(state, record)
+            self._write(job_id, record)
+            if state["sealed"] and state["done"] >= state["keys"]:
+                self._jobs.pop(job_id, None)
+                self._active.discard(job_id)
+                self._remove(job_id)
+
+    def _write(self, job_id, record):
+        f = self._files.get(job_id)
+        if f is None:
+            f = self._files[job_id] = open(self._path(job_id), "a", encoding="utf-8")
+        f.write(json.dumps(record) + "\n")
+        f.flush()
+
+    def _remove(self, job_id):
+        f = self._files.pop(job_id, None)
+        if f:
+            f.close()
+        try:
+            os.remove(self._path(job_id))
+        except OSError:
+            pass
+
+    def _load(self, job_id):
+        state = None
+        try:
+            with open(self._path(job_id), "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # Dòng cuối bị ghi dở khi app bị tắt
+                    if record.get("type") == "job":
+                        state = self._new_state(record)
+                    elif state is not None:
+                        self._apply(state, record)
+        except OSError:
+            return None
+        return state
+
+    @classmethod
+    def _new_state(cls, header):
+        state = {"id": header["id"], "kind": header["kind"], "name": header["name"],
+                 "created": header["created"], "tasks": [], "keys": set(),
+                 "sealed": header.get("sealed", True), "done": set(), "segments": {}, "ranges": {}}
+        cls._add_tasks(state, header["tasks"])
+        return state
+
+    @classmethod
+    def _add_tasks(cls, state, tasks):
+        for task in tasks:
+            key = cls._key_of(state, task)
+            if key not in state["keys"]:
+                state["keys"].add(key)
+                state["tasks"].append(task)
+
+    @staticmethod
+    def _key_of(state, task):
+        if state["kind"] == "upload":
+            return task_key(task[1], task[2])
+        return task_key(task[0], task[1])
+
+    @classmethod
+    def _apply(cls, state, record):
+        kind = record["type"]
+        if kind == "tasks":
+            cls._add_tasks(state, record["tasks"])
+        elif kind == "sealed":
+            state["sealed"] = True
+        elif kind == "done":
+            state["done"].add(record["key"])
+        elif kind == "segment":
+            segment = record["segment"]
+            state["segments"].setdefault(record["key"], {})[segment["path"]] = segment
+        elif kind == "range":
+            ranges = state["ranges"].get(record["key"])
+            if not ranges or ranges["etag"] != record["etag"]:
+                ranges = state["ranges"][record["key"]] = {"etag": record["etag"], "parts": set()}
+            ranges["parts"].add((record["offset"], record["length"]))
@@ -1,9 +1,56 @@
-# utils.py
+import json
 import os
 import sys
 
+CONFIG_PATH = "config.json"
+
+# Giá trị mặc định cho các tùy chọn truyền file trong config.json
+DEFAULT_TRANSFER_SETTINGS = {
+    "slo_threshold_mb": 1024,   # File lớn hơn ngưỡng này được upload thành Static Large Object
+    "segment_size_mb": 100,
+    "segment_threads": 4,
+    "download_part_size_mb": 64,  # Object lớn hơn một part được tải song song bằng request Range
+    "download_threads": 4,
+    "archive_upload": True,       # Gộp nhiều file nhỏ thành tar và upload bằng extract-archive
+    "archive_small_file_kb": 256,  # File nhỏ hơn ngưỡng này mới được đưa vào archive
+    "archive_min_files": 50,      # Batch phải có ít nhất chừng này file nhỏ mới dùng archive
+    "archive_batch_mb": 64,       # Kích thước tối đa của một archive
+    "swift_max_concurrency": 32,  # Mức trần số request đồng thời tới Swift (limiter tự điều chỉnh bên dưới)
+    "orthanc_max_concurrency": 8,
+    "max_running_jobs": 2,        # Số job upload/download chạy cùng lúc, các job khác xếp hàng
+    "retry_max_attempts": 5,      # Số lần gửi tối đa cho request gặp lỗi tạm thời
+    "retry_base_delay": 0.5,      # Backoff (giây) = ngẫu nhiên trong [0, base * 2^lần thử], tối đa retry_max_delay
+    "retry_max_delay": 30,
+    "retry_statuses": [408, 429, 500, 502, 503, 504],
+    "upload_limit_kbps": 0,       # Giới hạn băng thông, 0 = không giới hạn
+    "download_limit_kbps": 0,
+    "background_yield_kbps": 512,  # Băng thông của backup/DICOM khi người dùng đang truyền file
+    "chunk_min_kb": 512,          # Backup dạng chunked: kích thước chunk tối thiểu / trung bình / tối đa
+    "chunk_avg_kb": 2048,
+    "chunk_max_kb": 8192,
+    "chunk_workers": 0,           # Số process băm chunk, 0 = số core của máy
+}
+
 def resource_path(relative_path):
     """Lấy đường dẫn đúng đến file khi chạy dạng exe hoặc script gốc"""
     if hasattr(sys, '_MEIPASS'):
         return os.path.join(sys._MEIPASS, relative_path)
     return os.path.join(os.path.abspath("."), relative_path)
+
+def load_config():
+    try:
+        with open(CONFIG_PATH, "r") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+def save_config(updates):
+    """Ghi đè các key trong updates, giữ nguyên các key khác của config.json"""
+    config = load_config()
+    config.update(updates)
+    with open(CONFIG_PATH, "w") as f:
+        json.dump(config, f, indent=4)
+
+def load_transfer_settings():
+    config = load_config()
+    return {key: config.get(key, default) for key, default in DEFAULT_TRANSFER_SETTINGS.items()}
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Các module của app nằm phẳng trong src/ và import lẫn nhau theo tên
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
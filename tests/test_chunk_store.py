@@ -0,0 +1,66 @@
+import hashlib
+import random
+
+import pytest
+
+import chunk_store
+from chunk_store import chunk_file, chunk_masks, cut_point, cut_point_bytes
+
+MIN, AVG, MAX = 2 * 1024, 8 * 1024, 32 * 1024
+
+
+def random_bytes(size, seed):
+    return random.Random(seed).getrandbits(8 * size).to_bytes(size, "little")
+
+
+def write(tmp_path, data, name="file.bin"):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+# Ranh giới của bản numpy phải giống cách tính từng byte để chunk cũ trên server còn dùng lại được
+def test_cut_point_matches_byte_loop():
+    pytest.importorskip("numpy")
+    data = random_bytes(200 * 1024, seed=1)
+    masks = chunk_masks(AVG)
+    pos = 0
+    while pos < len(data):
+        end = min(pos + MAX, len(data))
+        expected = cut_point_bytes(data, pos, end, MIN, AVG, *masks)
+        assert cut_point(data, pos, end, MIN, AVG, *masks) == expected
+        pos = expected
+
+
+def test_chunking_without_numpy(tmp_path, monkeypatch):
+    data = random_bytes(100 * 1024, seed=4)
+    path = write(tmp_path, data)
+    expected = chunk_file(path, MIN, AVG, MAX)
+    monkeypatch.setattr(chunk_store, "np", None)
+    assert chunk_file(path, MIN, AVG, MAX) == expected
+
+
+def test_chunks_cover_file_with_correct_hashes(tmp_path):
+    data = random_bytes(300 * 1024, seed=2)
+    chunks = chunk_file(write(tmp_path, data), MIN, AVG, MAX)
+    offset = 0
+    for digest, length in chunks:
+        assert hashlib.sha256(data[offset:offset + length]).hexdigest() == digest
+        offset += length
+    assert offset == len(data)
+    assert all(MIN < length <= MAX for _, length in chunks[:-1])
+
+
+def test_empty_and_small_files(tmp_path):
+    assert chunk_file(write(tmp_path, b""), MIN, AVG, MAX) == []
+    small = b"x" * 100
+    assert chunk_file(write(tmp_path, small, "small.bin"), MIN, AVG, MAX) == \
+        [(hashlib.sha256(small).hexdigest(), 100)]
+
+
+def test_insert_only_changes_nearby_chunks(tmp_path):
+    data = random_bytes(400 * 1024, seed=3)
+    before = chunk_file(write(tmp_path, data, "a.bin"), MIN, AVG, MAX)
+    after = chunk_file(write(tmp_path, b"inserted" + data, "b.bin"), MIN, AVG, MAX)
+    shared = {digest for digest, _ in before} & {digest for digest, _ in after}
+    assert len(shared) >= len(before) - 3
@@ -0,0 +1,91 @@
+import threading
+
+import pytest
+
+pytest.importorskip("PyQt5")
+
+from jobs import SOURCE_BATCH, JobCancelled, TransferJob
+
+
+def make_units(count, size=10):
+    return ((1, size, lambda job: None) for _ in range(count))
+
+
+def test_refill_reads_one_batch_at_a_time():
+    job = TransferJob("upload", "test")
+    job.add_source(make_units(SOURCE_BATCH + 5))
+    job.refill()
+    assert len(job.units) == SOURCE_BATCH
+    assert job.total_files == SOURCE_BATCH
+    assert job.total_bytes == SOURCE_BATCH * 10
+
+    job.units.clear()
+    job.refill()
+    assert len(job.units) == 5
+    job.units.clear()
+    job.refill()
+    assert job.source is None
+    assert not job.has_work
+
+
+def test_refill_does_nothing_while_units_are_queued():
+    job = TransferJob("upload", "test")
+    job.add_unit(lambda job: None)
+    job.add_source(make_units(3))
+    job.refill()
+    assert len(job.units) == 1
+
+
+def test_refill_error_is_reported_and_ends_source():
+    def broken():
+        yield 1, 10, lambda job: None
+        raise OSError("disk gone")
+
+    job = TransferJob("upload", "test")
+    job.add_source(broken())
+    job.refill()
+    assert len(job.units) == 1
+    assert job.source is None
+    assert job.errors == ["Cannot read the list of files: disk gone"]
+
+
+def test_concurrent_refill_does_not_wait():
+    started, release = threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        release.wait()
+        yield 1, 10, lambda job: None
+
+    job = TransferJob("upload", "test")
+    job.add_source(slow())
+    reader = threading.Thread(target=job.refill)
+    reader.start()
+    started.wait()
+    assert job.refilling
+    job.refill()  # Slot khác: trả về ngay thay vì chờ lock
+    assert not job.units
+    release.set()
+    reader.join()
+    assert len(job.units) == 1
+    assert not job.refilling
+
+
+def test_cancel_drops_source_and_new_units():
+    job = TransferJob("upload", "test")
+    job.add_source(make_units(3))
+    job.cancel()
+    assert job.source is None
+    job.add_unit(lambda job: None)
+    assert not job.units
+    with pytest.raises(JobCancelled):
+        job.checkpoint()
+    job.add_error("ignored after cancel")
+    assert job.errors == []
+
+
+def test_checkpoint_counts_bytes():
+    job = TransferJob("upload", "test")
+    job.checkpoint(100)
+    job.throttle()(50)
+    assert job.transferred_bytes == 150
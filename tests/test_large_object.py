@@ -0,0 +1,104 @@
+import hashlib
+from urllib.parse import quote
+
+import pytest
+
+pytest.importorskip("requests")
+
+from large_object import FileSegmentReader, delete_with_segments, listing_etag, plan_download_parts
+from swift_client import bulk_path
+
+
+def test_plain_object_is_split_by_part_size():
+    assert plan_download_parts(10, 4) == [(0, 4, None), (4, 4, None), (8, 2, None)]
+
+
+def test_empty_object_has_no_parts():
+    assert plan_download_parts(0, 4) == []
+
+
+def test_slo_parts_follow_segments():
+    manifest = [{"bytes": 6, "hash": "h1"}, {"size_bytes": 4, "hash": "h2"}]
+    assert plan_download_parts(10, 4, manifest) == [(0, 6, "h1"), (6, 4, "h2")]
+
+
+def test_ranged_and_nested_segments_are_not_checked():
+    manifest = [{"bytes": 5, "hash": "h1", "range": "0-4"}, {"bytes": 5, "hash": "h2", "sub_slo": True}]
+    assert plan_download_parts(10, 4, manifest) == [(0, 5, None), (5, 5, None)]
+
+
+def test_manifest_not_matching_size_falls_back_to_ranges():
+    manifest = [{"bytes": 3, "hash": "h1"}]
+    assert plan_download_parts(8, 4, manifest) == [(0, 4, None), (4, 4, None)]
+
+
+class FakeSegmentClient:
+    def __init__(self, listings, head_status=204, errors=()):
+        self.listings = listings  # {container: [tên object]}
+        self.head_status = head_status
+        self.errors = set(errors)  # bulk path xóa lỗi
+        self.deleted = []
+
+    def head(self, container=None, object_name=None, **kwargs):
+        class Response:
+            status_code = self.head_status if container in self.listings else 404
+        return Response()
+
+    def iter_listing(self, container, prefix=None):
+        return [{"name": name} for name in self.listings.get(container, []) if name.startswith(prefix or "")]
+
+    def bulk_delete(self, items, progress_callback=None):
+        report = {"deleted": 0, "not_found": 0, "errors": []}
+        for container, name in items:
+            path = bulk_path(container, name)
+            if path in self.errors:
+                report["errors"].append((path, "409 Conflict"))
+            else:
+                self.deleted.append(path)
+                report["deleted"] += 1
+        return report
+
+
+SEGMENTS = ["big.iso/slo/1700000000.0/30/10/00000000", "big.iso/slo/1700000000.0/30/10/00000001",
+            "other.iso/slo/1700000000.0/20/10/00000000"]
+
+
+def test_segments_are_deleted_when_container_head_returns_204():
+    client = FakeSegmentClient({"box": ["big.iso", "other.iso"], "box_segments": SEGMENTS})
+    report = delete_with_segments(client, "box", ["big.iso"])
+    assert client.deleted == ["/box/big.iso", "/box_segments/" + quote(SEGMENTS[0]),
+                              "/box_segments/" + quote(SEGMENTS[1])]
+    assert report["deleted"] == 3
+
+
+def test_segments_of_failed_manifest_are_kept():
+    client = FakeSegmentClient({"box": ["big.iso"], "box_segments": SEGMENTS}, errors=["/box/big.iso"])
+    report = delete_with_segments(client, "box", ["big.iso"])
+    assert client.deleted == []
+    assert report["errors"] == [("/box/big.iso", "409 Conflict")]
+
+
+def test_whole_container_deletes_segment_container_then_container():
+    client = FakeSegmentClient({"box": ["big.iso", "other.iso"], "box_segments": SEGMENTS})
+    delete_with_segments(client, "box")
+    assert client.deleted[-2:] == ["/box_segments", "/box"]
+    assert len(client.deleted) == 2 + len(SEGMENTS) + 2
+
+
+def test_replayed_segment_is_reported_once(tmp_path):
+    path = tmp_path / "data.bin"
+    path.write_bytes(b"0123456789" * 10)
+    reported = []
+    with FileSegmentReader(str(path), offset=10, length=50, on_read=reported.append) as reader:
+        assert len(reader.read(20)) == 20
+        reader.seek(0)  # RetryPolicy gửi lại request: rewind về đầu segment
+        while reader.read(16):
+            pass
+        assert sum(reported) == 50
+        assert reader.hexdigest() == hashlib.md5((b"0123456789" * 10)[10:60]).hexdigest()
+
+
+def test_listing_etag_prefers_slo_etag():
+    assert listing_etag({"hash": "manifest-md5", "slo_etag": '"real-etag"'}) == "real-etag"
+    assert listing_etag({"hash": "plain-md5"}) == "plain-md5"
+    assert listing_etag({}) is None
@@ -0,0 +1,61 @@
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("requests")
+
+from retention import apply_retention
+
+
+def snapshot(name, when):
+    return {"name": name, "created": datetime(*when).timestamp()}
+
+
+SNAPSHOTS = [
+    snapshot("a", (2024, 1, 1, 10)),
+    snapshot("b", (2024, 1, 1, 22)),
+    snapshot("c", (2024, 1, 2, 9)),
+    snapshot("d", (2024, 1, 9, 9)),
+    snapshot("e", (2024, 2, 1, 9)),
+]
+
+
+def names(snapshots):
+    return [s["name"] for s in snapshots]
+
+
+def test_disabled_policy_keeps_everything():
+    kept, expired = apply_retention(SNAPSHOTS, {"keep_last": 0})
+    assert names(kept) == names(SNAPSHOTS)
+    assert expired == []
+
+
+def test_keep_last():
+    kept, expired = apply_retention(SNAPSHOTS, {"keep_last": 2})
+    assert names(kept) == ["d", "e"]
+    assert names(expired) == ["a", "b", "c"]
+
+
+def test_keep_daily_keeps_newest_of_each_day():
+    kept, expired = apply_retention(SNAPSHOTS, {"keep_daily": 5})
+    assert names(kept) == ["b", "c", "d", "e"]
+    assert names(expired) == ["a"]
+
+
+def test_keep_monthly():
+    kept, _ = apply_retention(SNAPSHOTS, {"keep_monthly": 2})
+    assert names(kept) == ["d", "e"]
+
+
+def test_protected_and_undated_snapshots_are_kept():
+    snapshots = SNAPSHOTS + [{"name": "not-a-date", "created": None}]
+    kept, expired = apply_retention(snapshots, {"keep_last": 1}, protected=["a"])
+    assert names(kept) == ["a", "e", "not-a-date"]
+    assert names(expired) == ["b", "c", "d"]
+
+
+def test_name_is_parsed_when_created_is_missing():
+    snapshots = [{"name": "NOW.01.01.2024.10.00.00"}, {"name": "02.01.2024.10.00.00"}]
+    kept, expired = apply_retention(snapshots, {"keep_last": 1})
+    assert names(kept) == ["02.01.2024.10.00.00"]
+    assert names(expired) == ["NOW.01.01.2024.10.00.00"]
@@ -0,0 +1,81 @@
+import pytest
+
+pytest.importorskip("requests")
+
+from swift_client import SwiftClient, bulk_path
+
+
+class FakeResponse:
+    def __init__(self, status_code, data=None):
+        self.status_code = status_code
+        self.data = data
+
+    def json(self):
+        return self.data
+
+
+# Client có bulk delete, mỗi request tối đa batch_size dòng; result(paths) trả response cho một request
+def make_client(result, batch_size=1000):
+    client = SwiftClient("token", "http://swift/v1/AUTH_test")
+    client._info = {"bulk_delete": {"max_deletes_per_request": batch_size}}
+    client.requests = []
+
+    def post(**kwargs):
+        paths = kwargs["data"].decode("utf-8").split("\n")
+        client.requests.append(paths)
+        return result(paths)
+
+    client.post = post
+    return client
+
+
+def test_bulk_path_quotes_names():
+    assert bulk_path("My Files", "a b/c%.txt") == "/My%20Files/a%20b/c%25.txt"
+    assert bulk_path("box") == "/box"
+
+
+def test_bulk_delete_parses_counts_and_errors():
+    def result(paths):
+        return FakeResponse(200, {"Number Deleted": 2, "Number Not Found": 1,
+                                  "Errors": [["/box/c", "409 Conflict"]]})
+
+    client = make_client(result)
+    report = client.bulk_delete([("box", "a"), ("box", "b"), ("box", "c"), ("box", "d")])
+    assert report == {"deleted": 2, "not_found": 1, "errors": [("/box/c", "409 Conflict")]}
+
+
+def test_failed_request_marks_whole_batch():
+    client = make_client(lambda paths: FakeResponse(502), batch_size=2)
+    progress = []
+    report = client.bulk_delete([("box", "a"), ("box", "b"), ("box", "c")], progress_callback=progress.append)
+    assert report["errors"] == [("/box/a", "HTTP 502"), ("/box/b", "HTTP 502"), ("/box/c", "HTTP 502")]
+    assert progress == [2, 1]
+
+
+def test_containers_are_deleted_after_their_objects():
+    def result(paths):
+        errors = [[path, "500 Internal Error"] for path in paths if path == "/b/x"]
+        return FakeResponse(200, {"Number Deleted": len(paths) - len(errors), "Errors": errors})
+
+    client = make_client(result, batch_size=2)
+    report = client.bulk_delete([("a", None), ("a", "1"), ("a", "2"), ("b", None), ("b", "x")])
+    assert client.requests == [["/a/1", "/a/2"], ["/b/x"], ["/a"]]
+    assert report["deleted"] == 3
+    assert report["errors"] == [("/b/x", "500 Internal Error"), ("/b", "409 Conflict")]
+
+
+def test_fallback_deletes_one_by_one_containers_last():
+    client = SwiftClient("token", "http://swift/v1/AUTH_test", pool_size=2)
+    client._info = {}
+    deleted = []
+
+    def delete(container, object_name=None, **kwargs):
+        deleted.append((container, object_name))
+        return FakeResponse({"gone": 404, "bad": 500}.get(object_name, 204))
+
+    client.delete = delete
+    report = client.bulk_delete([("box", None), ("box", "a"), ("box", "gone"), ("box", "bad")])
+    assert deleted[-1] == ("box", None)
+    assert report["deleted"] == 2
+    assert report["not_found"] == 1
+    assert report["errors"] == [("/box/bad", "HTTP 500")]